@@ -19,10 +19,15 @@ maneuver = 'phughoid_a'; % Options: ['hover', 'hover_s', hover_a', 'hover_as'
 show_simulink = 0;
 print_schematic = 0;
 
+% Toggle Retrieving the Linearization from a Running Server (python statespace_fetcher.py --serve)
+use_server = 0;
+
 %% Running statespace_matlabwrap.py if Necessary
 
 trigger_python = 0;
-if exist('ss.mat', 'file') == 2
+if use_server
+    import = statespace_client(initial_velocity);
+elseif exist('ss.mat', 'file') == 2
     import = load('ss.mat');
     if import.velocity ~= initial_velocity
        trigger_python = 1;
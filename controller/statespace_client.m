@@ -0,0 +1,37 @@
+function linearization = statespace_client(initial_velocity, port, host)
+% STATESPACE_CLIENT Retrieves the linearized EoM from a running linearization server, started w/
+%   python statespace_fetcher.py --serve [port]
+% The returned struct holds the same fields as ss.mat (A, B, C, D, velocity, u, w, thetaf, thetac, theta0).
+% The connection is kept open between calls, such that a request only costs the linearization itself.
+
+% Author: San Kilkis
+
+if nargin < 2
+    port = 50007;
+end
+if nargin < 3
+    host = '127.0.0.1';
+end
+
+persistent connection
+if isempty(connection) || ~isvalid(connection) || connection.Port ~= port
+    connection = tcpclient(host, port, 'Timeout', 60);
+end
+
+request = [jsonencode(struct('velocity', initial_velocity)) newline];
+write(connection, uint8(request));
+
+response = '';
+while isempty(response) || response(end) ~= newline
+    response = [response char(read(connection, 1))]; %#ok<AGROW>
+    if connection.BytesAvailable > 0
+        response = [response char(read(connection, connection.BytesAvailable))]; %#ok<AGROW>
+    end
+end
+
+response = jsondecode(response);
+if ~strcmp(response.status, 'ok')
+    error('statespace_client:server', '%s', response.message);
+end
+linearization = response.result;
+end
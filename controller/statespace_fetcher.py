@@ -1,41 +1,282 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-""" This file contains the wrapper interface to be able to instantiate the 
-:class:`StateSpace` from MATLAB and retrieve the linearized EoM """
+""" This file contains the wrapper interface to be able to instantiate the
+:class:`StateSpace` from MATLAB and retrieve the linearized EoM. Besides the single-shot command-line interface, which
+also exports a batch of velocities to a single MAT-file, a persistent server keeps the model in memory and answers
+linearization requests in line-delimited JSON over either a local TCP socket or stdio, see :class:`StateSpaceServer` """
 
-from scipy.io import savemat
+from scipy.io import savemat, loadmat
+from timeit import default_timer
+import multiprocessing
+import numpy as np
+import threading
+import os
+import json
+import sys
+
+try:
+    import socketserver
+except ImportError:  # Python 2.x
+    import SocketServer as socketserver
 
 if __package__:
     from ..model import StateSpace
 else:
-    import sys
     sys.path.insert(0, '..')
     from model.statespace import StateSpace
 
 __author__ = ["San Kilkis"]
 
 
-def state_wrapper(initial_velocity):
+def linearize(initial_velocity):
+    """ Linearizes the EoM at the provided trim velocity
 
-    print ('\nLinearizing System Dynamics at V = %1.4f [m/s] \n' % initial_velocity)
+    :param initial_velocity: Trim velocity in SI meter per second [m/s]
+    :type initial_velocity: float
 
+    :return: State-space matrices and trim condition, w/ the variable names of `ss.mat`
+    :rtype: dict
+    """
     ss_obj = StateSpace(initial_velocity)
-    savemat('ss.mat',
-            dict(A=ss_obj.a_matrix,
-                 B=ss_obj.b_matrix,
-                 C=ss_obj.c_matrix,
-                 D=ss_obj.d_matrix,
-                 velocity=initial_velocity,
-                 u=ss_obj.initial_trim_case.u,
-                 w=ss_obj.initial_trim_case.w,
-                 thetaf=ss_obj.initial_trim_case.fuselage_tilt,
-                 thetac=ss_obj.initial_trim_case.longitudinal_cyclic,
-                 theta0=ss_obj.initial_trim_case.collective_pitch))
+    return dict(A=ss_obj.a_matrix,
+                B=ss_obj.b_matrix,
+                C=ss_obj.c_matrix,
+                D=ss_obj.d_matrix,
+                velocity=initial_velocity,
+                u=ss_obj.initial_trim_case.u,
+                w=ss_obj.initial_trim_case.w,
+                thetaf=ss_obj.initial_trim_case.fuselage_tilt,
+                thetac=ss_obj.initial_trim_case.longitudinal_cyclic,
+                theta0=ss_obj.initial_trim_case.collective_pitch)
+
+
+def timed_linearize(initial_velocity):
+    """ Times a single :func:`linearize`, returning its result and the elapsed wall time in SI second [s] """
+    start = default_timer()
+    result = linearize(initial_velocity)
+    return result, default_timer() - start
+
+
+def load_batch(filename):
+    """ Reads a previous export of :func:`state_wrapper`, either a single linearization or a batch
+
+    :return: Linearization and elapsed time [s] of every exported velocity, empty if the file does not exist
+    :rtype: dict
+    """
+    if not os.path.exists(filename):
+        return {}
+    data = loadmat(filename)
+    velocities = data['velocity'].ravel()
+    timings = data['timings'].ravel() if 'timings' in data else np.full(velocities.size, np.nan)
+    matrices = dict((key, data[key].reshape(data[key].shape[:2] + (-1,))) for key in ('A', 'B', 'C', 'D'))
+    vectors = dict((key, data[key].ravel()) for key in ('u', 'w', 'thetaf', 'thetac', 'theta0'))
+
+    points = {}
+    for i, velocity in enumerate(velocities):
+        result = dict((key, values[:, :, i]) for key, values in matrices.items())
+        result.update((key, values[i]) for key, values in vectors.items())
+        result['velocity'] = velocity
+        points[float(velocity)] = result, timings[i]
+    return points
+
+
+def batch_wrapper(velocities, filename='ss_batch.mat', processes=None):
+    """ Linearizes the EoM at multiple trim velocities in parallel and exports them to a single MAT-file, where the
+    matrices are stacked along the third dimension, i.e. `A(:, :, k)` in MATLAB, and the trim condition, velocity and
+    elapsed time of every point are vectors. Velocities already present in a previous export are not linearized again.
+
+    :param velocities: Trim velocities in SI meter per second [m/s]
+    :type velocities: collections.Sequence
+
+    :param filename: Path of the exported MAT-file
+    :type filename: str
+
+    :param processes: Number of worker processes, all CPUs if unspecified and a serial loop if 1
+    :type processes: int
+    """
+    points = load_batch(filename)
+    velocities = sorted(set(float(v) for v in velocities))
+    missing = [v for v in velocities if v not in points]
+
+    print ('\nLinearizing System Dynamics at %d Velocities, %d of which were exported before \n'
+           % (len(velocities), len(velocities) - len(missing)))
+
+    if missing:
+        processes = processes if processes is not None else multiprocessing.cpu_count()
+        pool = multiprocessing.Pool(min(processes, len(missing))) if processes > 1 and len(missing) > 1 else None
+        try:
+            results = pool.imap(timed_linearize, missing) if pool is not None else map(timed_linearize, missing)
+            for velocity, (result, elapsed) in zip(missing, results):
+                points[velocity] = result, elapsed
+                print ('V = %1.4f [m/s] linearized in %1.4f [s]' % (velocity, elapsed))
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+
+    ordered = [points[v] for v in sorted(points)]
+    data = dict((key, np.stack([np.asarray(result[key]) for result, _ in ordered], axis=-1))
+                for key in ('A', 'B', 'C', 'D'))
+    data.update((key, np.array([result[key] for result, _ in ordered], dtype=float))
+                for key in ('velocity', 'u', 'w', 'thetaf', 'thetac', 'theta0'))
+    data['timings'] = np.array([elapsed for _, elapsed in ordered], dtype=float)
+    savemat(filename, data)
     return 'Operation Successful'
 
 
+def state_wrapper(initial_velocity, filename=None, processes=None):
+    """ Exports the linearized EoM at a single velocity to `ss.mat`, or a sequence of velocities to `ss_batch.mat`, see
+    :func:`batch_wrapper` """
+    if np.ndim(initial_velocity) > 0:
+        return batch_wrapper(initial_velocity, filename or 'ss_batch.mat', processes)
+
+    print ('\nLinearizing System Dynamics at V = %1.4f [m/s] \n' % initial_velocity)
+
+    savemat(filename or 'ss.mat', linearize(initial_velocity))
+    return 'Operation Successful'
+
+
+def parse_velocities(arguments):
+    """ Velocities from the command-line, any number of values and/or MATLAB-style ranges `start:step:stop`
+
+    :rtype: list
+    """
+    velocities = []
+    for argument in arguments:
+        if ':' in argument:
+            start, step, stop = [float(value) for value in argument.split(':')]
+            velocities.extend(np.arange(start, stop + 0.5 * step, step))
+        else:
+            velocities.append(float(argument))
+    return velocities
+
+
+class StateSpaceServer(object):
+    """ Long-running linearization service which keeps the model, and all linearizations performed so far, in memory.
+    Every request is a single line of JSON, answered by a single line of JSON:
+
+        {"velocity": 5.14444}                                -> linearization at 5.14444 [m/s]
+        {"velocity": 5.14444, "mat": "ss.mat"}               -> idem, also written to a MAT-file
+        {"command": "ping"}                                  -> liveness check
+        {"command": "shutdown"}                              -> stops the server
+
+    Successful responses read {"status": "ok", "result": {...}, "cached": bool, "elapsed": seconds} where the result
+    holds the variables of `ss.mat`, failed requests are answered with {"status": "error", "message": "..."}.
+
+    :param warm_up: Velocity linearized upon start-up in SI meter per second [m/s], such that the aircraft parameters
+                    are derived before the first request arrives, None to skip
+    :type warm_up: float
+    """
+
+    def __init__(self, warm_up=0.0):
+        self.cache = {}
+        self.lock = threading.Lock()
+        self.running = True
+        if warm_up is not None:
+            self.fetch(warm_up)
+
+    def fetch(self, velocity):
+        """ Linearization at `velocity` [m/s] from the in-memory cache, which is only computed upon the first request
+
+        :return: Variables of `ss.mat` and whether they were cached
+        :rtype: tuple
+        """
+        key = float(velocity)
+        with self.lock:
+            result = self.cache.get(key)
+            cached = result is not None
+            if not cached:
+                result = self.cache[key] = linearize(key)
+        return result, cached
+
+    def handle(self, line):
+        """ Answers a single request
+
+        :param line: JSON encoded request
+        :type line: str
+
+        :return: JSON encoded response w/o trailing newline
+        :rtype: str
+        """
+        start = default_timer()
+        try:
+            request = json.loads(line)
+            command = request.get('command', 'linearize')
+            if command == 'ping':
+                response = dict(status='ok')
+            elif command == 'shutdown':
+                self.running = False
+                response = dict(status='ok')
+            elif command == 'linearize':
+                result, cached = self.fetch(request['velocity'])
+                if request.get('mat'):
+                    savemat(request['mat'], result)
+                response = dict(status='ok', cached=cached,
+                                result=dict((key, value.tolist() if hasattr(value, 'tolist') else value)
+                                            for key, value in result.items()))
+            else:
+                raise ValueError("Unknown command '%s'" % command)
+        except Exception as error:  # Errors are reported to the client instead of terminating the server
+            response = dict(status='error', message='%s: %s' % (error.__class__.__name__, error))
+        response['elapsed'] = default_timer() - start
+        return json.dumps(response)
+
+    def serve_stdio(self, stdin=None, stdout=None):
+        """ Answers requests read from `stdin` on `stdout` until it is closed or a shutdown is requested. Anything else
+        printed by the model, such as progress bars, is redirected to stderr to keep the protocol intact. """
+        previous = sys.stdout
+        stdin = stdin if stdin is not None else sys.stdin
+        stdout = stdout if stdout is not None else previous
+        sys.stdout = sys.stderr
+        try:
+            for line in iter(stdin.readline, ''):
+                if line.strip():
+                    stdout.write(self.handle(line) + '\n')
+                    stdout.flush()
+                if not self.running:
+                    break
+        finally:
+            sys.stdout = previous
+
+    def serve_tcp(self, port=50007, host='127.0.0.1'):
+        """ Answers requests on a local TCP socket, every connection may send any number of requests """
+        service = self
+
+        class Handler(socketserver.StreamRequestHandler):
+
+            def handle(self):
+                for line in iter(self.rfile.readline, b''):
+                    if line.strip():
+                        self.wfile.write((service.handle(line.decode('utf-8')) + '\n').encode('utf-8'))
+                        self.wfile.flush()
+                    if not service.running:  # Shutdown has to be requested from another thread than serve_forever
+                        threading.Thread(target=self.server.shutdown).start()
+                        break
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        server = socketserver.ThreadingTCPServer((host, port), Handler)
+        server.daemon_threads = True
+        sys.stderr.write('Serving linearizations on %s:%d\n' % (host, port))
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+
+
 if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--stdio':
+        PROTOCOL, sys.stdout = sys.stdout, sys.stderr  # Keeps the output of the warm-up off the protocol stream
+        StateSpaceServer().serve_stdio(stdout=PROTOCOL)
+        sys.exit(0)
+    if len(sys.argv) > 1 and sys.argv[1] == '--serve':
+        StateSpaceServer().serve_tcp(int(sys.argv[2]) if len(sys.argv) > 2 else 50007)
+        sys.exit(0)
+
+    if len(sys.argv) > 2 or len(sys.argv) == 2 and ':' in sys.argv[1]:
+        sys.stdout.write(state_wrapper(parse_velocities(sys.argv[1:])))
+        sys.exit(0)
+
     if len(sys.argv) > 1:
         INPUT_VELOCITY = float(sys.argv[1])
     else:
@@ -45,4 +286,3 @@ if __name__ == '__main__':
         else:
             INPUT_VELOCITY = input(prompt)
     sys.stdout.write(state_wrapper(float(INPUT_VELOCITY)))
-
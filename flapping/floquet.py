@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" This file contains the class definition used to assess the stability of the periodic flapping dynamics of the CH53
+Helicopter in forward flight by means of Floquet theory """
+
+import numpy as np
+from scipy.integrate import solve_ivp
+from math import pi
+import warnings
+
+if __package__:
+    from ..globs import Constants, Attribute, Variable
+else:
+    import sys
+    sys.path.insert(0, '..')
+    from globs import Constants, Attribute, Variable
+
+__author__ = ["San Kilkis"]
+
+
+class FloquetAnalysis(Constants):
+    """ Floquet analysis of the homogeneous flapping equation of :meth:`ForwardFlapping.ode`, which w.r.t. the azimuth
+    \\psi reads \\beta'' + C(\\psi) \\beta' + K(\\psi) \\beta = 0 w/ the 2\\pi-periodic damping and stiffness
+
+        C = (\\gamma / 8) (1 + (4 / 3) \\mu \\sin(\\psi))
+        K = 1 + (\\gamma / 6) \\mu \\cos(\\psi) + (\\gamma / 8) \\mu^2 \\sin(2 \\psi)
+
+    The monodromy matrix, i.e. the state transition matrix over a single revolution, is integrated for all combinations
+    of advance ratio and Lock number at once, as a single stacked system of which the adaptive step size is governed
+    by the least benign point. The eigenvalues of the monodromy matrix are the characteristic multipliers, the flapping
+    motion is asymptotically stable if all of them lie within the unit circle, i.e. if the real parts of all
+    characteristic exponents are negative.
+
+    :param tip_speed_ratios: Advance ratio(s) \\mu w.r.t. the control plane
+    :type tip_speed_ratios: float or numpy.ndarray
+
+    :param lock_numbers: Lock number(s) of the main rotor blades, broadcast against :parameter:`tip_speed_ratios`,
+                         the Lock number of the CH-53D if unspecified
+    :type lock_numbers: float or numpy.ndarray
+
+    :param rtol: Relative tolerance of the integration
+    :type rtol: float
+
+    :param atol: Absolute tolerance of the integration
+    :type atol: float
+    """
+
+    tip_speed_ratios = Variable('tip_speed_ratios', 'Advance ratio(s) w.r.t. the control plane')
+    lock_numbers = Variable('lock_numbers', 'Lock number(s) of the main rotor blades')
+
+    period = 2 * pi  # Period of the flapping equation w.r.t. the azimuth in SI radian [rad]
+
+    def __init__(self, tip_speed_ratios, lock_numbers=None, rtol=1e-9, atol=1e-12):
+        lock_numbers = self.lock_number if lock_numbers is None else lock_numbers
+        tip_speed_ratios, lock_numbers = np.broadcast_arrays(np.asarray(tip_speed_ratios, dtype=float),
+                                                             np.asarray(lock_numbers, dtype=float))
+        self.tip_speed_ratios = tip_speed_ratios.copy()
+        self.lock_numbers = lock_numbers.copy()
+        self.rtol = rtol
+        self.atol = atol
+
+    @property
+    def shape(self):
+        """ Broadcast shape of the advance ratios and Lock numbers """
+        return self.tip_speed_ratios.shape
+
+    def system_matrix(self, azimuth):
+        """ Periodic state matrix of the flapping motion [\\beta, \\beta'] w.r.t. the azimuth
+
+        :param azimuth: Azimuth angle of the blade in SI radian [rad]
+        :type azimuth: float
+
+        :return: State matrices of shape :attr:`shape` + (2, 2)
+        :rtype: numpy.ndarray
+        """
+        mu, lock = self.tip_speed_ratios, self.lock_numbers
+        matrix = np.zeros(self.shape + (2, 2))
+        matrix[..., 0, 1] = 1.
+        matrix[..., 1, 0] = -(1 + (lock / 6.) * mu * np.cos(azimuth) + (lock / 8.) * mu ** 2 * np.sin(2 * azimuth))
+        matrix[..., 1, 1] = -(lock / 8.) * (1 + (4. / 3.) * mu * np.sin(azimuth))
+        return matrix
+
+    @Attribute
+    def monodromy(self):
+        """ State transition matrices over a single revolution, starting from \\psi = 0
+
+        :return: Monodromy matrices of shape :attr:`shape` + (2, 2)
+        :rtype: numpy.ndarray
+        """
+        size = self.tip_speed_ratios.size
+
+        def derivative(azimuth, y):
+            matrix = self.system_matrix(azimuth).reshape(size, 2, 2)
+            return np.einsum('kij,kjl->kil', matrix, y.reshape(size, 2, 2)).ravel()
+
+        identity = np.tile(np.eye(2), (size, 1, 1)).ravel()
+        solution = solve_ivp(derivative, (0., self.period), identity, method='RK45', rtol=self.rtol, atol=self.atol)
+        if not solution.success:
+            warnings.warn('Monodromy integration failed: %s' % solution.message, RuntimeWarning)
+        return solution.y[:, -1].reshape(self.shape + (2, 2))
+
+    @Attribute
+    def multipliers(self):
+        """ Characteristic multipliers, i.e. the eigenvalues of the :attr:`monodromy` matrices, ordered by decreasing
+        magnitude
+
+        :return: Multipliers of shape :attr:`shape` + (2,)
+        :rtype: numpy.ndarray
+        """
+        multipliers = np.linalg.eigvals(self.monodromy).astype(complex)
+        order = np.argsort(-np.abs(multipliers), axis=-1)
+        return np.take_along_axis(multipliers, order, axis=-1)
+
+    @Attribute
+    def exponents(self):
+        """ Characteristic exponents per radian of azimuth, multiply by the rotational velocity of the rotor for SI
+        radian per second [rad/s]. Since the imaginary part is only defined up to multiples of 1/rev, the principal
+        value is returned.
+
+        :return: Exponents of shape :attr:`shape` + (2,)
+        :rtype: numpy.ndarray
+        """
+        return np.log(self.multipliers) / self.period
+
+    @Attribute
+    def stable(self):
+        """ Asymptotic stability of the flapping motion at every point
+
+        :rtype: numpy.ndarray
+        """
+        return np.all(np.abs(self.multipliers) < 1., axis=-1)
+
+    @classmethod
+    def stability_boundary(cls, tip_speed_ratios, lock_numbers, **kwargs):
+        """ Advance ratio at which the flapping motion first becomes unstable for every Lock number, obtained from a
+        single batched analysis over the grid of :parameter:`tip_speed_ratios` and :parameter:`lock_numbers`. The
+        boundary is interpolated linearly in the real part of the critical exponent between grid points.
+
+        :param tip_speed_ratios: Ascending advance ratios to search
+        :type tip_speed_ratios: numpy.ndarray
+
+        :param lock_numbers: Lock numbers of the main rotor blades
+        :type lock_numbers: numpy.ndarray
+
+        :return: Critical advance ratio of every Lock number, NaN if stable over all :parameter:`tip_speed_ratios`
+        :rtype: numpy.ndarray
+        """
+        tip_speed_ratios = np.asarray(tip_speed_ratios, dtype=float)
+        lock_numbers = np.asarray(lock_numbers, dtype=float)
+        analysis = cls(tip_speed_ratios[:, np.newaxis], lock_numbers[np.newaxis, :], **kwargs)
+        damping = np.max(analysis.exponents.real, axis=-1)
+
+        boundary = np.full(lock_numbers.shape, np.nan)
+        for j in range(lock_numbers.size):
+            unstable = np.nonzero(damping[:, j] >= 0)[0]
+            if unstable.size == 0:
+                continue
+            i = unstable[0]
+            if i == 0:
+                boundary[j] = tip_speed_ratios[0]
+            else:
+                lower, upper = damping[i - 1, j], damping[i, j]
+                boundary[j] = tip_speed_ratios[i - 1] + (tip_speed_ratios[i] - tip_speed_ratios[i - 1]) * \
+                    (-lower / (upper - lower))
+        return boundary
+
+
+if __name__ == '__main__':
+    obj = FloquetAnalysis(np.linspace(0, 0.5, 6))
+    print(obj.exponents)
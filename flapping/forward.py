@@ -6,21 +6,24 @@ of Inertia of the CH53 Helicopter """
 
 import numpy as np
 from scipy import integrate
-from scipy.interpolate import interp1d
+from scipy.interpolate import PPoly
 from scipy.optimize import fsolve
 import matplotlib.pyplot as plt
 import matplotlib.gridspec as gridspec
-from math import radians, sqrt, pi, degrees, cos, sin, asin
+from math import radians, sqrt, pi, cos, sin, asin
+import math
 import os  # Necessary to determining the current working directory to save figures
 
 if __package__:
-    from ..globs import Constants, Attribute, working_dir
+    from ..globs import Constants, Attribute, Variable, working_dir
     from ..utils.basic_units import radians as rad_ticks
+    from .floquet import FloquetAnalysis
 else:
     import sys
     sys.path.insert(0, '..')
-    from globs import Constants, Attribute, working_dir
+    from globs import Constants, Attribute, Variable, working_dir
     from utils.basic_units import radians as rad_ticks
+    from floquet import FloquetAnalysis
 
 __author__ = ["San Kilkis"]
 
@@ -28,14 +31,28 @@ __author__ = ["San Kilkis"]
 class ForwardFlapping(Constants):
     """ Defines the Flapping Dynamics of the CH-53D in Hovering Flight.
 
-    :param collective_pitch: Collective Pitch of the Main Rotor Blades in SI radian [rad]"""
+    :param collective_pitch: Collective Pitch of the Main Rotor Blades in SI radian [rad]
+    :param harmonic_balance: Toggles the periodic steady-state flapping response of :attr:`flapping_harmonics` instead
+                             of the response to a zero initial condition of :attr:`flapping_solution`
+    :type harmonic_balance: bool
+    """
+
+    collective_pitch = Variable('collective_pitch', 'Collective Pitch of the Main Rotor Blades in SI radian [rad]')
+    lateral_cyclic = Variable('lateral_cyclic', 'Lateral Cyclic in SI radian [rad]')
+    longitudinal_cyclic = Variable('longitudinal_cyclic', 'Longitudinal Cyclic in SI radian [rad]')
+    velocity = Variable('velocity', 'Forward Flight Velocity in SI meter per second [m/s]')
+    harmonic_balance = Variable('harmonic_balance', 'Toggles the periodic steady-state flapping response')
+
+    intervals = 100  # Number of intervals of the dense flapping solution per revolution
+    harmonic_order = 6  # Highest harmonic of the periodic flapping response retained by the harmonic balance
 
     def __init__(self, collective_pitch=radians(8), lateral_cyclic=radians(1),
-                 longitudinal_cyclic=radians(2), velocity=20):
+                 longitudinal_cyclic=radians(2), velocity=20, harmonic_balance=False):
         self.collective_pitch = collective_pitch
         self.lateral_cyclic = lateral_cyclic
         self.longitudinal_cyclic = longitudinal_cyclic
         self.velocity = velocity
+        self.harmonic_balance = harmonic_balance
 
     @Attribute
     def hover_induced_velocity(self):
@@ -102,12 +119,13 @@ class ForwardFlapping(Constants):
     def initial_condition(self):
         return [0, 0]
 
-    def ode(self, x, t):
+    def ode(self, x, t, lib=math):
         """ Defines the blade-flapping velocity and acceleration as a function of the blade-flapping deflection and
         velocity in a system of 1st Order ODEs.
 
         :param x: The vector of unknown functions that is equal to the [\beta  \dot{\beta}]'
         :param t: Dimensional time in SI seconds [s]
+        :param lib: Module providing the trigonometric functions, `numpy` to evaluate arrays of states and times
         :return: System of 1st Order ODEs for the Blade Flapping Angle \beta
         :rtype: list
         """
@@ -119,16 +137,16 @@ class ForwardFlapping(Constants):
         lambda_c = self.inflow_ratio_control
         lambda_i = self.inflow_ratio
 
-        b_coef = -1*((omega ** 2) * (1 + (lock / 6.0) * mu * cos(omega * t)
-                                        + (lock/8.0) * (mu ** 2) * sin(2*omega*t)))
+        b_coef = -1*((omega ** 2) * (1 + (lock / 6.0) * mu * lib.cos(omega * t)
+                                        + (lock/8.0) * (mu ** 2) * lib.sin(2*omega*t)))
 
-        b_dot_coef = -1 * ((lock/8.0)*omega*(1+(4.0/3.0) * mu * sin(omega*t)))
+        b_dot_coef = -1 * ((lock/8.0)*omega*(1+(4.0/3.0) * mu * lib.sin(omega*t)))
 
         aero_term = (((lock/8.0) * (omega**2) * theta * (1+(mu**2)))
                      - ((lock/6.0) * (omega**2) * (lambda_c + lambda_i))
-                     + ((lock/8.0) * (omega**2) * mu * sin(omega * t)
+                     + ((lock/8.0) * (omega**2) * mu * lib.sin(omega * t)
                         * ((8.0/3.0) * theta - (2 * (lambda_c + lambda_i))))
-                     - ((lock/8.0) * (omega**2) * theta * (mu**2) * cos(2*omega*t)))
+                     - ((lock/8.0) * (omega**2) * theta * (mu**2) * lib.cos(2*omega*t)))
 
         state_space = [x[1],
                        b_coef * x[0] + b_dot_coef * x[1] + aero_term]
@@ -193,6 +211,128 @@ class ForwardFlapping(Constants):
         return ((4.0/3.0) * mu * self.coning_angle) / ((1 + 0.5 * (mu**2))
                                                        + (k_prime * lambda_i / (1 + 0.5 * (mu**2)))) + theta_lc
 
+    @staticmethod
+    def solve_harmonics(lock_number, collective_pitch, tip_speed_ratio, inflow_ratio, order=6):
+        """ Harmonic balance of :meth:`ode`, which solves for the Fourier coefficients of the periodic flapping response
+        \beta = \beta_0 + \sum_n (\beta_{nc} \cos(n \psi) + \beta_{ns} \sin(n \psi)) directly. W.r.t. the azimuth, the
+        stiffness and damping of the flapping equation contain harmonics up to 2P, which couple every harmonic of the
+        response to its neighbours. Balancing the harmonics up to :parameter:`order` thus yields a small linear system
+        per operating point, which are all solved at once. The operating points are broadcast against each other.
+
+        :param lock_number: Lock number of the main rotor blades
+        :type lock_number: float
+        :param collective_pitch: Collective Pitch of the Main Rotor Blades in SI radian [rad]
+        :type collective_pitch: float or numpy.ndarray
+        :param tip_speed_ratio: Advance ratio \mu w.r.t. the control plane
+        :type tip_speed_ratio: float or numpy.ndarray
+        :param inflow_ratio: Total inflow ratio w.r.t. the control plane, i.e. \lambda_c + \lambda_i
+        :type inflow_ratio: float or numpy.ndarray
+        :param order: Highest harmonic of the response
+        :type order: int
+        :return: Coefficients [\beta_0, \beta_{1c}, \beta_{1s}, ..., \beta_{nc}, \beta_{ns}] in SI radian [rad], w/ the
+                 broadcast shape of the operating points as leading dimensions
+        :rtype: numpy.ndarray
+        """
+        theta, mu, inflow = np.broadcast_arrays(*[np.asarray(value, dtype=float)
+                                                  for value in (collective_pitch, tip_speed_ratio, inflow_ratio)])
+        lock = lock_number
+
+        # Complex Fourier coefficients of the periodic stiffness, damping and aerodynamic forcing, keyed by harmonic
+        stiffness = {0: 1., 1: lock * mu / 12., -1: lock * mu / 12., 2: lock * mu ** 2 / 16j, -2: -lock * mu ** 2 / 16j}
+        damping = {0: lock / 8., 1: lock * mu / 12j, -1: -lock * mu / 12j}
+        sine_forcing = lock * mu * ((8. / 3.) * theta - 2 * inflow) / 16j
+        cosine_forcing = -lock * theta * mu ** 2 / 16.
+        forcing = {0: (lock / 8.) * theta * (1 + mu ** 2) - (lock / 6.) * inflow,
+                   1: sine_forcing, -1: -sine_forcing, 2: cosine_forcing, -2: cosine_forcing}
+
+        # Row k balances harmonic k, the coefficient of harmonic m couples harmonic k - m of the response into it
+        harmonics = np.arange(-order, order + 1)
+        shift = harmonics[:, np.newaxis] - harmonics[np.newaxis, :]
+        rate = np.broadcast_to(1j * harmonics, shift.shape)  # Derivative of every harmonic w.r.t. the azimuth
+        system = np.zeros(theta.shape + shift.shape, dtype=complex)
+        system[..., shift == 0] -= harmonics ** 2
+        for harmonic, value in stiffness.items():
+            system[..., shift == harmonic] += np.broadcast_to(value, theta.shape)[..., np.newaxis]
+        for harmonic, value in damping.items():
+            coupled = shift == harmonic
+            system[..., coupled] += np.broadcast_to(value, theta.shape)[..., np.newaxis] * rate[coupled]
+        rhs = np.zeros(theta.shape + harmonics.shape, dtype=complex)
+        for harmonic, value in forcing.items():
+            if abs(harmonic) <= order:  # Forcing beyond the retained harmonics is truncated
+                rhs[..., order + harmonic] = value
+
+        complex_coefficients = np.linalg.solve(system, rhs[..., np.newaxis])[..., order:, 0]
+        coefficients = np.empty(theta.shape + (2 * order + 1,))
+        coefficients[..., 0] = complex_coefficients[..., 0].real
+        coefficients[..., 1::2] = 2 * complex_coefficients[..., 1:].real
+        coefficients[..., 2::2] = -2 * complex_coefficients[..., 1:].imag
+        return coefficients
+
+    @classmethod
+    def harmonic_sweep(cls, collective_pitch, longitudinal_cyclic, velocity, order=None):
+        """ Fourier coefficients of the periodic flapping response over many operating points, see
+        :meth:`solve_harmonics`. The inputs are broadcast against each other, the advance and inflow ratio of every
+        point are obtained from its own :class:`ForwardFlapping`, after which all points are balanced at once.
+
+        :param collective_pitch: Collective Pitch of the Main Rotor Blades in SI radian [rad]
+        :type collective_pitch: float or numpy.ndarray
+        :param longitudinal_cyclic: Longitudinal Cyclic in SI radian [rad]
+        :type longitudinal_cyclic: float or numpy.ndarray
+        :param velocity: Forward Flight Velocity in SI meter per second [m/s]
+        :type velocity: float or numpy.ndarray
+        :param order: Highest harmonic of the response, :attr:`harmonic_order` if unspecified
+        :type order: int
+        :return: Coefficients [\beta_0, \beta_{1c}, \beta_{1s}, ...] in SI radian [rad], w/ the broadcast shape of
+                 the inputs as leading dimensions
+        :rtype: numpy.ndarray
+        """
+        points = np.broadcast(collective_pitch, longitudinal_cyclic, velocity)
+        flights = [cls(collective_pitch=theta, longitudinal_cyclic=theta_lc, velocity=v)
+                   for theta, theta_lc, v in points]
+        return cls.solve_harmonics(flights[0].lock_number if flights else cls().lock_number,
+                                   np.reshape([flight.collective_pitch for flight in flights], points.shape),
+                                   np.reshape([flight.tip_speed_ratio for flight in flights], points.shape),
+                                   np.reshape([flight.inflow_ratio_control + flight.inflow_ratio
+                                               for flight in flights], points.shape),
+                                   order if order is not None else cls.harmonic_order)
+
+    @Attribute
+    def flapping_harmonics(self):
+        """ Returns the Fourier coefficients [\beta_0, \beta_{1c}, \beta_{1s}, ..., \beta_{nc}, \beta_{ns}] of the
+        periodic flapping response in SI radians [rad], see :meth:`solve_harmonics`. The mean \beta_0 includes the
+        coupling w/ the higher harmonics neglected by :attr:`coning_angle`, while \beta_{1c} is minus the
+        :attr:`longitudinal_tilt`
+
+        :rtype: numpy.ndarray
+        """
+        return self.solve_harmonics(self.lock_number, self.collective_pitch, self.tip_speed_ratio,
+                                    self.inflow_ratio_control + self.inflow_ratio, self.harmonic_order)
+
+    @Attribute
+    def floquet_analysis(self):
+        """ Floquet stability analysis of the periodic flapping motion at the current advance ratio
+
+        :rtype: FloquetAnalysis
+        """
+        return FloquetAnalysis(self.tip_speed_ratio, self.lock_number)
+
+    def harmonic_response(self, azimuth):
+        """ Evaluates the periodic flapping response of :attr:`flapping_harmonics` at any azimuth(s)
+
+        :param azimuth: Azimuth angle(s) of the advancing blade in SI radian [rad]
+        :type azimuth: float or numpy.ndarray
+        :return: Blade flapping angle \beta in SI radian [rad] and velocity \dot{\beta} in SI radian per second [rad/s]
+        :rtype: tuple
+        """
+        coefficients = self.flapping_harmonics
+        harmonics = np.arange(1, self.harmonic_order + 1)
+        phase = np.asarray(azimuth, dtype=float)[..., np.newaxis] * harmonics
+        cosine, sine = np.cos(phase), np.sin(phase)
+        beta = coefficients[0] + np.dot(cosine, coefficients[1::2]) + np.dot(sine, coefficients[2::2])
+        beta_dot = self.main_rotor.omega * (np.dot(cosine, harmonics * coefficients[2::2]) -
+                                            np.dot(sine, harmonics * coefficients[1::2]))
+        return beta, beta_dot
+
     @Attribute
     def t_final(self):
         """ The time in SI seconds that corresponds to the instance when the advancing blade has completed 1 rev """
@@ -203,20 +343,54 @@ class ForwardFlapping(Constants):
         return (0 * pi) / self.main_rotor.omega
 
     @Attribute
-    def flap_angle_psi(self):
-        """ Returns a fitted-spline for the angular displacement response of the advancing blade in hover for 1 rev """
-        time_interval = np.linspace(self.t_initial, self.t_final, 1000)
-        rad_interval = [i * self.main_rotor.omega for i in time_interval]
-        sol = self.ode_solver(time_interval, ic=self.initial_condition)[0]
-        return interp1d(rad_interval, sol, kind='slinear')
+    def flapping_solution(self):
+        """ Dense flapping response of the advancing blade for 1 rev, obtained from a single solution of :meth:`ode` at
+        :attr:`intervals` + 1 azimuth nodes which are joined by cubic Hermite polynomials. As the slopes at the nodes
+        follow from the ODE itself, the interpolation error remains at the level of the solver tolerance.
 
-    @Attribute
-    def flap_velocity_psi(self):
-        """ Returns a fitted-spline for the angular velocity response of the advancing blade in hover for 1 rev """
-        time_interval = np.linspace(self.t_initial, self.t_final, 1000)
-        rad_interval = [i * self.main_rotor.omega for i in time_interval]
-        sol = self.ode_solver(time_interval, ic=self.initial_condition)[1]
-        return interp1d(rad_interval, sol, kind='slinear')
+        :return: Piecewise polynomial of [\beta, \dot{\beta}] w.r.t. the azimuth in SI radian [rad]
+        :rtype: PPoly
+        """
+        omega = self.main_rotor.omega
+        time_interval = np.linspace(self.t_initial, self.t_final, self.intervals + 1)
+        states = np.column_stack(self.ode_solver(time_interval, ic=self.initial_condition))
+        slopes = np.column_stack(self.ode(states.T, time_interval, lib=np)) / omega  # Derivatives w.r.t. the azimuth
+
+        azimuth = time_interval * omega
+        step = np.diff(azimuth)[:, np.newaxis]
+        secant = np.diff(states, axis=0) / step
+        coefficients = np.stack([(slopes[:-1] + slopes[1:] - 2 * secant) / (step ** 2),
+                                 (3 * secant - 2 * slopes[:-1] - slopes[1:]) / step,
+                                 slopes[:-1],
+                                 states[:-1]])
+        return PPoly(coefficients, azimuth, extrapolate=False)
+
+    def flapping_response(self, azimuth):
+        """ Evaluates the :attr:`flapping_solution` at any azimuth(s) of the first revolution, or the periodic
+        :meth:`harmonic_response` at any azimuth(s) if :attr:`harmonic_balance` is toggled
+
+        :param azimuth: Azimuth angle(s) of the advancing blade in SI radian [rad]
+        :type azimuth: float or numpy.ndarray
+        :return: Blade flapping angle \beta in SI radian [rad] and velocity \dot{\beta} in SI radian per second [rad/s]
+        :rtype: tuple
+        """
+        if self.harmonic_balance:
+            return self.harmonic_response(azimuth)
+        azimuth = np.asarray(azimuth, dtype=float)
+        solution = self.flapping_solution
+        if np.any((azimuth < solution.x[0]) | (azimuth > solution.x[-1])):
+            raise ValueError('The flapping solution is only available for azimuths within [%1.4f, %1.4f] [rad]'
+                             % (solution.x[0], solution.x[-1]))
+        states = solution(azimuth)
+        return states[..., 0], states[..., 1]
+
+    def flap_angle_psi(self, azimuth):
+        """ Returns the angular displacement response of the advancing blade in SI radian [rad] for 1 rev """
+        return self.flapping_response(azimuth)[0]
+
+    def flap_velocity_psi(self, azimuth):
+        """ Returns the angular velocity response of the advancing blade in SI radian per second [rad/s] for 1 rev """
+        return self.flapping_response(azimuth)[1]
 
     def alpha_psi(self, azimuth, radius):
         """ Conputes the Angle of Attack (AoA) of an advancing blade element with the assumption of constant inflow
@@ -225,12 +399,28 @@ class ForwardFlapping(Constants):
         :param radius: The current radius of the advancing blade element in SI meter [m]
         :return: AoA of the advancing blade element in SI [rad]
         """
+        flap_angle, flap_velocity = self.flapping_response(azimuth)
         return self.collective_pitch - ((self.velocity * sin(self.control_aoa) + self.induced_velocity +
-                                         (self.flap_velocity_psi.__call__(azimuth) * radius) + self.velocity
-                                         * cos(self.control_aoa) * cos(azimuth)
-                                         * sin(self.flap_angle_psi.__call__(azimuth))) /
+                                         (flap_velocity * radius) + self.velocity
+                                         * cos(self.control_aoa) * np.cos(azimuth)
+                                         * np.sin(flap_angle)) /
                                         ((self.main_rotor.omega * radius) + self.velocity * cos(self.control_aoa) *
-                                         sin(azimuth)))
+                                         np.sin(azimuth)))
+
+    def alpha_field(self, azimuths, radii):
+        """ Computes the Angle of Attack (AoA) of the advancing blade over a polar grid of blade elements at once, where
+        the flapping solution is evaluated only once for all azimuths
+
+        :param azimuths: Azimuth angles of the blade elements in SI radian [rad]
+        :type azimuths: numpy.ndarray
+        :param radii: Radii of the blade elements in SI meter [m]
+        :type radii: numpy.ndarray
+        :return: AoA in SI radian [rad] of shape (len(radii), len(azimuths)), i.e. the layout of `numpy.meshgrid`
+        :rtype: numpy.ndarray
+        """
+        azimuths = np.asarray(azimuths, dtype=float)
+        radii = np.asarray(radii, dtype=float)
+        return self.alpha_psi(azimuths[np.newaxis, :], radii[:, np.newaxis])
 
     def plot_alpha(self):
         azimuth = np.linspace(0, 2*pi, 360)
@@ -240,12 +430,7 @@ class ForwardFlapping(Constants):
         plt.style.use('ggplot')
         ax = plt.subplot(111, projection='polar')
 
-        alpha = np.zeros((len(radii), len(azimuth)))
-        for i in range(0, len(radii)):
-            r = radii[i]
-            for j in range(0, len(azimuth)):
-                phi = azimuth[j]
-                alpha[i, j] = degrees(self.alpha_psi(phi, r))
+        alpha = np.degrees(self.alpha_field(azimuth, radii))
 
         levels = [i for i in np.arange(-1, 8, 1.0)]
         cmap = plt.get_cmap('jet')
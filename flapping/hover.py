@@ -6,19 +6,18 @@ dynamics of the CH53 Helicopter in hover """
 
 import numpy as np
 from scipy import integrate
-from scipy.interpolate import interp1d
 import matplotlib.pyplot as plt
 import matplotlib.gridspec as gridspec
-from math import radians, sqrt, pi, degrees, cos
+from math import radians, sqrt, pi, cos
 import os  # Necessary to determining the current working directory to save figures
 
 if __package__:
-    from ..globs import Constants, Attribute, working_dir
+    from ..globs import Constants, Attribute, Variable, working_dir
     from ..utils.basic_units import radians as rad_ticks
 else:
     import sys
     sys.path.insert(0, '..')
-    from globs import Constants, Attribute, working_dir
+    from globs import Constants, Attribute, Variable, working_dir
     from utils.basic_units import radians as rad_ticks
 
 # TODO Fully comment the code
@@ -32,6 +31,9 @@ class HoverFlapping(Constants):
     :type collective_pitch: float
     """
 
+    collective_pitch = Variable('collective_pitch', 'Collective Pitch of the Main Rotor Blades in SI radian [rad]')
+    excitation = Variable('excitation', 'Toggles the constant 1-P excitation during hover')
+
     def __init__(self, collective_pitch=radians(8), excitation=False):
         self.collective_pitch = collective_pitch
         self.excitation = excitation
@@ -88,7 +90,8 @@ class HoverFlapping(Constants):
     def ode_solver(self, t, **kwargs):
         """ Solves the differential equation in state-space form defined by `ode_statepace` with the lsoda package
         from the FORTRAN library odepack. Assumed initial values are a blade deflection \beta = 0 [rad] and blade
-        velocity \dot{\beta} = 0
+        velocity \dot{\beta} = 0. The analytical :meth:`flapping_response` is used instead, this numerical solution is
+        only retained to validate it, see :meth:`validation_error`
 
         :param t: Time interval for which the solution is desired
         :type t: numpy.ndarray
@@ -109,12 +112,68 @@ class HoverFlapping(Constants):
         return (2 * pi) / self.main_rotor.omega
 
     @Attribute
-    def flap_velocity_psi(self):
-        """ Returns a fitted-spline for the angular velocity response of the advancing blade in hover for 1 rev """
-        time_interval = np.linspace(0, self.t_final, 1000)
-        rad_interval = [i * self.main_rotor.omega for i in time_interval]
-        sol = self.ode_solver(time_interval, ic=self.initial_condition)[1]
-        return interp1d(rad_interval, sol, kind='slinear')
+    def damping_ratio(self):
+        """ Damping ratio of the flapping motion, of which the undamped eigenfrequency in hover equals the rotational
+        velocity of the rotor """
+        return self.lock_number / 16.0
+
+    @Attribute
+    def forced_amplitude(self):
+        """ Amplitude of the steady-state response to the 1-P excitation in SI radian [rad], which lags the excitation
+        by 90 [deg] since it acts at the undamped eigenfrequency """
+        return self.coning_angle / (2 * self.damping_ratio) if self.excitation else 0.
+
+    @Attribute
+    def periodic_initial_condition(self):
+        """ Initial condition [\beta, \dot{\beta}] for which no transient arises, i.e. the response is the steady-state
+        periodic solution """
+        return [self.coning_angle, self.forced_amplitude * self.main_rotor.omega]
+
+    def flapping_response(self, azimuth, ic=None):
+        """ Analytical solution of :meth:`ode`, the sum of the periodic particular solution, i.e. the coning angle and
+        the response to the 1-P excitation, and the decaying homogeneous solution which satisfies the initial condition
+
+        :param azimuth: Azimuth angle(s) of the advancing blade in SI radian [rad], where \psi = 0 at t = 0 [s]
+        :type azimuth: float or numpy.ndarray
+        :param ic: Initial Conditions [\beta, \dot{\beta}] of the system, if unspecified :attr:`initial_condition`
+        :type ic: list
+        :return: Blade flapping angle \beta in SI radian [rad] and velocity \dot{\beta} in SI radian per second [rad/s]
+        :rtype: tuple
+        """
+        azimuth = np.asarray(azimuth, dtype=float)
+        ic = self.initial_condition if ic is None else ic
+        omega = self.main_rotor.omega
+        zeta = self.damping_ratio
+        periodic = self.periodic_initial_condition
+
+        # Homogeneous solution of the deviation from the periodic solution, w.r.t. the non-dimensional time \psi
+        beta_0 = ic[0] - periodic[0]
+        beta_dot_0 = (ic[1] - periodic[1]) / omega
+        frequency = np.sqrt(complex(1 - zeta ** 2))  # Imaginary for an over-damped blade, i.e. a Lock number > 16
+        cosine = np.cos(frequency * azimuth).real
+        sine = (azimuth * np.sinc(frequency * azimuth / pi)).real  # Equal to sin(w * psi) / w, also for w -> 0
+        decay = np.exp(-zeta * azimuth)
+
+        beta = (self.coning_angle + self.forced_amplitude * np.sin(azimuth) +
+                decay * (beta_0 * cosine + (beta_dot_0 + zeta * beta_0) * sine))
+        beta_dot = omega * (self.forced_amplitude * np.cos(azimuth) +
+                            decay * (beta_dot_0 * cosine - (beta_0 + zeta * beta_dot_0) * sine))
+        return beta, beta_dot
+
+    def validation_error(self, azimuth=np.linspace(0, 6 * pi, 1000), ic=None):
+        """ Maximum absolute difference between :meth:`flapping_response` and the numerical solution of :meth:`ode`
+
+        :return: Error of the flapping angle in SI radian [rad] and velocity in SI radian per second [rad/s]
+        :rtype: tuple
+        """
+        ic = self.initial_condition if ic is None else ic
+        analytical = self.flapping_response(azimuth, ic=ic)
+        numerical = self.ode_solver(np.asarray(azimuth) / self.main_rotor.omega, ic=ic)
+        return tuple(float(np.max(np.abs(a - n))) for a, n in zip(analytical, numerical))
+
+    def flap_velocity_psi(self, azimuth):
+        """ Returns the angular velocity response of the advancing blade in hover in SI radian per second [rad/s] """
+        return self.flapping_response(azimuth)[1]
 
     def alpha_psi(self, azimuth, radius):
         """ Conputes the Angle of Attack (AoA) of an advancing blade element with the assumption of constant inflow
@@ -123,8 +182,23 @@ class HoverFlapping(Constants):
         :param radius: The current radius of the advancing blade element in SI meter [m]
         :return: AoA of the advancing blade element in SI [rad]
         """
-        return self.collective_pitch - ((self.hover_induced_velocity + (self.flap_velocity_psi.__call__(azimuth) *
-                                                                        radius)) / (self.main_rotor.omega * radius))
+        return self.collective_pitch - ((self.hover_induced_velocity + (self.flap_velocity_psi(azimuth) * radius)) /
+                                        (self.main_rotor.omega * radius))
+
+    def alpha_field(self, azimuths, radii):
+        """ Computes the Angle of Attack (AoA) of the advancing blade over a polar grid of blade elements at once, where
+        the flapping solution is evaluated only once for all azimuths
+
+        :param azimuths: Azimuth angles of the blade elements in SI radian [rad]
+        :type azimuths: numpy.ndarray
+        :param radii: Radii of the blade elements in SI meter [m]
+        :type radii: numpy.ndarray
+        :return: AoA in SI radian [rad] of shape (len(radii), len(azimuths)), i.e. the layout of `numpy.meshgrid`
+        :rtype: numpy.ndarray
+        """
+        azimuths = np.asarray(azimuths, dtype=float)
+        radii = np.asarray(radii, dtype=float)
+        return self.alpha_psi(azimuths[np.newaxis, :], radii[:, np.newaxis])
 
     def plot_alpha(self):
         azimuth = np.linspace(0, 2*pi, 360)
@@ -136,12 +210,7 @@ class HoverFlapping(Constants):
         plt.style.use('ggplot')
         ax = plt.subplot(111, projection='polar')
 
-        alpha = np.zeros((len(radii), len(azimuth)))
-        for i in range(0, len(radii)):
-            r = radii[i]
-            for j in range(0, len(azimuth)):
-                phi = azimuth[j]
-                alpha[i, j] = degrees(self.alpha_psi(phi, r))
+        alpha = np.degrees(self.alpha_field(azimuth, radii))
 
         levels = [i for i in np.arange(-5, 6, 1.0)]
         cmap = plt.get_cmap('jet')
@@ -167,10 +236,10 @@ class HoverFlapping(Constants):
         plt.style.use('ggplot')
         gs = gridspec.GridSpec(2, 1, top=0.9)
 
-        # Call to ODE Solver for Plot Solution
-        time_interval = np.linspace(0, self.t_final * 3, 1000)
-        sol = self.ode_solver(time_interval, ic=self.initial_condition)
-        blade_position = [(t * self.main_rotor.omega) * rad_ticks for t in time_interval]
+        # Analytical Solution over 3 Revolutions
+        azimuth = np.linspace(0, 6 * pi, 1000)
+        sol = self.flapping_response(azimuth)
+        blade_position = [psi * rad_ticks for psi in azimuth]
 
         # Displacement Plot
         top_plot = fig.add_subplot(gs[0, 0])
@@ -7,6 +7,8 @@ from math import pi, sqrt
 from collections import namedtuple
 from performance.masses import ComponentWeights
 from performance.cla_regression import LiftGradient
+import threading
+import hashlib
 import os
 
 working_dir = os.path.dirname(os.path.realpath(__file__))
@@ -66,139 +68,363 @@ C_dp = 0.0251  # Blade average drag coefficient
 sum_cds = 4.23  # This is the Equivalent Flat Plate Area estimated from pg 52 of reader
 
 
+MainRotor = namedtuple('MainRotor', ['diameter',
+                                      'radius',
+                                      'blade_number',
+                                      'chord',
+                                      'omega',
+                                      'solidity',
+                                      'tip_speed',
+                                      'tip_mach'])
+
+TailRotor = namedtuple('TailRotor', ['diameter',
+                                      'radius',
+                                      'blade_number',
+                                      'chord',
+                                      'omega',
+                                      'solidity',
+                                      'tip_speed',
+                                      'tip_mach'])
+
+
+class AircraftParameters(object):
+    """ Frozen container holding every derived constant of the CH-53D. The expensive entries, such as the XFOIL lift
+    gradient regression and the Weight Estimating Relationships, are evaluated exactly once upon instantiation after
+    which the object can no longer be modified. Use :func:`get_parameters` to obtain the process-wide instance that
+    is shared by all :class:`Constants` objects instead of instantiating this class directly.
+    """
+
+    def __init__(self):
+        speed_of_sound = sqrt(1.4 * 287.1 * T_inf)
+        weights = ComponentWeights()
+        main_rotor = MainRotor(D, R, n, c, omega, psi, omega*R, omega*R/speed_of_sound)
+        tail_rotor = TailRotor(D_tr, R_tr, n_tr, c_tr, omega_tr, psi_tr, omega_tr*R_tr, omega_tr*R_tr/speed_of_sound)
+
+        # Single blade Mass Moment of Inertia about the flapping hinge (blade runs from hub-center to tip)
+        inertia_blade = (1.0/3.0) * (weights.kg_to_lbs(weights.W_2A, power=-1) / main_rotor.blade_number) * \
+            main_rotor.radius**2
+        lift_gradient = LiftGradient().gradient
+
+        values = dict(g=g,
+                      rho=rho,
+                      temperature=T_inf,
+                      mass_mtow=m,
+                      weight_mtow=m * g,
+                      main_rotor=main_rotor,
+                      tail_arm=l_tr,
+                      tail_rotor=tail_rotor,
+                      figure_of_merit=FM,
+                      cruise_velocity=V_cr,
+                      k_factor=k,
+                      k_factor_tail=k_tr,
+                      power_avaliable=P_e,
+                      disk_loading=(m * g) / (pi * (main_rotor.radius ** 2)),
+                      speed_of_sound=speed_of_sound,
+                      average_drag=C_dp,
+                      flat_plate_area=sum_cds,
+                      weights=weights,
+                      inertia_blade=inertia_blade,
+                      lift_gradient=lift_gradient,
+                      lock_number=(rho * lift_gradient * main_rotor.chord * (main_rotor.radius ** 4)) / inertia_blade)
+
+        # Hash of all numerical constants, used to address results that were computed w/ this configuration
+        constants = sorted((key, value) for key, value in values.items() if key != 'weights')
+        values['fingerprint'] = hashlib.sha1(repr(constants).encode('utf-8')).hexdigest()[:16]
+
+        self.__dict__.update(values)
+
+    def __repr__(self):
+        return '%s(mass_mtow=%1.1f, lift_gradient=%1.5f, lock_number=%1.5f)' % (self.__class__.__name__,
+                                                                                self.mass_mtow,
+                                                                                self.lift_gradient,
+                                                                                self.lock_number)
+
+    def __setattr__(self, key, value):
+        raise AttributeError('%s is frozen, change the module-level inputs and call invalidate_parameters() instead'
+                             % self.__class__.__name__)
+
+    def __delattr__(self, item):
+        raise AttributeError('%s is frozen' % self.__class__.__name__)
+
+
+_parameters = None
+_parameters_lock = threading.Lock()
+
+
+def get_parameters():
+    """ Returns the process-wide :class:`AircraftParameters`, creating it upon the first call
+
+    :rtype: AircraftParameters
+    """
+    global _parameters
+    if _parameters is None:
+        with _parameters_lock:
+            if _parameters is None:  # Another thread might have finished creating the parameters while waiting
+                _parameters = AircraftParameters()
+    return _parameters
+
+
+def invalidate_parameters():
+    """ Discards the process-wide :class:`AircraftParameters` such that the next call to :func:`get_parameters`
+    re-derives all constants from the current module-level inputs. Objects which have already accessed their
+    :attr:`Constants.parameters` keep their previous snapshot. """
+    global _parameters
+    with _parameters_lock:
+        _parameters = None
+
+
+_evaluation = threading.local()  # Per-thread stack of the attributes that are currently being evaluated
+
+
+def _evaluation_stack():
+    """ Returns the stack of (instance, reads) frames belonging to the current thread """
+    try:
+        return _evaluation.stack
+    except AttributeError:
+        _evaluation.stack = []
+        return _evaluation.stack
+
+
+def _record_read(obj, name):
+    """ Registers that `name` was read by the attribute of `obj` which is currently being evaluated (if any) """
+    stack = getattr(_evaluation, 'stack', None)
+    if stack:
+        owner, reads = stack[-1]
+        if owner is obj:  # Dependencies on other objects are not tracked
+            reads.add(name)
+
+
+class DependencyGraph(object):
+    """ Book-keeping of which inputs and attributes were read by each lazily evaluated :class:`Attribute` of an
+    object. Each instance owns a re-entrant lock that serializes evaluation and invalidation such that concurrent
+    readers always observe a consistent set of cached values. """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.dependents = {}  # Maps a name onto the set of attribute names that read it during their evaluation
+
+    def __getstate__(self):
+        """ Locks cannot be pickled, thus only the dependencies are transferred to other processes """
+        return {'dependents': self.dependents}
+
+    def __setstate__(self, state):
+        self.lock = threading.RLock()
+        self.dependents = state['dependents']
+
+    @staticmethod
+    def of(obj):
+        """ Returns the dependency graph of `obj`, creating it upon first use
+
+        :rtype: DependencyGraph
+        """
+        try:
+            return obj.__dict__['_dependency_graph']
+        except KeyError:
+            return obj.__dict__.setdefault('_dependency_graph', DependencyGraph())
+
+    def record(self, name, reads):
+        """ Stores that the attribute `name` depends on all names in `reads` """
+        for read in reads:
+            self.dependents.setdefault(read, set()).add(name)
+
+    def invalidate(self, obj, name):
+        """ Removes the cached values of all attributes of `obj` that depend directly or indirectly on `name` """
+        stack = list(self.dependents.pop(name, ()))
+        while stack:
+            dependent = stack.pop()
+            obj.__dict__.pop(dependent, None)
+            stack.extend(self.dependents.pop(dependent, ()))
+
+
 class Attribute(object):
-    """ A decorator that is used for lazy evaluation of an object attribute.
-    property should represent non-mutable data, as it replaces itself. """
+    """ A decorator that is used for lazy evaluation of an object attribute. The inputs (see :class:`Variable`) and
+    other attributes that are read during evaluation are recorded, such that changing an input only discards the
+    cached values that depend on it. Assigning to an attribute overrides its value and also invalidates its
+    dependents, while deleting it forces a re-evaluation upon the next access. """
 
     def __init__(self, fget):
         self.fget = fget
         self.func_name = fget.__name__
+        self.__doc__ = fget.__doc__
 
     def __get__(self, obj, cls):
         if obj is None:
             return None
-        value = self.fget(obj)
-        setattr(obj, self.func_name, value)
+        name = self.func_name
+        _record_read(obj, name)
+        try:
+            return obj.__dict__[name]
+        except KeyError:
+            pass
+
+        graph = DependencyGraph.of(obj)
+        with graph.lock:
+            try:
+                return obj.__dict__[name]  # Another thread might have finished the evaluation while waiting
+            except KeyError:
+                pass
+            stack = _evaluation_stack()
+            reads = set()
+            stack.append((obj, reads))
+            try:
+                value = self.fget(obj)
+            finally:
+                stack.pop()
+            graph.record(name, reads)
+            obj.__dict__[name] = value
         return value
 
+    def __set__(self, obj, value):
+        graph = DependencyGraph.of(obj)
+        with graph.lock:
+            obj.__dict__[self.func_name] = value
+            graph.invalidate(obj, self.func_name)
+
+    def __delete__(self, obj):
+        graph = DependencyGraph.of(obj)
+        with graph.lock:
+            obj.__dict__.pop(self.func_name, None)
+            graph.invalidate(obj, self.func_name)
+
+
+class Variable(object):
+    """ Declares a mutable input of an object, such as the flight velocity. Reading it from within an
+    :class:`Attribute` registers a dependency, while assigning a new value invalidates all dependent attributes.
+
+    :param name: Name of the class attribute that this variable is assigned to
+    :type name: str
+
+    :param doc: Description of the input
+    :type doc: str
+    """
+
+    def __init__(self, name, doc=None):
+        self.name = name
+        self.__doc__ = doc
+
+    def __get__(self, obj, cls):
+        if obj is None:
+            return self
+        _record_read(obj, self.name)
+        try:
+            return obj.__dict__[self.name]
+        except KeyError:
+            raise AttributeError("'%s' object has no attribute '%s'" % (cls.__name__, self.name))
+
+    def __set__(self, obj, value):
+        graph = obj.__dict__.get('_dependency_graph')
+        if graph is None:  # Nothing has been evaluated yet, thus nothing needs to be invalidated
+            obj.__dict__[self.name] = value
+        else:
+            with graph.lock:
+                obj.__dict__[self.name] = value
+                graph.invalidate(obj, self.name)
+
 
 class Constants(object):
 
     """ An OOP Version of the above constants to use for the following part of this assignment, supporting lazy
-     evaluation where not every attribute or property will be triggered at run-time, thus increasing performance """
+     evaluation where not every attribute or property will be triggered at run-time, thus increasing performance. All
+     values are fetched from the process-wide :class:`AircraftParameters` such that derived constants are only ever
+     computed once regardless of how many instances are created. """
+
+    @Attribute
+    def parameters(self):
+        """ Snapshot of the process-wide aircraft parameters shared by all instances
+
+        :rtype: AircraftParameters
+        """
+        return get_parameters()
 
     @Attribute
     def g(self):
         """ Gravitational Acceleration in SI meter per second [m /s]"""
-        return g
+        return self.parameters.g
 
     @Attribute
     def rho(self):
         """ Atmospheric Density in SI kilogram per meter cubed [kg/m^3]"""
-        return rho
+        return self.parameters.rho
 
     @Attribute
     def temperature(self):
         """ Atmospheric Temperature in SI Kelvin [K] """
-        return T_inf
+        return self.parameters.temperature
 
     @Attribute
     def mass_mtow(self):
         """ Gross mass of the CH-53 in SI kilogram [kg] """
-        return m
+        return self.parameters.mass_mtow
 
     @Attribute
     def weight_mtow(self):
         """ Gross weight of the CH-53 in SI Newton [N] """
-        return self.mass_mtow * self.g
+        return self.parameters.weight_mtow
 
     @Attribute
     def main_rotor(self):
         """ Contains all main-rotor attributes of the CH-53 in SI units """
-        main_rotor_tuple = namedtuple('main_rotor', ['diameter',
-                                                     'radius',
-                                                     'blade_number',
-                                                     'chord',
-                                                     'omega',
-                                                     'solidity',
-                                                     'tip_speed',
-                                                     'tip_mach'])
-        return main_rotor_tuple(D, R, n, c, omega, psi, omega*R, omega*R/self.speed_of_sound)
+        return self.parameters.main_rotor
 
     @Attribute
     def tail_arm(self):
         """ Distance from the main-rotor hub to the tail-rotor hub of the CH-53 in SI meter [m] """
-        return l_tr
+        return self.parameters.tail_arm
 
     @Attribute
     def tail_rotor(self):
         """ Contains all tail-rotor attributes of the CH-53 in SI units """
-        tail_rotor_tuple = namedtuple('tail_rotor', ['diameter',
-                                                     'radius',
-                                                     'blade_number',
-                                                     'chord',
-                                                     'omega',
-                                                     'solidity',
-                                                     'tip_speed',
-                                                     'tip_mach'])
-        return tail_rotor_tuple(D_tr,
-                                R_tr,
-                                n_tr,
-                                c_tr,
-                                omega_tr,
-                                psi_tr,
-                                omega_tr*R_tr,
-                                omega_tr*R_tr/self.speed_of_sound)
+        return self.parameters.tail_rotor
 
     @Attribute
     def figure_of_merit(self):
         """ CH-53 Value of Figure of Merit from Sikorsky Archives """
-        return FM
+        return self.parameters.figure_of_merit
 
     @Attribute
     def cruise_velocity(self):
-        return V_cr
+        return self.parameters.cruise_velocity
 
     @Attribute
     def k_factor(self):
-        return k
+        return self.parameters.k_factor
 
     @Attribute
     def k_factor_tail(self):
-        return k_tr
+        return self.parameters.k_factor_tail
 
     @Attribute
     def power_avaliable(self):
         """ Total Available Engine Power in SI Watt [W] """
-        return P_e
+        return self.parameters.power_avaliable
 
     @Attribute
     def disk_loading(self):
         """ Disk Loading of the CH-53 in SI Newton per meter squared [N/m^2] """
-        return self.weight_mtow / (pi * (self.main_rotor.radius ** 2))
+        return self.parameters.disk_loading
 
     @Attribute
     def speed_of_sound(self):
         """ Freestream Speed of Sound in SI meter per second [m/s] """
-        return sqrt(1.4 * 287.1 * self.temperature)
+        return self.parameters.speed_of_sound
 
     @Attribute
     def average_drag(self):
         """ Blade Average Drag Coefficient """
-        return C_dp
+        return self.parameters.average_drag
 
     @Attribute
     def flat_plate_area(self):
         """ Equivalent Flat Plate Area of estimated from pg. 52 of the reader """
-        return sum_cds
+        return self.parameters.flat_plate_area
 
     @Attribute
     def weights(self):
-        """ Instantiates the Weight Estimating Relationships class to be accessed by the rest of the class
+        """ Shared instance of the Weight Estimating Relationships class to be accessed by the rest of the class
 
         :return: Class containing all Component Weights
         """
-        return ComponentWeights()
+        return self.parameters.weights
 
     @Attribute
     def inertia_blade(self):
@@ -207,9 +433,7 @@ class Constants(object):
 
         :return: Mass Moment of Inertia in SI kilogram meter squared [kg m^2]
         """
-        return (1.0/3.0) * \
-               (self.weights.kg_to_lbs(self.weights.W_2A, power=-1) /
-                self.main_rotor.blade_number) * self.main_rotor.radius**2
+        return self.parameters.inertia_blade
 
     @Attribute
     def lift_gradient(self):
@@ -217,7 +441,7 @@ class Constants(object):
 
         :return: Lift Coefficient Gradient in SI one over radians [1/rad]
         """
-        return LiftGradient().gradient
+        return self.parameters.lift_gradient
 
     @Attribute
     def lock_number(self):
@@ -225,8 +449,7 @@ class Constants(object):
 
         :return: Non-Dimensional Lock Number [-]
         """
-        return (self.rho * self.lift_gradient * self.main_rotor.chord * (self.main_rotor.radius ** 4)) \
-            / self.inertia_blade
+        return self.parameters.lock_number
 
 
 if __name__ == '__main__':
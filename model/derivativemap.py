@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" This file contains the class definition of the map of the linearized EoM of the CH53 Helicopter over a grid of
+flight velocities, masses and altitudes within the flight envelope """
+
+__author__ = ["San Kilkis"]
+
+import __root__
+import globs
+from globs import Constants, Attribute, Variable, get_parameters, invalidate_parameters, working_dir
+from stabilityderivatives import StabilityDerivatives
+from trimcache import get_trim_cache
+from utils import ProgressBar
+from scipy.io import savemat
+from collections import namedtuple
+from contextlib import contextmanager
+import multiprocessing
+import itertools
+import hashlib
+import numpy as np
+import os
+assert __root__  # Necessary to circumvent PEP-8 Syntax violation on the __root__ import statement
+
+EnvelopeSolution = namedtuple('EnvelopeSolution', ['a_matrices', 'b_matrices', 'trim_states', 'trim_controls'])
+
+
+def isa_atmosphere(altitude):
+    """ Temperature and density of the International Standard Atmosphere (ISA) in the troposphere, w.r.t. the sea level
+    conditions of :mod:`globs`
+
+    :param altitude: Geopotential altitude in SI meter [m], valid up to 11000 [m]
+    :type altitude: float
+
+    :return: Temperature in SI Kelvin [K] and density in SI kilogram per meter cubed [kg/m^3]
+    :rtype: tuple
+    """
+    if not 0 <= altitude <= 11000:
+        raise ValueError('The ISA troposphere is only valid between 0 and 11000 [m], %s [m] was requested' % altitude)
+    lapse_rate, gas_constant = -0.0065, 287.05
+    temperature = globs.T_inf + lapse_rate * altitude
+    exponent = -globs.g / (lapse_rate * gas_constant) - 1
+    return temperature, globs.rho * (temperature / globs.T_inf) ** exponent
+
+
+@contextmanager
+def configuration(mass, altitude):
+    """ Temporarily changes the gross mass and the atmospheric conditions of the module-level inputs of :mod:`globs`,
+    such that all objects created within the context use the derived :class:`AircraftParameters` of this configuration
+
+    :param mass: Gross mass in SI kilogram [kg]
+    :type mass: float
+
+    :param altitude: Geopotential altitude in SI meter [m]
+    :type altitude: float
+    """
+    previous = globs.m, globs.T_inf, globs.rho
+    temperature, density = isa_atmosphere(altitude)
+    changed = (mass, temperature, density) != previous
+    if changed:
+        globs.m, globs.T_inf, globs.rho = mass, temperature, density
+        invalidate_parameters()
+    try:
+        yield
+    finally:
+        if changed:
+            globs.m, globs.T_inf, globs.rho = previous
+            invalidate_parameters()
+
+
+def linearize(point):
+    """ Trims and linearizes the CH-53 at a single grid point, defined at module-level such that it can be executed by
+    the worker processes of a :class:`multiprocessing.Pool`
+
+    :param point: Velocity [m/s], mass [kg], altitude [m], linearization strategy and perturbation size(s)
+    :type point: tuple
+
+    :return: A-matrix, B-matrix, trim state u, w, q, theta_f and trim controls collective pitch, longitudinal cyclic
+    :rtype: tuple
+    """
+    velocity, mass, altitude, linearization, perturbation = point
+    with configuration(mass, altitude):
+        trim_case = get_trim_cache().get(velocity)
+        derivatives = StabilityDerivatives(u=trim_case.u, w=trim_case.w, q=0, theta_f=trim_case.fuselage_tilt,
+                                           collective_pitch=trim_case.collective_pitch,
+                                           longitudinal_cyclic=trim_case.longitudinal_cyclic,
+                                           linearization=linearization, perturbation=perturbation)
+        a_matrix = np.column_stack((derivatives.u_derivatives, derivatives.w_derivatives,
+                                    derivatives.q_derivatives, derivatives.theta_f_derivatives))
+        b_matrix = np.column_stack((derivatives.collective_derivatives, derivatives.cyclic_derivatives))
+        state = np.array([trim_case.u, trim_case.w, 0., trim_case.fuselage_tilt])
+        controls = np.array([trim_case.collective_pitch, trim_case.longitudinal_cyclic])
+    return a_matrix, b_matrix, state, controls
+
+
+class DerivativeMap(Constants):
+    """ Computes the full A and B matrices of the linearized EoM, together with the trim condition, at every point of a
+    grid of flight velocities, gross masses and altitudes. The grid points are linearized in parallel on a process pool
+    and every finished point is immediately stored in the `derivatives` cache directory, under a hash of the baseline
+    :attr:`AircraftParameters.fingerprint`, the grid point and the linearization settings. An interrupted build thus
+    resumes where it stopped, and points shared by different grids are only ever computed once.
+
+    All results are stacked into arrays with the grid shape (velocities, masses, altitudes) as leading dimensions, see
+    :attr:`solution`, and can be exported with :meth:`export`. Note that on platforms that spawn instead of fork
+    processes, the map must be built from within an `if __name__ == '__main__'` block.
+
+    :param velocities: Forward flight velocities in SI meter per second [m/s]
+    :type velocities: collections.Sequence
+
+    :param masses: Gross masses in SI kilogram [kg], defaults to the maximum take-off mass
+    :type masses: collections.Sequence
+
+    :param altitudes: ISA altitudes in SI meter [m], defaults to sea level
+    :type altitudes: collections.Sequence
+
+    :param linearization: Strategy used to obtain the stability derivatives, see :class:`StabilityDerivatives`
+    :type linearization: str
+
+    :param perturbation: Perturbation size(s) of the state variables and control inputs in SI units, if unspecified
+                         the defaults of the selected :parameter:`linearization` are used
+    :type perturbation: float or tuple
+
+    :param processes: Number of worker processes, all CPUs if unspecified and a serial loop if 1
+    :type processes: int
+
+    :param directory: Directory of the cache, if unspecified `cache/derivatives` in the working directory
+    :type directory: str
+    """
+
+    velocities = Variable('velocities', 'Forward flight velocities in SI meter per second [m/s]')
+    masses = Variable('masses', 'Gross masses in SI kilogram [kg]')
+    altitudes = Variable('altitudes', 'ISA altitudes in SI meter [m]')
+    linearization = Variable('linearization', "Linearization strategy, 'regression', 'central' or 'complex'")
+    perturbation = Variable('perturbation', 'Perturbation size of the state variables and control inputs in SI units')
+
+    def __init__(self, velocities, masses=None, altitudes=(0.,), linearization='central', perturbation=None,
+                 processes=None, directory=None):
+        self.velocities = np.atleast_1d(np.asarray(velocities, dtype=float))
+        self.masses = np.atleast_1d(np.asarray(masses if masses is not None else globs.m, dtype=float))
+        self.altitudes = np.atleast_1d(np.asarray(altitudes, dtype=float))
+        self.linearization = linearization
+        self.perturbation = perturbation
+        self.processes = processes
+        self.directory = directory if directory is not None else os.path.join(working_dir, 'cache', 'derivatives')
+
+    @property
+    def shape(self):
+        """ Number of velocities, masses and altitudes of the grid """
+        return self.velocities.size, self.masses.size, self.altitudes.size
+
+    @Attribute
+    def points(self):
+        """ Arguments of :func:`linearize` for every grid point in C-order of :attr:`shape`
+
+        :rtype: list
+        """
+        perturbation = tuple(np.atleast_1d(self.perturbation)) if self.perturbation is not None else None
+        return [(float(v), float(m), float(h), self.linearization, perturbation)
+                for v, m, h in itertools.product(self.velocities, self.masses, self.altitudes)]
+
+    @Attribute
+    def filenames(self):
+        """ Cache file of every grid point, named after the hash of the baseline configuration and the point
+
+        :rtype: list
+        """
+        fingerprint = get_parameters().fingerprint
+        return [os.path.join(self.directory, '%s.npz' % hashlib.sha1(repr((fingerprint,) + point).encode('utf-8'))
+                             .hexdigest()[:16]) for point in self.points]
+
+    def store(self, filename, result):
+        """ Writes the result of a single grid point to the cache, a temporary file is renamed such that an interrupted
+        write never leaves a corrupt entry behind """
+        if not os.path.isdir(self.directory):
+            try:
+                os.makedirs(self.directory)
+            except OSError:  # Directory created by another process in the mean time
+                pass
+        temporary = '%s.%d.tmp' % (filename, os.getpid())
+        with open(temporary, 'wb') as handle:
+            np.savez(handle, **dict(zip(EnvelopeSolution._fields, result)))
+        os.rename(temporary, filename)
+
+    @staticmethod
+    def load(filename):
+        """ Reads the result of a single grid point from the cache, or None if it was not computed yet
+
+        :rtype: tuple
+        """
+        if not os.path.exists(filename):
+            return None
+        with np.load(filename) as data:
+            return tuple(data[name] for name in EnvelopeSolution._fields)
+
+    @Attribute
+    def solution(self):
+        """ Stacked A-matrices (..., 4, 4), B-matrices (..., 4, 2), trim states (..., 4) and trim controls (..., 2) of
+        all grid points, where the leading dimensions are the grid :attr:`shape`
+
+        :rtype: EnvelopeSolution
+        """
+        results = [self.load(filename) for filename in self.filenames]
+        missing = [i for i, result in enumerate(results) if result is None]
+
+        if missing:
+            pbar = ProgressBar('Linearizing %d of %d Envelope Points' % (len(missing), len(results)))
+            processes = self.processes if self.processes is not None else multiprocessing.cpu_count()
+            pool = multiprocessing.Pool(min(processes, len(missing))) if processes > 1 and len(missing) > 1 else None
+            try:
+                mapping = pool.imap if pool is not None else itertools.imap
+                for count, (i, result) in enumerate(itertools.izip(missing, mapping(linearize, [self.points[i]
+                                                                                               for i in missing]))):
+                    self.store(self.filenames[i], result)  # Stored immediately such that a new build resumes here
+                    results[i] = result
+                    pbar.update(100. * (count + 1) / len(missing), 'V = %1.2f [m/s]' % self.points[i][0])
+            finally:
+                if pool is not None:
+                    pool.terminate()
+                    pool.join()
+
+        return EnvelopeSolution(*[np.array(values).reshape(self.shape + values[0].shape)
+                                  for values in zip(*results)])
+
+    def export(self, filename):
+        """ Exports the grid and the :attr:`solution` to a NumPy `.npz` or MATLAB `.mat` file, chosen by extension
+
+        :param filename: Path of the exported file
+        :type filename: str
+        """
+        data = dict(velocities=self.velocities, masses=self.masses, altitudes=self.altitudes,
+                    linearization=self.linearization, **self.solution._asdict())
+        extension = os.path.splitext(filename)[1].lower()
+        if extension == '.npz':
+            np.savez_compressed(filename, **data)
+        elif extension == '.mat':
+            savemat(filename, data)
+        else:
+            raise ValueError("Unknown export format '%s', use either '.npz' or '.mat'" % extension)
+        return filename
+
+    def clear(self):
+        """ Removes the cached results of all grid points """
+        for filename in self.filenames:
+            if os.path.exists(filename):
+                os.remove(filename)
+
+
+if __name__ == '__main__':
+    envelope = DerivativeMap(np.linspace(0, 75, 20), altitudes=(0., 1000., 2000.))
+    print envelope.export(os.path.join(working_dir, 'cache', 'derivative_map.mat'))
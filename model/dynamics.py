@@ -0,0 +1,415 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" This file contains the class definition of the vectorized non-linear Equations of Motion (EoM) of the CH53
+Helicopter, which evaluates the accelerations of entire arrays of states at once """
+
+__author__ = ["San Kilkis"]
+
+import __root__
+from globs import Constants, Attribute, get_parameters
+from inertia.ch53_inertia import CH53Inertia
+from collections import namedtuple
+import numpy as np
+import threading
+import warnings
+import math
+from math import sqrt, pi
+assert __root__  # Necessary to circumvent PEP-8 Syntax violation on the __root__ import statement
+
+StateDerivative = namedtuple('StateDerivative', ['u_dot', 'w_dot', 'q_dot', 'theta_f_dot'])
+InflowSolution = namedtuple('InflowSolution', ['inflow_ratio', 'converged', 'iterations'])
+
+
+class EquationsOfMotion(Constants):
+    """ Stateless force and moment kernel of the CH-53. The same equations as :class:`StabilityDerivatives` are
+    evaluated, however all state variables and control inputs may be arrays of any (broadcastable) shape such that
+    many states are evaluated in a single call. Only the constant geometry, such as the inertia, is stored on the
+    instance, thus one instance is shared by all callers through :func:`get_equations_of_motion`.
+
+    :param tolerance: Absolute convergence tolerance of the inflow ratio iteration
+    :type tolerance: float
+
+    :param max_iterations: Maximum number of iterations of the inflow ratio
+    :type max_iterations: int
+    """
+
+    def __init__(self, tolerance=1e-14, max_iterations=50):
+        self.tolerance = tolerance
+        self.max_iterations = max_iterations
+
+    @Attribute
+    def tip_speed(self):
+        """ Rotational velocity of the main-rotor blade tips in SI meter per second [m/s] """
+        return self.main_rotor.omega * self.main_rotor.radius
+
+    @Attribute
+    def hover_inflow_ratio(self):
+        """ Inflow Ratio in pure hover obtained from the hover induced velocity of Assignment I
+
+        :rtype: float
+        """
+        return sqrt(self.weight_mtow/(2*self.rho*pi*(self.main_rotor.radius ** 2))) / self.tip_speed
+
+    @Attribute
+    def ch53_inertia(self):
+        """ Instantiating the :class:`CH53Inertia` once to provide geometry parameters as required
+
+        :rtype: CH53Inertia
+        """
+        return CH53Inertia()
+
+    @Attribute
+    def pitch_inertia(self):
+        """ Mass Moment of Inertia about the y-axis w.r.t the center of gravity in SI kilogram meter squared [kg m^2]
+
+        :rtype: float
+        """
+        return self.ch53_inertia.get_inertia().yy
+
+    @Attribute
+    def rotor_distance_to_cg(self):
+        """ Distance of the Main Rotor to the Center of Gravity (C.G.) on the z-axis in SI meter [m]
+
+        :rtype: float
+        """
+        return abs(self.ch53_inertia.main_rotor.position.z - self.ch53_inertia.get_cg().z)
+
+    def control_plane_ratios(self, u, w, longitudinal_cyclic):
+        """ Advance Ratio and Inflow Ratio in the Control Plane, identical to :attr:`StabilityDerivatives.advance_ratio`
+        and :attr:`StabilityDerivatives.inflow_ratio_control`. Projecting the body velocities onto the control plane
+        directly, rather than through the flight path angle, avoids the quadrant logic of
+        :attr:`StabilityDerivatives.alpha_control` such that the ratios are analytic and thus complex-step safe.
+
+        :return: Advance Ratio and Inflow Ratio in the Control Plane
+        :rtype: tuple
+        """
+        cos_c, sin_c = np.cos(longitudinal_cyclic), np.sin(longitudinal_cyclic)
+        return (u * cos_c + w * sin_c) / self.tip_speed, (u * sin_c - w * cos_c) / self.tip_speed
+
+    @Attribute
+    def thrust_slope(self):
+        """ Derivative of the Blade Element Momentum Theory thrust coefficient w.r.t. the inflow ratio (negated)
+
+        :rtype: float
+        """
+        return 0.25 * self.lift_gradient * self.main_rotor.solidity
+
+    @Attribute
+    def scalar_constants(self):
+        """ Snapshot of the constants used by :meth:`evaluate` as plain floats, since every read of an attribute costs
+        a dependency lookup which is significant w.r.t. the scalar equations themselves
+
+        :return: Tip Speed [m/s], Mass [kg], Lock Number [-], Rotational Velocity [rad/s], Thrust Slope [-], Thrust
+                 per unit thrust coefficient [N], drag per unit velocity and mass [1/m], gravitational acceleration
+                 [m/s^2] and the pitch inertia divided by the rotor distance to the C.G. [kg m]
+        :rtype: tuple
+        """
+        return (self.tip_speed, self.mass_mtow, self.lock_number, self.main_rotor.omega, self.thrust_slope,
+                self.rho * self.tip_speed**2 * pi * self.main_rotor.radius**2,
+                self.flat_plate_area * 0.5 * self.rho / self.mass_mtow, self.g,
+                self.pitch_inertia / self.rotor_distance_to_cg)
+
+    def inflow_coefficients(self, advance_ratio, inflow_ratio_control, q, collective_pitch):
+        """ Terms of :meth:`inflow_residual` which do not depend on the inflow ratio, such that they are only computed
+        once per solve
+
+        :return: Advance Ratio, Inflow Ratio in the Control Plane, BEMT thrust coefficient w/o the induced inflow
+                 contribution, longitudinal disk tilt at zero inflow and the derivative of the disk tilt w.r.t. the
+                 inflow ratio
+        :rtype: tuple
+        """
+        mu, lambda_c, theta0 = advance_ratio, inflow_ratio_control, collective_pitch
+        elem_thrust = self.thrust_slope * ((2./3.) * theta0 * (1 + 1.5 * mu**2) - lambda_c)
+        tilt_offset = ((8.0/3.0) * mu * theta0 - 2 * mu * lambda_c -
+                       (16.0/self.lock_number) * (q / self.main_rotor.omega)) / (1 - 0.5 * mu**2)
+        tilt_slope = -2 * mu / (1 - 0.5 * mu**2)
+        return mu, lambda_c, elem_thrust, tilt_offset, tilt_slope
+
+    def inflow_residual(self, lambda_i, coefficients, lib=np):
+        """ Difference between the Blade Element Momentum Theory and Glauert Theory thrust coefficients, see
+        :meth:`StabilityDerivatives.thrust_coefficient_elem` and :meth:`StabilityDerivatives.thrust_coefficient_glau`,
+        together with its analytic derivative w.r.t. the inflow ratio
+
+        :param lambda_i: Inflow Ratio
+        :type lambda_i: numpy.ndarray
+
+        :param coefficients: Terms of the residual obtained from :meth:`inflow_coefficients`
+        :type coefficients: tuple
+
+        :param lib: Module providing cos, sin and sqrt, either numpy for arrays or math for a single float
+        :type lib: module
+
+        :return: Residual and its derivative w.r.t. the inflow ratio
+        :rtype: tuple
+        """
+        mu, lambda_c, elem_thrust, tilt_offset, tilt_slope = coefficients
+        elem_factor = self.thrust_slope
+        disk_tilt = tilt_offset + tilt_slope * lambda_i
+        cos_a1, sin_a1 = lib.cos(disk_tilt), lib.sin(disk_tilt)
+
+        # Velocity components parallel and normal to the Tip Path Plane, rotated from the control plane by a1
+        parallel = mu * cos_a1 + lambda_c * sin_a1
+        normal = lambda_c * cos_a1 - mu * sin_a1 + lambda_i
+        root = lib.sqrt(parallel**2 + normal**2)
+
+        residual = elem_thrust - elem_factor * lambda_i - 2 * lambda_i * root
+        return residual, -elem_factor - 2 * root - 2 * lambda_i * (normal - tilt_slope * lambda_i * parallel) / root
+
+    def expand_bracket(self, lower, upper, verified, indices, args):
+        """ Verifies the presumed bracket of the elements at `indices` in-place, the bounds are doubled until the
+        residual is positive at the lower and negative at the upper bound
+
+        :param lower: Lower bounds of all elements
+        :type lower: numpy.ndarray
+
+        :param upper: Upper bounds of all elements
+        :type upper: numpy.ndarray
+
+        :param verified: Flags of the elements which already have a verified bracket
+        :type verified: numpy.ndarray
+
+        :param indices: Indices of the elements that require a valid bracket
+        :type indices: numpy.ndarray
+
+        :param args: Coefficients of :meth:`inflow_residual` for all elements
+        :type args: list
+        """
+        indices = indices[~verified[indices]]
+        for _ in range(self.max_iterations):
+            if indices.size == 0:
+                break
+            sub_args = [value[indices] for value in args]
+            low_invalid = self.inflow_residual(lower[indices], sub_args)[0] <= 0
+            up_invalid = self.inflow_residual(upper[indices], sub_args)[0] >= 0
+            lower[indices[low_invalid]] = 2 * np.minimum(lower[indices[low_invalid]], -1.)
+            upper[indices[up_invalid]] = 2 * np.maximum(upper[indices[up_invalid]], 1.)
+            verified[indices[~(low_invalid | up_invalid)]] = True
+            indices = indices[low_invalid | up_invalid]
+
+    def solve_inflow(self, velocity, advance_ratio, inflow_ratio_control, q, collective_pitch):
+        """ Solves :meth:`inflow_residual` = 0 for the inflow ratio of all states simultaneously. Every element starts
+        from the same initial guess as the former scalar solver, 2e-2, and takes Newton steps safeguarded by a bracket
+        on which the residual changes sign: a step that leaves the bracket, or has no finite derivative, is replaced
+        by bisection. Elements are removed from the iteration as soon as they converge and states in pure hover are
+        masked out entirely, as these are assigned the hover inflow ratio. For complex states, used by complex-step
+        differentiation, the real problem is solved first after which the root is polished w/ complex Newton steps.
+
+        :param velocity: Magnitude of the velocity in SI meter per second [m/s]
+        :type velocity: numpy.ndarray
+
+        :param advance_ratio: Advance Ratio
+        :type advance_ratio: numpy.ndarray
+
+        :param inflow_ratio_control: Inflow Ratio in the Control Plane
+        :type inflow_ratio_control: numpy.ndarray
+
+        :param q: Pitch Rate in SI radian per second [rad/s]
+        :type q: numpy.ndarray
+
+        :param collective_pitch: Collective Pitch in SI radian [rad]
+        :type collective_pitch: numpy.ndarray
+
+        :return: Inflow Ratio, per-element convergence flags and per-element iteration counts, all with the broadcast
+                 shape of the inputs
+        :rtype: InflowSolution
+        """
+        inputs = np.broadcast_arrays(*[np.asarray(value) for value in
+                                       (velocity, advance_ratio, inflow_ratio_control, q, collective_pitch)])
+        shape = inputs[0].shape
+        complex_step = any(np.iscomplexobj(value) for value in inputs)
+        velocity, state_args = inputs[0].ravel(), [value.ravel() for value in inputs[1:]]
+
+        inflow_ratio = np.full(velocity.shape, self.hover_inflow_ratio, dtype=np.result_type(velocity, float))
+        converged = np.ones(velocity.shape, dtype=bool)
+        iterations = np.zeros(velocity.shape, dtype=int)
+
+        active = np.flatnonzero(velocity != 0)  # Masking out the pure hover states
+        state_args = self.inflow_coefficients(*[value[active] for value in state_args])
+        args = [np.real(value) for value in state_args]
+        lambda_i = np.full(active.shape, 2e-2)
+
+        # Bracket [lower, upper] w/ a positive residual at lower and a negative residual at upper. The initial bounds
+        # are only presumed, as physical inflow ratios are well within them, and are verified upon the first bisection
+        lower, upper = np.full(active.shape, -1.), np.ones(active.shape)
+        verified = np.zeros(active.shape, dtype=bool)
+
+        remaining = np.arange(active.size)  # Indices of the unconverged elements
+        sub_args = args
+        with np.errstate(divide='ignore', invalid='ignore'):  # Failed Newton steps are replaced by bisection
+            for _ in range(self.max_iterations):
+                current = lambda_i[remaining]
+                residual, derivative = self.inflow_residual(current, sub_args)
+
+                # Shrinking the bracket w/ the sign of the residual before taking the next step
+                positive = residual > 0
+                lower[remaining[positive]] = current[positive]
+                upper[remaining[~positive]] = current[~positive]
+
+                newton = current - residual / derivative
+                bisect = ~(np.isfinite(newton) & (newton >= lower[remaining]) & (newton <= upper[remaining]))
+                if bisect.any():
+                    self.expand_bracket(lower, upper, verified, remaining[bisect], args)
+                updated = np.where(bisect, 0.5 * (lower[remaining] + upper[remaining]), newton)
+                lambda_i[remaining] = updated
+                iterations[active[remaining]] += 1
+
+                done = (np.abs(updated - current) <= self.tolerance) | (residual == 0)
+                if done.all():
+                    remaining = remaining[:0]
+                    break
+                elif done.any():
+                    remaining = remaining[~done]
+                    sub_args = [value[remaining] for value in args]
+
+        converged[active[remaining]] = False
+        if remaining.size:
+            warnings.warn('Inflow ratio did not converge within %d iterations for %d of %d states'
+                          % (self.max_iterations, remaining.size, velocity.size), RuntimeWarning)
+
+        if complex_step:
+            lambda_i = lambda_i.astype(complex)
+            for _ in range(2):
+                residual, derivative = self.inflow_residual(lambda_i, state_args)
+                lambda_i = lambda_i - residual / derivative
+
+        inflow_ratio[active] = lambda_i
+        return InflowSolution(inflow_ratio.reshape(shape), converged.reshape(shape), iterations.reshape(shape))
+
+    def __call__(self, u, w, q, theta_f, collective_pitch, longitudinal_cyclic):
+        """ Evaluates the accelerations of the CH-53 for arrays of states and control inputs, all arguments are
+        broadcast against each other
+
+        :param u: Horizontal Velocity in SI meter per second [m/s]
+        :type u: float or numpy.ndarray
+
+        :param w: Vertical Velocity in SI meter per second [m/s]
+        :type w: float or numpy.ndarray
+
+        :param q: Pitch Rate in SI radian per second [rad/s]
+        :type q: float or numpy.ndarray
+
+        :param theta_f: Fuselage Tilt-Angle (Positive up) in SI radian [rad]
+        :type theta_f: float or numpy.ndarray
+
+        :param collective_pitch: Collective Pitch in SI radian [rad]
+        :type collective_pitch: float or numpy.ndarray
+
+        :param longitudinal_cyclic: Longitudinal Cyclic in SI radian [rad]
+        :type longitudinal_cyclic: float or numpy.ndarray
+
+        :return: Accelerations in SI meter per second squared [m/s^2] and angular rates and accelerations in SI radian
+                 per second (squared) [rad/s], [rad/s^2] w/ the broadcast shape of the inputs
+        :rtype: StateDerivative
+        """
+        u, w, q, theta_f, collective_pitch, longitudinal_cyclic = np.broadcast_arrays(
+            *[np.asarray(value, dtype=np.result_type(value, float)) for value in
+              (u, w, q, theta_f, collective_pitch, longitudinal_cyclic)])
+
+        velocity = np.sqrt(u**2 + w**2)
+        advance_ratio, inflow_ratio_control = self.control_plane_ratios(u, w, longitudinal_cyclic)
+        lambda_i = self.solve_inflow(velocity, advance_ratio, inflow_ratio_control, q, collective_pitch).inflow_ratio
+
+        mu = advance_ratio
+        disk_tilt = (((8.0/3.0) * mu * collective_pitch) - (2 * mu * (inflow_ratio_control + lambda_i)) -
+                     ((16.0/self.lock_number) * (q / self.main_rotor.omega))) / (1 - 0.5 * mu**2)
+        thrust_coef = (0.25 * self.lift_gradient * self.main_rotor.solidity) * \
+            ((2./3.) * collective_pitch * (1 + (1.5 * mu**2)) - (inflow_ratio_control + lambda_i))
+        thrust = thrust_coef * self.rho * self.tip_speed**2 * pi * self.main_rotor.radius**2
+
+        # Drag terms are zero in pure hover, where the direction of the drag force is undefined
+        moving = velocity != 0
+        drag = self.flat_plate_area * 0.5 * self.rho * (velocity**2) / (self.mass_mtow * np.where(moving, velocity, 1.))
+        drag = np.where(moving, drag, 0.)
+
+        rotor_tilt = longitudinal_cyclic - disk_tilt
+        u_dot = -self.g * np.sin(theta_f) - drag * u + (thrust / self.mass_mtow) * np.sin(rotor_tilt) - q * w
+        w_dot = self.g * np.cos(theta_f) - drag * w - (thrust / self.mass_mtow) * np.cos(rotor_tilt) + q * u
+        q_dot = (-thrust / self.pitch_inertia) * self.rotor_distance_to_cg * np.sin(rotor_tilt)
+
+        return StateDerivative(u_dot, w_dot, q_dot, np.copy(q)[()])
+
+    def solve_inflow_scalar(self, velocity, advance_ratio, inflow_ratio_control, q, collective_pitch):
+        """ Scalar counterpart of :meth:`solve_inflow` for a single real state, which avoids the overhead of numpy for
+        time-marching a single trajectory. The same safeguarded Newton iteration is used.
+
+        :return: Inflow Ratio, convergence flag and number of iterations
+        :rtype: InflowSolution
+        """
+        if velocity == 0:
+            return InflowSolution(self.hover_inflow_ratio, True, 0)
+
+        coefficients = self.inflow_coefficients(advance_ratio, inflow_ratio_control, q, collective_pitch)
+        lambda_i, lower, upper, verified = 2e-2, -1., 1., False
+        for iteration in range(1, self.max_iterations + 1):
+            residual, derivative = self.inflow_residual(lambda_i, coefficients, lib=math)
+            if residual > 0:
+                lower = lambda_i
+            else:
+                upper = lambda_i
+
+            newton = lambda_i - residual / derivative if derivative != 0 else lower - 1.
+            if not lower <= newton <= upper:
+                while not verified:  # Verifying the presumed bracket upon the first bisection
+                    verified = True
+                    if self.inflow_residual(lower, coefficients, lib=math)[0] <= 0:
+                        lower, verified = 2 * min(lower, -1.), False
+                    if self.inflow_residual(upper, coefficients, lib=math)[0] >= 0:
+                        upper, verified = 2 * max(upper, 1.), False
+                newton = 0.5 * (lower + upper)
+
+            step, lambda_i = newton - lambda_i, newton
+            if abs(step) <= self.tolerance or residual == 0:
+                return InflowSolution(lambda_i, True, iteration)
+
+        warnings.warn('Inflow ratio did not converge within %d iterations' % self.max_iterations, RuntimeWarning)
+        return InflowSolution(lambda_i, False, self.max_iterations)
+
+    def evaluate(self, u, w, q, theta_f, collective_pitch, longitudinal_cyclic):
+        """ Scalar counterpart of :meth:`__call__` for a single real state utilizing the math module, which is an order
+        of magnitude faster than numpy when time-marching a single trajectory
+
+        :return: Accelerations in SI meter per second squared [m/s^2] and angular rates and accelerations in SI radian
+                 per second (squared) [rad/s], [rad/s^2]
+        :rtype: StateDerivative
+        """
+        tip_speed, mass, lock_number, omega, thrust_slope, thrust_scale, drag_scale, g, pitch_lever = \
+            self.scalar_constants
+        cos_c, sin_c = math.cos(longitudinal_cyclic), math.sin(longitudinal_cyclic)
+        mu = (u * cos_c + w * sin_c) / tip_speed
+        lambda_c = (u * sin_c - w * cos_c) / tip_speed
+        velocity = sqrt(u**2 + w**2)
+        lambda_i = self.solve_inflow_scalar(velocity, mu, lambda_c, q, collective_pitch).inflow_ratio
+
+        disk_tilt = (((8.0/3.0) * mu * collective_pitch) - (2 * mu * (lambda_c + lambda_i)) -
+                     ((16.0/lock_number) * (q / omega))) / (1 - 0.5 * mu**2)
+        thrust_coef = thrust_slope * ((2./3.) * collective_pitch * (1 + (1.5 * mu**2)) - (lambda_c + lambda_i))
+        thrust = thrust_coef * thrust_scale
+
+        # Drag terms are zero in pure hover, where the direction of the drag force is undefined
+        drag = drag_scale * velocity
+
+        rotor_tilt = longitudinal_cyclic - disk_tilt
+        u_dot = -g * math.sin(theta_f) - drag * u + (thrust / mass) * math.sin(rotor_tilt) - q * w
+        w_dot = g * math.cos(theta_f) - drag * w - (thrust / mass) * math.cos(rotor_tilt) + q * u
+        q_dot = (-thrust / pitch_lever) * math.sin(rotor_tilt)
+
+        return StateDerivative(u_dot, w_dot, q_dot, q)
+
+
+_equations_of_motion = None
+_equations_of_motion_lock = threading.Lock()
+
+
+def get_equations_of_motion():
+    """ Returns the process-wide :class:`EquationsOfMotion`, a new kernel is created upon the first call or whenever
+    the aircraft parameters have been invalidated and changed
+
+    :rtype: EquationsOfMotion
+    """
+    global _equations_of_motion
+    fingerprint = get_parameters().fingerprint
+    with _equations_of_motion_lock:
+        if _equations_of_motion is None or _equations_of_motion.parameters.fingerprint != fingerprint:
+            _equations_of_motion = EquationsOfMotion()
+    return _equations_of_motion
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" This file contains the class definition of the batched discrete-time simulation of the linearized EoM of the CH53
+Helicopter """
+
+__author__ = ["San Kilkis"]
+
+from scipy.linalg import expm
+from collections import OrderedDict
+import numpy as np
+
+
+class DiscreteSimulator(object):
+    """ Simulates the continuous linear system x' = Ax + Bu, y = Cx + Du by means of its exact discretization. The
+    matrix exponential of every time step is computed once and cached, after which any number of input profiles and
+    initial conditions are propagated together as a batched matrix recurrence.
+
+    Two input holds are available. With the Zero-Order Hold ('zoh') the input is constant over each time step, which is
+    exact for piecewise constant inputs sampled at the time steps. With the First-Order Hold ('foh') the input is
+    linearly interpolated between time steps, which is the algorithm of :func:`control.matlab.lsim`, thus the outputs
+    agree with lsim to within 1e-12 relative to the largest output. Both holds coincide for inputs that are constant
+    between time steps, otherwise a 'zoh' simulation leads lsim by half a time step, e.g. the response to the 1 [deg]
+    cyclic pulse of :meth:`StateSpace.plot_response` deviates by 0.3% of the peak output.
+
+    :param a_matrix: State or system matrix A of shape (n, n)
+    :type a_matrix: numpy.ndarray
+
+    :param b_matrix: Input matrix B of shape (n, m)
+    :type b_matrix: numpy.ndarray
+
+    :param c_matrix: Output matrix C of shape (p, n), defaults to the identity matrix
+    :type c_matrix: numpy.ndarray
+
+    :param d_matrix: Feed-forward matrix D of shape (p, m), defaults to zeros
+    :type d_matrix: numpy.ndarray
+
+    :param max_cached: Maximum number of discretized time steps that are cached
+    :type max_cached: int
+    """
+
+    holds = ('zoh', 'foh')
+
+    def __init__(self, a_matrix, b_matrix, c_matrix=None, d_matrix=None, max_cached=64):
+        self.a_matrix = np.asarray(a_matrix, dtype=float)
+        self.b_matrix = np.asarray(b_matrix, dtype=float)
+        n, m = self.b_matrix.shape
+        self.c_matrix = np.asarray(c_matrix, dtype=float) if c_matrix is not None else np.eye(n)
+        p = self.c_matrix.shape[0]
+        self.d_matrix = np.asarray(d_matrix, dtype=float) if d_matrix is not None else np.zeros((p, m))
+        self.max_cached = max_cached
+        self.cache = OrderedDict()
+
+    def discretize(self, dt, hold='zoh'):
+        """ Exact discretization of the system over a single time step, obtained from the matrix exponential of the
+        system augmented with the input (and its rate of change for a First-Order Hold)
+
+        :param dt: Time step in SI second [s]
+        :type dt: float
+
+        :param hold: Input hold, either 'zoh' or 'foh'
+        :type hold: str
+
+        :return: Discrete state matrix and the input matrices of the input at the start and end of the step, where
+                 the latter is zero for a Zero-Order Hold
+        :rtype: tuple
+        """
+        if hold not in self.holds:
+            raise ValueError("Unknown input hold '%s', use one of %s" % (hold, ', '.join(self.holds)))
+        key = (float(dt), hold)
+        try:
+            return self.cache[key]
+        except KeyError:
+            pass
+
+        n, m = self.b_matrix.shape
+        if hold == 'zoh':
+            augmented = np.zeros((n + m, n + m))
+            augmented[:n, :n], augmented[:n, n:] = self.a_matrix * dt, self.b_matrix * dt
+            exponential = expm(augmented)
+            matrices = exponential[:n, :n], exponential[:n, n:], np.zeros((n, m))
+        else:
+            augmented = np.zeros((n + 2 * m, n + 2 * m))
+            augmented[:n, :n], augmented[:n, n:n + m] = self.a_matrix * dt, self.b_matrix * dt
+            augmented[n:n + m, n + m:] = np.eye(m)
+            exponential = expm(augmented)
+            end = exponential[:n, n + m:]
+            matrices = exponential[:n, :n], exponential[:n, n:n + m] - end, end
+
+        self.cache[key] = matrices
+        while len(self.cache) > self.max_cached:
+            self.cache.popitem(last=False)
+        return matrices
+
+    def simulate(self, inputs, time, initial_states=None, hold='zoh'):
+        """ Propagates a single or a batch of input profiles and initial conditions. A leading batch dimension N of
+        either argument is broadcast against the other.
+
+        :param inputs: Input at every time instance of shape (n_t, m) or (N, n_t, m)
+        :type inputs: numpy.ndarray
+
+        :param time: Ordered time instances in SI second [s] of length n_t
+        :type time: numpy.ndarray
+
+        :param initial_states: Initial state of shape (n,) or (N, n), zero if unspecified
+        :type initial_states: numpy.ndarray
+
+        :param hold: Input hold, either 'zoh' or 'foh'
+        :type hold: str
+
+        :return: Outputs of shape ([N,] n_t, p), time and states of shape ([N,] n_t, n), ordered as :func:`lsim`
+        :rtype: tuple
+        """
+        time = np.asarray(time, dtype=float)
+        n, m = self.b_matrix.shape
+        inputs = np.asarray(inputs, dtype=float)
+        initial_states = np.zeros(n) if initial_states is None else np.asarray(initial_states, dtype=float)
+        batched = inputs.ndim == 3 or initial_states.ndim == 2
+
+        # Time is the leading dimension internally, such that every step writes a contiguous (N, n) block
+        size = np.broadcast(inputs[..., 0, 0], initial_states[..., 0]).size if batched else 1
+        inputs = np.broadcast_to(inputs, (size, time.size, m)).transpose(1, 0, 2)
+        states = np.empty((time.size, size, n))
+        states[0] = initial_states
+
+        steps = np.diff(time)
+        # Uniform grid, as required by lsim, is discretized only once. The test is relative such that non-uniform grids
+        # of small time steps are never mistaken for uniform ones
+        if steps.size and np.allclose(steps, steps[0], rtol=1e-10, atol=0.):
+            a_discrete, b_start, b_end = self.discretize(steps[0], hold)
+            forcing = np.dot(inputs[:-1], b_start.T) + np.dot(inputs[1:], b_end.T)
+            a_transpose = a_discrete.T
+            for k in range(steps.size):
+                np.dot(states[k], a_transpose, out=states[k + 1])
+                states[k + 1] += forcing[k]
+        else:
+            for k, dt in enumerate(steps):
+                a_discrete, b_start, b_end = self.discretize(dt, hold)
+                states[k + 1] = (np.dot(states[k], a_discrete.T) + np.dot(inputs[k], b_start.T) +
+                                 np.dot(inputs[k + 1], b_end.T))
+
+        outputs = (np.dot(states, self.c_matrix.T) + np.dot(inputs, self.d_matrix.T)).transpose(1, 0, 2)
+        states = states.transpose(1, 0, 2)
+        if not batched:
+            return outputs[0], time, states[0]
+        return outputs, time, states
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" This file contains the class definition of the Linear Parameter-Varying (LPV) model of the CH53 Helicopter, which
+interpolates the linearized EoM and trim condition over airspeed """
+
+__author__ = ["San Kilkis"]
+
+import __root__
+from globs import Constants, Attribute, Variable
+from derivativemap import DerivativeMap, linearize
+from scipy.interpolate import make_interp_spline
+from collections import namedtuple
+import numpy as np
+assert __root__  # Necessary to circumvent PEP-8 Syntax violation on the __root__ import statement
+
+LPVPoint = namedtuple('LPVPoint', ['a_matrix', 'b_matrix', 'trim_state', 'trim_controls'])
+
+
+class LPVModel(Constants):
+    """ Gain-scheduling model holding the A and B matrices, together with the trim state and control inputs, on a grid
+    of velocities. All entries are stacked into a single spline, linear or cubic (not-a-knot) in velocity, such that the
+    linear model at any airspeed within the grid is obtained w/o re-linearizing. Since the matrices are interpolated
+    entry-wise, the derivatives w.r.t. velocity required for LPV control design are also available.
+
+    The grid is linearized by a :class:`DerivativeMap`, hence it is computed in parallel and cached on disk. Note that
+    the EoM fix the inflow ratio at its hover value for exactly zero airspeed, which makes the collective derivatives
+    discontinuous at hover. A hover grid point is therefore linearized at :attr:`hover_velocity` instead, such that the
+    model at zero airspeed is the continuous limit of forward flight.
+
+    :param velocities: Ordered scheduling velocities in SI meter per second [m/s], by default 2 [m/s] spacing from
+                       hover up to 10 [m/s] above cruise
+    :type velocities: numpy.ndarray
+
+    :param order: Order of the interpolating spline, 1 for linear and 3 for cubic interpolation
+    :type order: int
+
+    :param linearization: Strategy used to obtain the stability derivatives, see :class:`StabilityDerivatives`
+    :type linearization: str
+
+    :param processes: Number of worker processes used to linearize the grid, see :class:`DerivativeMap`
+    :type processes: int
+    """
+
+    velocities = Variable('velocities', 'Ordered scheduling velocities in SI meter per second [m/s]')
+    order = Variable('order', 'Order of the interpolating spline, 1 for linear and 3 for cubic')
+    linearization = Variable('linearization', "Linearization strategy, 'regression', 'central' or 'complex'")
+
+    hover_velocity = 1e-3  # Velocity at which a hover grid point is linearized in SI meter per second [m/s]
+
+    def __init__(self, velocities=None, order=3, linearization='central', processes=None):
+        if order not in (1, 3):
+            raise ValueError('Only linear (1) and cubic (3) interpolation are supported, %s was requested' % order)
+        self.velocities = np.asarray(velocities, dtype=float) if velocities is not None else \
+            np.arange(0., self.cruise_velocity + 10., 2.)
+        self.order = order
+        self.linearization = linearization
+        self.processes = processes
+
+    @Attribute
+    def derivative_map(self):
+        """ Linearized EoM at every scheduling velocity
+
+        :rtype: DerivativeMap
+        """
+        velocities = np.where(self.velocities == 0, self.hover_velocity, self.velocities)
+        return DerivativeMap(velocities, linearization=self.linearization, processes=self.processes)
+
+    @Attribute
+    def grid(self):
+        """ A-matrices (K, 4, 4), B-matrices (K, 4, 2), trim states (K, 4) and trim controls (K, 2) at the scheduling
+        velocities
+
+        :rtype: LPVPoint
+        """
+        return LPVPoint(*[values[:, 0, 0] for values in self.derivative_map.solution])
+
+    @Attribute
+    def spline(self):
+        """ Single spline through all entries of :attr:`grid`, such that a lookup evaluates one polynomial
+
+        :rtype: scipy.interpolate.BSpline
+        """
+        data = np.column_stack([values.reshape(values.shape[0], -1) for values in self.grid])
+        return make_interp_spline(self.velocities, data, k=self.order, axis=0)
+
+    @property
+    def bounds(self):
+        """ Lowest and highest scheduling velocity in SI meter per second [m/s]
+
+        :rtype: tuple
+        """
+        return self.velocities[0], self.velocities[-1]
+
+    def __call__(self, velocity, derivative=0):
+        """ Linear model, or its derivative w.r.t. velocity, at the provided :parameter:`velocity`
+
+        :param velocity: Airspeed in SI meter per second [m/s], scalar or array
+        :type velocity: float or numpy.ndarray
+
+        :param derivative: Order of the derivative w.r.t. velocity
+        :type derivative: int
+
+        :return: A and B matrices, trim state and trim controls, w/ the shape of :parameter:`velocity` as leading
+                 dimensions
+        :rtype: LPVPoint
+        """
+        velocity = np.asarray(velocity, dtype=float)
+        lower, upper = self.bounds
+        if np.any((velocity < lower) | (velocity > upper)):
+            raise ValueError('Velocities outside of the scheduled range [%1.2f, %1.2f] [m/s] are not extrapolated'
+                             % (lower, upper))
+
+        values = self.spline(velocity, nu=derivative)
+        entries, start = [], 0
+        for grid_values in self.grid:
+            shape = grid_values.shape[1:]
+            size = int(np.prod(shape))
+            entries.append(values[..., start:start + size].reshape(velocity.shape + shape))
+            start += size
+        return LPVPoint(*entries)
+
+    def state_derivative(self, states, controls):
+        """ Quasi-LPV Equations of Motion, where the model is scheduled w/ the current airspeed of every state and the
+        states and controls are perturbed w.r.t. the interpolated trim condition
+
+        :param states: u [m/s], w [m/s], q [rad/s] and theta_f [rad] of shape (..., 4)
+        :type states: numpy.ndarray
+
+        :param controls: Collective Pitch and Longitudinal Cyclic in SI radian [rad] of shape (..., 2)
+        :type controls: numpy.ndarray
+
+        :return: Time derivative of the states of shape (..., 4)
+        :rtype: numpy.ndarray
+        """
+        states, controls = np.asarray(states, dtype=float), np.asarray(controls, dtype=float)
+        model = self(np.hypot(states[..., 0], states[..., 1]))
+        return (np.einsum('...ij,...j->...i', model.a_matrix, states - model.trim_state) +
+                np.einsum('...ij,...j->...i', model.b_matrix, controls - model.trim_controls))
+
+    def interpolation_error(self, velocities=None):
+        """ Maximum absolute difference between the interpolated and the exactly linearized model, by default at the
+        midpoints of the scheduling velocities where the interpolation error is largest
+
+        :param velocities: Velocities at which the model is verified in SI meter per second [m/s]
+        :type velocities: numpy.ndarray
+
+        :return: Maximum error of every entry of :class:`LPVPoint`
+        :rtype: LPVPoint
+        """
+        if velocities is None:
+            velocities = 0.5 * (self.velocities[1:] + self.velocities[:-1])
+        interpolated, grid = self(velocities), self.derivative_map
+        exact = [linearize((v if v != 0 else self.hover_velocity, grid.masses[0], grid.altitudes[0], self.linearization,
+                            None)) for v in velocities]
+        return LPVPoint(*[float(np.max(np.abs(values - np.array(reference))))
+                          for values, reference in zip(interpolated, zip(*exact))])
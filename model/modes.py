@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" This file contains the class definition of the batched modal analysis of the linearized EoM of the CH53 Helicopter,
+which tracks the eigenmodes over a sequence of trim conditions """
+
+__author__ = ["San Kilkis"]
+
+import __root__
+from globs import Constants, Attribute, Variable
+from scipy.optimize import linear_sum_assignment
+from collections import namedtuple
+import numpy as np
+assert __root__  # Necessary to circumvent PEP-8 Syntax violation on the __root__ import statement
+
+
+class ModeTable(namedtuple('ModeTable', ['parameter', 'labels', 'eigenvalues', 'damping_ratio', 'natural_frequency',
+                                         'eigenvectors'])):
+    """ Tracked eigenmodes of a sequence of A-matrices. Every column of the (K, n) arrays `eigenvalues`,
+    `damping_ratio` and `natural_frequency` follows a single mode over the K values of `parameter`, named by the
+    corresponding entry of `labels`, while the (K, n, n) `eigenvectors` hold the mode shapes in their columns. Both
+    eigenvalues of a complex conjugate pair carry the same label. """
+
+    __slots__ = ()
+
+    def mode(self, label):
+        """ Column indices of all tracks named `label`
+
+        :rtype: list
+        """
+        indices = [i for i, name in enumerate(self.labels) if name == label]
+        if not indices:
+            raise ValueError("Unknown mode '%s', available modes are %s" % (label, ', '.join(sorted(set(self.labels)))))
+        return indices
+
+    def rows(self):
+        """ Flat table with a row per parameter value and tracked eigenvalue, ordered by mode, as used for root-locus
+        plots and exports
+
+        :rtype: numpy.recarray
+        """
+        count, size = self.eigenvalues.shape
+        return np.rec.fromarrays([np.tile(self.parameter, size),
+                                  np.repeat(np.array(self.labels), count),
+                                  self.eigenvalues.real.T.ravel(),
+                                  self.eigenvalues.imag.T.ravel(),
+                                  self.damping_ratio.T.ravel(),
+                                  self.natural_frequency.T.ravel()],
+                                 names='parameter,mode,real,imag,damping_ratio,natural_frequency')
+
+
+class ModalAnalysis(Constants):
+    """ Computes the eigenvalues and eigenvectors of a stack of A-matrices in a single vectorized call, after which the
+    modes are tracked from one parameter value (typically the velocity) to the next. Consecutive eigenvalues are paired
+    by solving an assignment problem whose cost combines the distance between the eigenvalues, relative to the
+    spectral radius, with the lack of correlation between the eigenvectors (1 - Modal Assurance Criterion). The tracks
+    are named at the :parameter:`reference` point, where the oscillatory modes are the phugoid and short period in order
+    of natural frequency, and the aperiodic modes are the heave subsidence (dominated by w) and pitch subsidence.
+
+    :param a_matrices: Stack of state matrices of shape (K, n, n), ordered w.r.t. :parameter:`parameter`
+    :type a_matrices: numpy.ndarray
+
+    :param parameter: Parameter value, such as the velocity in SI meter per second [m/s], of every A-matrix
+    :type parameter: numpy.ndarray
+
+    :param reference: Index of the A-matrix at which the modes are named
+    :type reference: int
+    """
+
+    a_matrices = Variable('a_matrices', 'Stack of state matrices of shape (K, n, n)')
+    parameter = Variable('parameter', 'Parameter value of every A-matrix, such as the velocity [m/s]')
+    reference = Variable('reference', 'Index of the A-matrix at which the modes are named')
+
+    oscillatory = ('phugoid', 'short period')
+    aperiodic = ('heave subsidence', 'pitch subsidence')
+
+    def __init__(self, a_matrices, parameter=None, reference=0):
+        self.a_matrices = np.asarray(a_matrices, dtype=float).reshape((-1,) + np.shape(a_matrices)[-2:])
+        self.parameter = np.asarray(parameter, dtype=float) if parameter is not None else \
+            np.arange(self.a_matrices.shape[0], dtype=float)
+        self.reference = reference
+
+    @classmethod
+    def from_derivative_map(cls, derivative_map, mass_index=0, altitude_index=0):
+        """ Modal analysis over the velocities of a :class:`DerivativeMap` at a single mass and altitude
+
+        :rtype: ModalAnalysis
+        """
+        return cls(derivative_map.solution.a_matrices[:, mass_index, altitude_index], derivative_map.velocities)
+
+    @Attribute
+    def eigen_decomposition(self):
+        """ Untracked eigenvalues (K, n) and eigenvectors (K, n, n) of all A-matrices
+
+        :rtype: tuple
+        """
+        return np.linalg.eig(self.a_matrices)
+
+    @staticmethod
+    def tracking_cost(eigenvalues, eigenvectors):
+        """ Cost of pairing every eigenvalue of one A-matrix with every eigenvalue of the next A-matrix
+
+        :return: Cost matrices of shape (K - 1, n, n)
+        :rtype: numpy.ndarray
+        """
+        previous, current = eigenvalues[:-1, :, None], eigenvalues[1:, None, :]
+        radius = np.max(np.abs(eigenvalues), axis=1)  # Spectral radius, which remains finite near zero eigenvalues
+        scale = np.maximum(radius[:-1], radius[1:])[:, None, None] + 1e-12
+        correlation = np.abs(np.einsum('kai,kaj->kij', eigenvectors[:-1].conj(), eigenvectors[1:]))**2
+        norms = np.einsum('kai,kai->ki', eigenvectors.conj(), eigenvectors).real
+        mac = correlation / (norms[:-1, :, None] * norms[1:, None, :])
+        return np.abs(current - previous) / scale + (1 - mac)
+
+    @Attribute
+    def tracks(self):
+        """ Permutation of the eigenvalues of every A-matrix such that every column follows a single mode
+
+        :rtype: numpy.ndarray
+        """
+        eigenvalues, eigenvectors = self.eigen_decomposition
+        count, size = eigenvalues.shape
+        order = np.empty((count, size), dtype=int)
+        order[0] = np.arange(size)
+        for k, cost in enumerate(self.tracking_cost(eigenvalues, eigenvectors)):
+            rows, columns = linear_sum_assignment(cost)
+            assignment = np.empty(size, dtype=int)
+            assignment[rows] = columns
+            order[k + 1] = assignment[order[k]]
+        return order
+
+    def name_modes(self, eigenvalues, eigenvectors):
+        """ Names the modes of a single A-matrix, see :class:`ModalAnalysis`
+
+        :param eigenvalues: Eigenvalues of shape (n,)
+        :type eigenvalues: numpy.ndarray
+
+        :param eigenvectors: Eigenvectors of shape (n, n) in the columns
+        :type eigenvectors: numpy.ndarray
+
+        :return: Label of every eigenvalue
+        :rtype: list
+        """
+        labels = ['mode %d' % i for i in range(eigenvalues.size)]
+        tolerance = 1e-9 * np.max(np.abs(eigenvalues))
+
+        upper = [i for i in np.argsort(np.abs(eigenvalues)) if eigenvalues[i].imag > tolerance]
+        for name, i in zip(self.oscillatory, upper):
+            conjugate = np.argmin(np.abs(eigenvalues - eigenvalues[i].conj()))
+            labels[i] = labels[conjugate] = name
+
+        real = [i for i in range(eigenvalues.size) if abs(eigenvalues[i].imag) <= tolerance]
+        if eigenvectors.shape[0] > 1:  # Heave is the mode with the largest vertical velocity share, w is the 2nd state
+            shares = np.abs(eigenvectors[1]) / np.sum(np.abs(eigenvectors), axis=0)
+            real.sort(key=lambda i: -shares[i])
+        for name, i in zip(self.aperiodic, real):
+            labels[i] = name
+        return labels
+
+    @Attribute
+    def table(self):
+        """ Tracked and labeled eigenvalues, damping ratios, natural frequencies and eigenvectors
+
+        :rtype: ModeTable
+        """
+        eigenvalues, eigenvectors = self.eigen_decomposition
+        order, points = self.tracks, np.arange(self.tracks.shape[0])[:, None]
+        eigenvalues = eigenvalues[points, order]
+        eigenvectors = eigenvectors[points, :, order].transpose(0, 2, 1)
+
+        natural_frequency = np.abs(eigenvalues)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            damping_ratio = np.where(natural_frequency > 0, -eigenvalues.real / natural_frequency, np.nan)
+
+        labels = self.name_modes(eigenvalues[self.reference], eigenvectors[self.reference])
+        return ModeTable(self.parameter, labels, eigenvalues, damping_ratio, natural_frequency, eigenvectors)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" This file contains the class definition of the fixed-step real-time simulation of the longitudinal Equations of
+Motion (EoM) of the CH53 Helicopter, meant to be driven by an external pilot-in-the-loop or controller process """
+
+__author__ = ["San Kilkis"]
+
+import __root__
+from dynamics import get_equations_of_motion
+from trimcache import get_trim_cache
+from collections import namedtuple
+from timeit import default_timer
+from bisect import bisect_right
+import numpy as np
+import time
+assert __root__  # Necessary to circumvent PEP-8 Syntax violation on the __root__ import statement
+
+Telemetry = namedtuple('Telemetry', ['steps', 'simulated_time', 'wall_time', 'real_time_factor', 'overruns',
+                                     'mean_latency', 'max_latency', 'bin_edges', 'counts'])
+
+
+class RealTimeSimulation(object):
+    """ Advances the non-linear longitudinal Equations of Motion of the CH-53 by a single fixed time step per call of
+    :meth:`step`, at a rate of typically 100 to 500 [Hz]. The trim condition, the scalar
+    :meth:`EquationsOfMotion.evaluate` and the step sizes are bound upon construction, thus a step only performs float
+    arithmetic and does not create arrays or read lazy attributes.
+
+    Every step is timed and recorded in a latency histogram with logarithmic bins. A step overruns if it finishes after
+    its deadline, which is one period after the previous deadline when the loop is paced and one period after the start
+    of the step otherwise. The real-time factor is the simulated time divided by the elapsed wall-clock time since the
+    first step, thus a paced loop which keeps up has a real-time factor of 1.
+
+    :param velocity: Forward flight velocity of the initial trim condition in SI meter per second [m/s]
+    :type velocity: float
+
+    :param rate: Step rate in SI Hertz [Hz]
+    :type rate: float
+
+    :param method: Integration scheme, either 'euler' or 'rk4'
+    :type method: str
+
+    :param paced: Sleeps until the deadline of every step, such that the model runs in real-time
+    :type paced: bool
+
+    :param bin_edges: Edges of the latency histogram in SI second [s], by default logarithmic between 1 [us] and 1 [s]
+    :type bin_edges: collections.Sequence
+    """
+
+    methods = ('euler', 'rk4')
+
+    def __init__(self, velocity=0.0, rate=200., method='rk4', paced=False, bin_edges=None):
+        if rate <= 0:
+            raise ValueError('The step rate must be positive, %s [Hz] was requested' % rate)
+        if method not in self.methods:
+            raise ValueError("Unknown integration method '%s', use one of %s" % (method, ', '.join(self.methods)))
+
+        trim_case = get_trim_cache().get(velocity)
+        self.trim_state = (trim_case.u, trim_case.w, 0., trim_case.fuselage_tilt)
+        self.trim_controls = (trim_case.collective_pitch, trim_case.longitudinal_cyclic)
+        self.rate, self.period = float(rate), 1. / rate
+        self.method = method
+        self.paced = paced
+        self.evaluate = get_equations_of_motion().evaluate
+
+        self.bin_edges = list(bin_edges) if bin_edges is not None else np.logspace(-6, 0, 61).tolist()
+        self.reset()
+
+    def reset(self, state=None):
+        """ Returns to the trim condition, or the provided :parameter:`state`, and clears the telemetry
+
+        :param state: u [m/s], w [m/s], q [rad/s] and theta_f [rad]
+        :type state: tuple
+        """
+        self.state = tuple(float(value) for value in state) if state is not None else self.trim_state
+        self.time = 0.
+        self.steps = 0
+        self.overruns = 0
+        self.total_latency = 0.
+        self.max_latency = 0.
+        self.counts = [0] * (len(self.bin_edges) + 1)  # Including under- and overflow bins
+        self.start = None
+        self.deadline = None
+
+    def step(self, controls=None):
+        """ Advances the model by one period while holding the control inputs
+
+        :param controls: Collective Pitch and Longitudinal Cyclic in SI radian [rad], the trim inputs if unspecified
+        :type controls: tuple
+
+        :return: u [m/s], w [m/s], q [rad/s] and theta_f [rad] at the end of the step
+        :rtype: tuple
+        """
+        started = default_timer()
+        if self.start is None:
+            self.start, self.deadline = started, started
+        collective_pitch, longitudinal_cyclic = controls if controls is not None else self.trim_controls
+        evaluate, dt = self.evaluate, self.period
+
+        u, w, q, theta_f = self.state
+        k1 = evaluate(u, w, q, theta_f, collective_pitch, longitudinal_cyclic)
+        if self.method == 'euler':
+            self.state = (u + dt * k1[0], w + dt * k1[1], q + dt * k1[2], theta_f + dt * k1[3])
+        else:
+            h = 0.5 * dt
+            k2 = evaluate(u + h * k1[0], w + h * k1[1], q + h * k1[2], theta_f + h * k1[3],
+                          collective_pitch, longitudinal_cyclic)
+            k3 = evaluate(u + h * k2[0], w + h * k2[1], q + h * k2[2], theta_f + h * k2[3],
+                          collective_pitch, longitudinal_cyclic)
+            k4 = evaluate(u + dt * k3[0], w + dt * k3[1], q + dt * k3[2], theta_f + dt * k3[3],
+                          collective_pitch, longitudinal_cyclic)
+            c = dt / 6.
+            self.state = (u + c * (k1[0] + 2 * k2[0] + 2 * k3[0] + k4[0]),
+                          w + c * (k1[1] + 2 * k2[1] + 2 * k3[1] + k4[1]),
+                          q + c * (k1[2] + 2 * k2[2] + 2 * k3[2] + k4[2]),
+                          theta_f + c * (k1[3] + 2 * k2[3] + 2 * k3[3] + k4[3]))
+        self.time += dt
+
+        finished = default_timer()
+        self.record(finished - started, finished, started)
+        if self.paced and finished < self.deadline:
+            time.sleep(self.deadline - finished)
+        return self.state
+
+    def record(self, latency, finished, started):
+        """ Adds the latency of a single step to the telemetry and advances the deadline
+
+        :param latency: Duration of the step in SI second [s]
+        :type latency: float
+        """
+        self.steps += 1
+        self.total_latency += latency
+        if latency > self.max_latency:
+            self.max_latency = latency
+        self.counts[bisect_right(self.bin_edges, latency)] += 1
+
+        self.deadline = (self.deadline if self.paced else started) + self.period
+        if finished > self.deadline:
+            self.overruns += 1
+            if self.paced:  # Restarting the schedule instead of attempting to catch up with a burst of steps
+                self.deadline = finished
+
+    @property
+    def telemetry(self):
+        """ Timing statistics of all steps since the last :meth:`reset`, where the histogram `counts` include an
+        underflow and an overflow bin w.r.t. the `bin_edges`
+
+        :rtype: Telemetry
+        """
+        wall_time = default_timer() - self.start if self.start is not None else 0.
+        return Telemetry(steps=self.steps,
+                         simulated_time=self.time,
+                         wall_time=wall_time,
+                         real_time_factor=self.time / wall_time if wall_time > 0 else float('nan'),
+                         overruns=self.overruns,
+                         mean_latency=self.total_latency / self.steps if self.steps else float('nan'),
+                         max_latency=self.max_latency,
+                         bin_edges=np.array(self.bin_edges),
+                         counts=np.array(self.counts))
+
+
+if __name__ == '__main__':
+    simulation = RealTimeSimulation(velocity=30., rate=200., paced=True)
+    for _ in range(400):
+        simulation.step()
+    print simulation.telemetry
@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" This file contains the class definitions of the time-indexed control input schedules which drive the non-linear and
+linear simulations of the CH53 Helicopter """
+
+__author__ = ["San Kilkis"]
+
+from bisect import bisect_right
+import numpy as np
+
+
+class InputSignal(object):
+    """ Time-indexed input of a single control channel defined by breakpoints. Between breakpoints the value is either
+    held ('previous', i.e. a Zero-Order Hold where the value of a breakpoint applies from that instance onwards) or
+    linearly interpolated ('linear'). Before the first and after the last breakpoint the end values are held.
+
+    Scalar lookups, as performed every step inside of the integrators, use a binary search on plain lists, while arrays
+    of time instances are evaluated in a single vectorized call.
+
+    :param times: Ordered breakpoint time instances in SI second [s], the first one may be -inf
+    :type times: collections.Sequence
+
+    :param values: Input values at the breakpoints in SI radian [rad]
+    :type values: collections.Sequence
+
+    :param kind: Interpolation between breakpoints, either 'previous' or 'linear'
+    :type kind: str
+    """
+
+    kinds = ('previous', 'linear')
+
+    def __init__(self, times, values, kind='previous'):
+        if kind not in self.kinds:
+            raise ValueError("Unknown interpolation '%s', use one of %s" % (kind, ', '.join(self.kinds)))
+        self.times = [float(t) for t in times]
+        self.values = [float(v) for v in values]
+        if len(self.times) != len(self.values) or len(self.times) == 0:
+            raise ValueError('Every breakpoint requires exactly one value')
+        if any(later < earlier for earlier, later in zip(self.times, self.times[1:])):
+            raise ValueError('Breakpoint time instances must be ordered')
+        self.kind = kind
+
+    @classmethod
+    def constant(cls, value):
+        """ Input which is constant in time """
+        return cls([-np.inf], [value])
+
+    @classmethod
+    def from_array(cls, time, values, kind='linear'):
+        """ Input sampled at arbitrary time instances, e.g. a recorded or optimized input sequence
+
+        :param time: Ordered time instances in SI second [s]
+        :type time: numpy.ndarray
+
+        :param values: Input at every time instance in SI radian [rad]
+        :type values: numpy.ndarray
+        """
+        return cls(time, values, kind)
+
+    @classmethod
+    def piecewise(cls, segments):
+        """ Sum of constant segments, each segment holds its value on the half-open interval [start, end)
+
+        :param segments: Tuples of start time [s], end time [s] and value [rad]
+        :type segments: collections.Sequence
+
+        :rtype: InputSignal
+        """
+        edges = sorted(set(t for start, end, _ in segments for t in (start, end)))
+        values = [sum(value for start, end, value in segments if start <= edge < end) for edge in edges]
+        return cls([-np.inf] + edges, [0.] + values)
+
+    @classmethod
+    def step(cls, amplitude, start=0.):
+        """ Step of `amplitude` [rad] applied from `start` [s] onwards """
+        return cls.piecewise([(start, np.inf, amplitude)])
+
+    @classmethod
+    def pulse(cls, amplitude, start, duration):
+        """ Rectangular pulse of `amplitude` [rad] lasting `duration` [s] from `start` [s] onwards """
+        return cls.piecewise([(start, start + duration, amplitude)])
+
+    @classmethod
+    def multistep(cls, amplitude, start, unit, pattern):
+        """ Sequence of consecutive pulses of alternating sign, as used for system identification
+
+        :param amplitude: Magnitude of the pulses in SI radian [rad]
+        :type amplitude: float
+
+        :param start: Start of the first pulse in SI second [s]
+        :type start: float
+
+        :param unit: Duration of a single unit of the pattern in SI second [s]
+        :type unit: float
+
+        :param pattern: Duration of every pulse in units, i.e. (1, 1) for a doublet or (3, 2, 1, 1) for a 3-2-1-1
+        :type pattern: collections.Sequence
+
+        :rtype: InputSignal
+        """
+        segments, begin = [], start
+        for i, units in enumerate(pattern):
+            end = begin + units * unit
+            segments.append((begin, end, amplitude if i % 2 == 0 else -amplitude))
+            begin = end
+        return cls.piecewise(segments)
+
+    @classmethod
+    def doublet(cls, amplitude, start, duration):
+        """ Positive and negative pulse of `amplitude` [rad] which both last `duration` [s] """
+        return cls.multistep(amplitude, start, duration, (1, 1))
+
+    @classmethod
+    def three_two_one_one(cls, amplitude, start, unit):
+        """ 3-2-1-1 sequence of alternating pulses with durations of 3, 2, 1 and 1 `unit` [s] """
+        return cls.multistep(amplitude, start, unit, (3, 2, 1, 1))
+
+    def __call__(self, t):
+        """ Input at time `t` [s], either a float or an array of time instances
+
+        :rtype: float or numpy.ndarray
+        """
+        if np.ndim(t) != 0:
+            return self.sample(t)
+
+        times, values = self.times, self.values
+        i = bisect_right(times, t)
+        if i == 0:
+            return values[0]
+        if self.kind == 'previous' or i == len(times):
+            return values[i - 1]
+        t0, t1 = times[i - 1], times[i]
+        return values[i - 1] + (values[i] - values[i - 1]) * (t - t0) / (t1 - t0)
+
+    def sample(self, time):
+        """ Vectorized evaluation at an array of time instances [s]
+
+        :rtype: numpy.ndarray
+        """
+        time = np.asarray(time, dtype=float)
+        if self.kind == 'linear':
+            return np.interp(time, self.times, self.values)
+        indices = np.searchsorted(self.times, time, side='right') - 1
+        return np.asarray(self.values)[np.clip(indices, 0, None)]
+
+
+class ControlSchedule(object):
+    """ Time-indexed collective pitch and longitudinal cyclic inputs, used as the `controls` of the non-linear
+    simulations and sampled into the input matrix of :meth:`StateSpace.simulate`. Every channel accepts an
+    :class:`InputSignal`, a constant, a tuple of (time, values) arrays which are linearly interpolated, or an arbitrary
+    function of time. An `offset`, such as the trim control deflection, is added to both channels, which allows the same
+    schedule to drive the linear model (perturbations) and the non-linear model (absolute inputs).
+
+    :param collective: Collective Pitch input in SI radian [rad]
+    :type collective: InputSignal or float or tuple or function
+
+    :param cyclic: Longitudinal Cyclic input in SI radian [rad]
+    :type cyclic: InputSignal or float or tuple or function
+
+    :param offset: Collective Pitch and Longitudinal Cyclic added to the inputs in SI radian [rad], these may be arrays
+                   to offset every trajectory of a :class:`MonteCarloSimulation` individually
+    :type offset: tuple
+    """
+
+    def __init__(self, collective=0., cyclic=0., offset=(0., 0.)):
+        self.collective = self.as_signal(collective)
+        self.cyclic = self.as_signal(cyclic)
+        self.offset = offset
+
+    @staticmethod
+    def as_signal(channel):
+        """ Converts the supported input definitions of a single channel into a function of time
+
+        :rtype: InputSignal or function
+        """
+        if isinstance(channel, InputSignal) or callable(channel):
+            return channel
+        if isinstance(channel, tuple) and len(channel) == 2:
+            return InputSignal.from_array(*channel)
+        return InputSignal.constant(channel)
+
+    def with_offset(self, collective, cyclic):
+        """ Copy of the schedule around a different offset, e.g. the trim condition of the simulated flight velocity
+
+        :rtype: ControlSchedule
+        """
+        return ControlSchedule(self.collective, self.cyclic, (collective, cyclic))
+
+    def __call__(self, t):
+        """ Collective Pitch and Longitudinal Cyclic at time `t` [s] in SI radian [rad]
+
+        :rtype: tuple
+        """
+        return self.collective(t) + self.offset[0], self.cyclic(t) + self.offset[1]
+
+    def sample(self, time):
+        """ Inputs at an array of time instances [s], functions which do not accept arrays are evaluated per instance.
+        Only scalar offsets are supported, as every column holds the input of a single trajectory.
+
+        :return: Collective Pitch and Longitudinal Cyclic in SI radian [rad] of shape (n, 2)
+        :rtype: numpy.ndarray
+        """
+        time = np.asarray(time, dtype=float)
+        channels = []
+        for channel, offset in zip((self.collective, self.cyclic), self.offset):
+            if isinstance(channel, InputSignal):
+                values = channel.sample(time)
+            else:
+                values = np.array([channel(t) for t in time], dtype=float)
+            channels.append(values + offset)
+        return np.column_stack(channels)
@@ -0,0 +1,364 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" This file contains the class definition of the non-linear time-marching simulation of the longitudinal Equations
+of Motion (EoM) of the CH53 Helicopter """
+
+__author__ = ["San Kilkis"]
+
+import __root__
+from globs import Constants, Attribute, Variable
+from dynamics import get_equations_of_motion
+from trim import BatchTrim
+from scipy.integrate import solve_ivp
+from collections import namedtuple
+import numpy as np
+import warnings
+assert __root__  # Necessary to circumvent PEP-8 Syntax violation on the __root__ import statement
+
+
+class SimulationResult(namedtuple('SimulationResult', ['time', 'states', 'controls', 'method', 'evaluations'])):
+    """ Time history of a simulation. The `states` array has shape (n, 4) in the order u, w, q, theta_f and the
+    `controls` array has shape (n, 2) in the order collective pitch, longitudinal cyclic, both in SI units. The number
+    of evaluations of the Equations of Motion is stored in `evaluations`. """
+
+    __slots__ = ()
+
+    @property
+    def u(self):
+        """ Horizontal Velocity in SI meter per second [m/s] """
+        return self.states[:, 0]
+
+    @property
+    def w(self):
+        """ Vertical Velocity in SI meter per second [m/s] """
+        return self.states[:, 1]
+
+    @property
+    def q(self):
+        """ Pitch Rate in SI radian per second [rad/s] """
+        return self.states[:, 2]
+
+    @property
+    def theta_f(self):
+        """ Fuselage Tilt-Angle (Positive up) in SI radian [rad] """
+        return self.states[:, 3]
+
+    @property
+    def collective_pitch(self):
+        """ Collective Pitch in SI radian [rad] """
+        return self.controls[:, 0]
+
+    @property
+    def longitudinal_cyclic(self):
+        """ Longitudinal Cyclic in SI radian [rad] """
+        return self.controls[:, 1]
+
+
+class MonteCarloResult(namedtuple('MonteCarloResult', ['time', 'mean', 'std', 'levels', 'percentiles', 'peak_excursion',
+                                                     'final_states', 'evaluations'])):
+    """ Summary statistics of a batch of trajectories. The `mean` and `std` arrays have shape (n, 4) and the
+    `percentiles` array has shape (n, p, 4) for the p percentile `levels`, all taken over the trajectories at every time
+    instance. The largest absolute deviation of every trajectory from its initial state is stored in `peak_excursion`
+    of shape (N, 4), together with the `final_states` of shape (N, 4). States are in the order u, w, q, theta_f. """
+
+    __slots__ = ()
+
+    def percentile(self, level):
+        """ Time history of a single percentile `level` [%] of shape (n, 4)
+
+        :rtype: numpy.ndarray
+        """
+        matches = np.flatnonzero(np.isclose(self.levels, level))
+        if matches.size == 0:
+            raise ValueError('Percentile %s was not computed, available levels are %s' % (level, self.levels))
+        return self.percentiles[:, matches[0]]
+
+
+class NonlinearSimulation(Constants):
+    """ Integrates the non-linear longitudinal Equations of Motion of the CH-53 in time. The state and control
+    histories are written into preallocated arrays and the right-hand side is the stateless
+    :meth:`EquationsOfMotion.evaluate`, such that no objects are created while time-marching. No plots are made, the
+    time history is returned in :attr:`result` instead.
+
+    :param initial_state: Initial u [m/s], w [m/s], q [rad/s] and theta_f [rad]
+    :type initial_state: tuple
+
+    :param controls: Control inputs as a function of time, f(t) -> (collective pitch, longitudinal cyclic) in SI radian
+                     [rad], or a constant tuple of both
+    :type controls: function or tuple
+
+    :param time: Ordered time instances at which the states are returned in SI second [s]
+    :type time: numpy.ndarray
+
+    :param method: Integration scheme, 'euler' for Forward Euler and 'rk4' for the classical Runge-Kutta scheme on the
+                   :parameter:`time` grid, or 'rk45' for the adaptive Runge-Kutta scheme of `solve_ivp`
+    :type method: str
+
+    :param solver_options: Additional keyword arguments passed to `solve_ivp` when using 'rk45', such as `max_step`
+                           to resolve short control pulses
+    """
+
+    initial_state = Variable('initial_state', 'Initial u [m/s], w [m/s], q [rad/s] and theta_f [rad]')
+    controls = Variable('controls', 'Control inputs as a function of time in SI radian [rad]')
+    time = Variable('time', 'Ordered time instances in SI second [s]')
+    method = Variable('method', "Integration scheme, 'euler', 'rk4' or 'rk45'")
+
+    methods = ('euler', 'rk4', 'rk45')
+
+    def __init__(self, initial_state, controls, time=np.linspace(0, 40, 1000), method='rk4', **solver_options):
+        self.initial_state = tuple(float(value) for value in initial_state)
+        self.controls = controls
+        self.time = np.asarray(time, dtype=float)
+        self.method = method
+        self.solver_options = solver_options
+
+    @Attribute
+    def equations_of_motion(self):
+        """ Vectorized Equations of Motion shared by all simulations
+
+        :rtype: EquationsOfMotion
+        """
+        return get_equations_of_motion()
+
+    @Attribute
+    def control_function(self):
+        """ Control inputs as a function of time, constant :parameter:`controls` are wrapped into a function
+
+        :rtype: function
+        """
+        if callable(self.controls):
+            return self.controls
+        collective_pitch, longitudinal_cyclic = (float(value) for value in self.controls)
+        return lambda t: (collective_pitch, longitudinal_cyclic)
+
+    def derivative(self, t, state):
+        """ Right-hand side of the system of Ordinary Differential Equations (ODEs)
+
+        :param t: Time in SI second [s]
+        :type t: float
+
+        :param state: u [m/s], w [m/s], q [rad/s] and theta_f [rad]
+        :type state: tuple
+
+        :return: Time derivatives of the state
+        :rtype: StateDerivative
+        """
+        collective_pitch, longitudinal_cyclic = self.control_function(t)
+        u, w, q, theta_f = state
+        return self.equations_of_motion.evaluate(u, w, q, theta_f, collective_pitch, longitudinal_cyclic)
+
+    @Attribute
+    def result(self):
+        """ Time history of the states and control inputs obtained with the selected :parameter:`method`
+
+        :rtype: SimulationResult
+        """
+        if self.method not in self.methods:
+            raise ValueError("Unknown integration method '%s', use one of %s" % (self.method, ', '.join(self.methods)))
+
+        time = self.time
+        controls = np.empty((time.size, 2))
+        for i, t in enumerate(time):
+            controls[i] = self.control_function(t)
+
+        if self.method == 'rk45':
+            states, evaluations = self.integrate_adaptive(time)
+        else:
+            states, evaluations = self.integrate_fixed_step(time, self.method)
+        return SimulationResult(time, states, controls, self.method, evaluations)
+
+    def integrate_fixed_step(self, time, method):
+        """ Marches the states over the :parameter:`time` grid with a fixed-step scheme
+
+        :param time: Ordered time instances in SI second [s]
+        :type time: numpy.ndarray
+
+        :param method: Either 'euler' or 'rk4'
+        :type method: str
+
+        :return: States of shape (n, 4) and the number of evaluations of the Equations of Motion
+        :rtype: tuple
+        """
+        states = np.empty((time.size, 4))
+        states[0] = self.initial_state
+        state = self.initial_state
+        derivative = self.derivative
+
+        for i in range(time.size - 1):
+            t, dt = time[i], time[i + 1] - time[i]
+            k1 = derivative(t, state)
+            if method == 'euler':
+                state = tuple(x + dt * dx for x, dx in zip(state, k1))
+            else:
+                k2 = derivative(t + 0.5 * dt, tuple(x + 0.5 * dt * dx for x, dx in zip(state, k1)))
+                k3 = derivative(t + 0.5 * dt, tuple(x + 0.5 * dt * dx for x, dx in zip(state, k2)))
+                k4 = derivative(t + dt, tuple(x + dt * dx for x, dx in zip(state, k3)))
+                state = tuple(x + (dt / 6.) * (d1 + 2 * d2 + 2 * d3 + d4)
+                              for x, d1, d2, d3, d4 in zip(state, k1, k2, k3, k4))
+            states[i + 1] = state
+
+        return states, (time.size - 1) * (1 if method == 'euler' else 4)
+
+    def integrate_adaptive(self, time):
+        """ Integrates the states with the adaptive Runge-Kutta 4(5) scheme of `solve_ivp`, the solution is returned at
+        the :parameter:`time` instances
+
+        :param time: Ordered time instances in SI second [s]
+        :type time: numpy.ndarray
+
+        :return: States of shape (n, 4) and the number of evaluations of the Equations of Motion
+        :rtype: tuple
+        """
+        def func(t, y):
+            return self.derivative(t, y.tolist())
+
+        solution = solve_ivp(func, (time[0], time[-1]), self.initial_state, method='RK45', t_eval=time,
+                             **self.solver_options)
+        if not solution.success:
+            warnings.warn('Adaptive integration failed: %s' % solution.message, RuntimeWarning)
+
+        states = np.full((time.size, 4), np.nan)
+        states[:solution.y.shape[1]] = solution.y.T
+        return states, solution.nfev
+
+
+class MonteCarloSimulation(Constants):
+    """ Integrates a batch of N trajectories of the non-linear longitudinal Equations of Motion of the CH-53 at once, as
+    required for dispersion studies. The states are advanced together as an (N, 4) array through the vectorized
+    :class:`EquationsOfMotion`, which evaluates the same equations as :class:`StabilityDerivatives`. Trajectories are
+    not stored, instead the statistics of :class:`MonteCarloResult` are updated at every time step such that the memory
+    footprint scales with either the number of trajectories or the number of time steps, but never their product.
+
+    :param initial_states: Initial u [m/s], w [m/s], q [rad/s] and theta_f [rad] of every trajectory, shape (N, 4)
+    :type initial_states: numpy.ndarray
+
+    :param controls: Control inputs as a function of time, f(t) -> (collective pitch, longitudinal cyclic) in SI radian
+                     [rad] where both are broadcastable to shape (N,), or a constant array of shape (N, 2) or (2,)
+    :type controls: function or numpy.ndarray
+
+    :param time: Ordered time instances at which the statistics are computed in SI second [s]
+    :type time: numpy.ndarray
+
+    :param method: Fixed-step integration scheme, either 'euler' or 'rk4'
+    :type method: str
+
+    :param levels: Percentiles which are tracked in percent [%]
+    :type levels: tuple
+    """
+
+    initial_states = Variable('initial_states', 'Initial states of every trajectory, shape (N, 4)')
+    controls = Variable('controls', 'Control inputs as a function of time in SI radian [rad]')
+    time = Variable('time', 'Ordered time instances in SI second [s]')
+    method = Variable('method', "Fixed-step integration scheme, 'euler' or 'rk4'")
+    levels = Variable('levels', 'Percentiles which are tracked in percent [%]')
+
+    methods = ('euler', 'rk4')
+
+    def __init__(self, initial_states, controls, time=np.linspace(0, 40, 1000), method='rk4', levels=(5., 50., 95.)):
+        self.initial_states = np.array(np.atleast_2d(initial_states), dtype=float)
+        self.controls = controls
+        self.time = np.asarray(time, dtype=float)
+        self.method = method
+        self.levels = np.asarray(levels, dtype=float)
+
+    @staticmethod
+    def trim_conditions(velocities):
+        """ Trimmed states and control inputs at an array of forward flight velocities, used to start trajectories at
+        different trim speeds
+
+        :param velocities: Forward Flight Velocities in SI meter per second [m/s]
+        :type velocities: numpy.ndarray
+
+        :return: Initial states of shape (N, 4) and trim control inputs of shape (N, 2)
+        :rtype: tuple
+        """
+        trim = BatchTrim(np.atleast_1d(velocities))
+        states = np.column_stack((trim.u, trim.w, np.zeros_like(trim.u), trim.fuselage_tilt))
+        return states, np.column_stack((trim.collective_pitch, trim.longitudinal_cyclic))
+
+    @property
+    def size(self):
+        """ Number of trajectories N """
+        return self.initial_states.shape[0]
+
+    @Attribute
+    def equations_of_motion(self):
+        """ Vectorized Equations of Motion shared by all simulations
+
+        :rtype: EquationsOfMotion
+        """
+        return get_equations_of_motion()
+
+    @Attribute
+    def control_function(self):
+        """ Control inputs as a function of time, constant :parameter:`controls` are wrapped into a function
+
+        :rtype: function
+        """
+        if callable(self.controls):
+            return self.controls
+        collective_pitch, longitudinal_cyclic = np.asarray(self.controls, dtype=float).T
+        return lambda t: (collective_pitch, longitudinal_cyclic)
+
+    def derivative(self, t, states, out):
+        """ Right-hand side of the system of Ordinary Differential Equations (ODEs) for all trajectories
+
+        :param t: Time in SI second [s]
+        :type t: float
+
+        :param states: States of all trajectories, shape (N, 4)
+        :type states: numpy.ndarray
+
+        :param out: Preallocated array of shape (N, 4) in which the time derivatives are written
+        :type out: numpy.ndarray
+
+        :return: Time derivatives of the states, i.e. :parameter:`out`
+        :rtype: numpy.ndarray
+        """
+        collective_pitch, longitudinal_cyclic = self.control_function(t)
+        derivatives = self.equations_of_motion(states[:, 0], states[:, 1], states[:, 2], states[:, 3],
+                                               collective_pitch, longitudinal_cyclic)
+        for i, derivative in enumerate(derivatives):
+            out[:, i] = derivative
+        return out
+
+    @Attribute
+    def result(self):
+        """ Summary statistics of all trajectories obtained with the selected :parameter:`method`
+
+        :rtype: MonteCarloResult
+        """
+        if self.method not in self.methods:
+            raise ValueError("Unknown integration method '%s', use one of %s" % (self.method, ', '.join(self.methods)))
+
+        time, initial = self.time, self.initial_states
+        mean, std = np.empty((time.size, 4)), np.empty((time.size, 4))
+        percentiles = np.empty((time.size, self.levels.size, 4))
+        peak_excursion = np.zeros_like(initial)
+
+        state, stage = initial.copy(), np.empty_like(initial)
+        k1, k2, k3, k4 = [np.empty_like(initial) for _ in range(4)]
+        excursion = np.empty_like(initial)
+        derivative = self.derivative
+
+        for i in range(time.size):
+            mean[i], std[i] = np.mean(state, axis=0), np.std(state, axis=0)
+            percentiles[i] = np.percentile(state, self.levels, axis=0)
+            np.abs(np.subtract(state, initial, out=excursion), out=excursion)
+            np.fmax(peak_excursion, excursion, out=peak_excursion)
+            if i == time.size - 1:
+                break
+
+            t, dt = time[i], time[i + 1] - time[i]
+            derivative(t, state, k1)
+            if self.method == 'euler':
+                state += dt * k1
+            else:
+                derivative(t + 0.5 * dt, np.add(state, 0.5 * dt * k1, out=stage), k2)
+                derivative(t + 0.5 * dt, np.add(state, 0.5 * dt * k2, out=stage), k3)
+                derivative(t + dt, np.add(state, dt * k3, out=stage), k4)
+                state += (dt / 6.) * (k1 + 2 * k2 + 2 * k3 + k4)
+
+        evaluations = (time.size - 1) * (1 if self.method == 'euler' else 4)
+        return MonteCarloResult(time, mean, std, self.levels, percentiles, peak_excursion, state, evaluations)
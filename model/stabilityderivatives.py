@@ -6,12 +6,14 @@ conditions of the CH53 Helicopter """
 
 from __future__ import print_function
 import model.__root__
-from globs import Constants, Attribute, working_dir
-from inertia.ch53_inertia import CH53Inertia
+from globs import Constants, Attribute, Variable, working_dir
 from model.trim import Trim
+from dynamics import get_equations_of_motion
+from simulation import NonlinearSimulation
+from schedules import ControlSchedule, InputSignal
 from utils import ProgressBar
 import numpy as np
-from scipy.optimize import fsolve, curve_fit
+from scipy.optimize import curve_fit
 import matplotlib.pyplot as plt
 from matplotlib.ticker import FormatStrFormatter
 from math import radians, sqrt, pi, degrees, cos, sin, atan, exp
@@ -41,16 +43,44 @@ class StabilityDerivatives(Constants):
 
     :param longitudinal_cyclic: Longitudinal Cyclic in SI degree [deg]
     :type longitudinal_cyclic: float
+
+    :param linearization: Strategy used to obtain the stability derivatives, either 'regression' to fit a line through
+                          20 samples spread over a large range, 'central' for central differences (2 evaluations per
+                          derivative) or 'complex' for the complex-step method (1 evaluation per derivative)
+    :type linearization: str
+
+    :param perturbation: Perturbation size of the state variables and control inputs in SI units, either a single value
+                         or one value per variable in the order u, w, q, theta_f, collective, cyclic. For 'regression'
+                         this is the half-width of the sampled range, if unspecified the defaults of
+                         :attr:`default_perturbations` are used
+    :type perturbation: float or tuple
     """
 
+    u = Variable('u', 'Horizontal Velocity in SI meter per second [m/s]')
+    w = Variable('w', 'Vertical Velocity in SI meter per second [m/s]')
+    q = Variable('q', 'Pitch Rate in SI radian per second [rad/s]')
+    theta_f = Variable('theta_f', 'Fuselage Tilt-Angle (Positive up) in SI radian [rad]')
+    collective_pitch = Variable('collective_pitch', 'Collective Pitch in SI radian [rad]')
+    longitudinal_cyclic = Variable('longitudinal_cyclic', 'Longitudinal Cyclic in SI radian [rad]')
+
+    linearization = Variable('linearization', "Linearization strategy, 'regression', 'central' or 'complex'")
+    perturbation = Variable('perturbation', 'Perturbation size of the state variables and control inputs in SI units')
+
+    # Perturbation sizes of u [m/s], w [m/s], q [rad/s], theta_f [rad], collective [rad] and cyclic [rad] per strategy
+    default_perturbations = {'regression': (10., 10., radians(10), radians(2.5), radians(10), radians(10)),
+                             'central': (1e-4, 1e-4, 1e-5, 1e-5, 1e-5, 1e-5),
+                             'complex': (1e-20, 1e-20, 1e-20, 1e-20, 1e-20, 1e-20)}
+
     def __init__(self, u=0.0, w=0.0, q=0.0, theta_f=0.0, collective_pitch=0.0,
-                 longitudinal_cyclic=0.0):
+                 longitudinal_cyclic=0.0, linearization='regression', perturbation=None):
         self.u = float(u)  # Horizontal Velocity [m/s]
         self.w = float(w)  # Vertical Velocity [m/s]
         self.q = float(q)  # Pitch Rate [rad/s]
         self.theta_f = theta_f  # Fuselage Tilt-Angle (Positive up)
         self.collective_pitch = float(collective_pitch)
         self.longitudinal_cyclic = float(longitudinal_cyclic)
+        self.linearization = linearization
+        self.perturbation = perturbation
 
     @Attribute
     def velocity(self):
@@ -144,27 +174,25 @@ class StabilityDerivatives(Constants):
         """
         return sqrt(self.weight_mtow/(2*self.rho*pi*(self.main_rotor.radius ** 2)))
 
+    @Attribute
+    def inflow_solution(self):
+        """ Utilizes the safeguarded Newton solver of the shared :attr:`equations_of_motion` to compute the inflow ratio
+        as discussed in the lecture slides, in the pure-hover case the inflow ratio during hover is returned instead
+
+        :return: Inflow Ratio, convergence flag and number of iterations
+        :rtype: InflowSolution
+        """
+        return self.equations_of_motion.solve_inflow(self.velocity, self.advance_ratio, self.inflow_ratio_control,
+                                                     self.q, self.collective_pitch)
+
     @Attribute
     def inflow_ratio(self):
-        """ Utilizes a numerical solver to compute the inflow ratio as discussed in the lecture slides unless a pure
-        hover is input as the current trim-condition. In the pure-hover case, the inflow ratio during hover is returned
+        """ Inflow ratio obtained from :attr:`inflow_solution`
 
         :return: Inflow Ratio
         :rtype: float
         """
-
-        def func(lambda_i, *args):
-
-            instance, status = args
-            diff = instance.thrust_coefficient_elem(lambda_i) - instance.thrust_coefficient_glau(lambda_i)
-            return diff
-
-        if self.velocity == 0:
-            ratio = self.hover_induced_velocity / (self.main_rotor.omega * self.main_rotor.radius)
-        else:
-            ratio = float((fsolve(func, x0=np.array([2e-2]), args=(self, 'instance_passed'))[0]))
-
-        return ratio
+        return float(self.inflow_solution.inflow_ratio)
 
     @Attribute
     def longitudinal_disk_tilt(self):
@@ -187,13 +215,21 @@ class StabilityDerivatives(Constants):
         r = self.main_rotor.radius
         return self.thrust_coefficient_elem(self.inflow_ratio) * self.rho * (omega * r)**2 * pi * r**2
 
+    @Attribute
+    def equations_of_motion(self):
+        """ Vectorized Equations of Motion shared by all instances, used to evaluate many perturbed states at once
+
+        :rtype: EquationsOfMotion
+        """
+        return get_equations_of_motion()
+
     @Attribute
     def ch53_inertia(self):
-        """ Instantiating the :class:`CH53Inertia` in a lazy-attribute to provide geometry parameters as required
+        """ The :class:`CH53Inertia` of the shared :attr:`equations_of_motion`, such that it is only built once
 
         :rtype: CH53Inertia
         """
-        return CH53Inertia()
+        return self.equations_of_motion.ch53_inertia
 
     @Attribute
     def inertia(self):
@@ -273,155 +309,141 @@ class StabilityDerivatives(Constants):
         """
         return self.q
 
+    @Attribute
+    def perturbation_sizes(self):
+        """ Perturbation size of every state variable and control input for the selected :attr:`linearization`
+
+        :return: Perturbation sizes in the order u, w, q, theta_f, collective, cyclic in SI units
+        :rtype: numpy.ndarray
+        """
+        if self.linearization not in self.default_perturbations:
+            raise ValueError("Unknown linearization '%s', use one of %s"
+                             % (self.linearization, ', '.join(sorted(self.default_perturbations))))
+        sizes = self.default_perturbations[self.linearization] if self.perturbation is None else self.perturbation
+        return np.broadcast_to(np.asarray(sizes, dtype=float), (6,))
+
+    @Attribute
+    def perturbation_ranges(self):
+        """ Perturbations applied to every state variable and control input. The 'regression' strategy samples 20
+        values spread over +/- :attr:`perturbation_sizes`, 'central' only samples both signs of the perturbation size
+        and 'complex' applies a single perturbation on the imaginary axis.
+
+        :return: One array of perturbations per variable in the order u, w, q, theta_f, collective, cyclic
+        :rtype: tuple
+        """
+        if self.linearization == 'regression':
+            return tuple(np.linspace(-size, size, 20) for size in self.perturbation_sizes)
+        elif self.linearization == 'central':
+            return tuple(np.array([-size, size]) for size in self.perturbation_sizes)
+        return tuple(np.array([1j * size]) for size in self.perturbation_sizes)
+
+    @Attribute
+    def perturbation_response(self):
+        """ Evaluates the accelerations of all states perturbed by :attr:`perturbation_ranges` in a single call of the
+        vectorized :attr:`equations_of_motion`. Every state variable and control input is perturbed separately while
+        the others are kept at the current condition, resulting in 6 x 20 = 120 perturbed states for the 'regression'
+        strategy, 6 x 2 = 12 for 'central' and 6 complex states for 'complex'.
+
+        :return: Responses of shape (6, 4, n), idx0 = perturbed variable in the order u, w, q, theta_f, collective,
+                 cyclic, idx1 = acceleration in the order u_dot, w_dot, q_dot, theta_f_dot, idx2 = perturbation
+        :rtype: numpy.ndarray
+        """
+        state = np.array([self.u, self.w, self.q, self.theta_f, self.collective_pitch, self.longitudinal_cyclic])
+        deltas = np.array(self.perturbation_ranges)
+        states = np.empty((len(state),) + deltas.shape, dtype=np.result_type(state, deltas))
+        states[:] = state[:, np.newaxis, np.newaxis]
+        for i, delta in enumerate(deltas):
+            states[i, i] += delta
+        return np.array(self.equations_of_motion(*states)).transpose(1, 0, 2)
+
+    def derivative_column(self, index, label, unit, filename):
+        """ Obtains the stability derivatives w.r.t. a single state variable or control input from
+        :attr:`perturbation_response` with the selected :attr:`linearization` strategy
+
+        :param index: Index of the perturbed variable in the order u, w, q, theta_f, collective, cyclic
+        :type index: int
+
+        :param label: Description of the incremental input used by the :meth:`linearizer` plots, ex: r'\theta_{ls}'
+        :type: label: str
+
+        :param unit: SI unit of the incremental input
+        :type unit: str
+
+        :param filename: Name used to save the plot of the :meth:`linearizer`
+        :type filename: str
+
+        :return: Tuple containing linearized dimensional stability derivatives
+        :rtype: tuple
+        """
+        response = self.perturbation_response[index]
+        if self.linearization == 'regression':
+            return self.linearizer(self.perturbation_ranges[index], response, label, unit, filename,
+                                   velocity=self.velocity)
+
+        size = self.perturbation_sizes[index]
+        if self.linearization == 'central':
+            return tuple((response[:, 1] - response[:, 0]) / (2 * size))
+        return tuple(np.imag(response[:, 0]) / size)
+
     @Attribute
     def u_derivatives(self):
         """ Computes the change in acceleration caused by a change in horizontal velocity u, by computing the response
-        to a range of inputs and then fitting a linear regression.
+        to a perturbation with the selected :attr:`linearization` strategy.
 
         :return: Tuple containing the entries for the first column of the A-matrix
         :rtype: tuple
         """
-        u_dot = []
-        w_dot = []
-        q_dot = []
-        theta_f_dot = []
-        delta_u = np.linspace(-10, 10, 20)
-        for i in delta_u:
-            case = StabilityDerivatives(u=self.u + i, w=self.w, q=self.q, theta_f=self.theta_f,
-                                        collective_pitch=self.collective_pitch,
-                                        longitudinal_cyclic=self.longitudinal_cyclic)
-            u_dot.append(case.u_dot)
-            w_dot.append(case.w_dot)
-            q_dot.append(case.q_dot)
-            theta_f_dot.append(case.theta_f_dot)
-
-        return self.linearizer(delta_u, (u_dot, w_dot, q_dot, theta_f_dot), r'{u}', 'm/s', 'horizontal_velocity',
-                               velocity=self.velocity)
+        return self.derivative_column(0, r'{u}', 'm/s', 'horizontal_velocity')
 
     @Attribute
     def w_derivatives(self):
         """ Computes the change in acceleration caused by a change in vertical velocity w, by computing the response
-        to a range of inputs and then fitting a linear regression.
+        to a perturbation with the selected :attr:`linearization` strategy.
 
         :return: Tuple containing the entries for the second column of the A-matrix
         :rtype: tuple
         """
-        u_dot = []
-        w_dot = []
-        q_dot = []
-        theta_f_dot = []
-        delta_w = np.linspace(-10, 10, 20)
-        for i in delta_w:
-            case = StabilityDerivatives(u=self.u, w=self.w + i, q=self.q, theta_f=self.theta_f,
-                                        collective_pitch=self.collective_pitch,
-                                        longitudinal_cyclic=self.longitudinal_cyclic)
-            u_dot.append(case.u_dot)
-            w_dot.append(case.w_dot)
-            q_dot.append(case.q_dot)
-            theta_f_dot.append(case.theta_f_dot)
-
-        return self.linearizer(delta_w, (u_dot, w_dot, q_dot, theta_f_dot), r'{w}', 'm/s', 'vertical_velocity',
-                               velocity=self.velocity)
+        return self.derivative_column(1, r'{w}', 'm/s', 'vertical_velocity')
 
     @Attribute
     def q_derivatives(self):
         """ Computes the change in angular acceleration caused by a change in pitch-rate q, by computing the response
-        to a range of inputs and then fitting a linear regression.
+        to a perturbation with the selected :attr:`linearization` strategy.
 
         :return: Tuple containing the entries for the third column of the A-matrix
         :rtype: tuple
         """
-        u_dot = []
-        w_dot = []
-        q_dot = []
-        theta_f_dot = []
-        delta_q = np.linspace(radians(-10), radians(10), 20)
-        for i in delta_q:
-            case = StabilityDerivatives(u=self.u, w=self.w, q=self.q + i, theta_f=self.theta_f,
-                                        collective_pitch=self.collective_pitch,
-                                        longitudinal_cyclic=self.longitudinal_cyclic)
-            u_dot.append(case.u_dot)
-            w_dot.append(case.w_dot)
-            q_dot.append(case.q_dot)
-            theta_f_dot.append(case.theta_f_dot)
-
-        return self.linearizer(delta_q, (u_dot, w_dot, q_dot, theta_f_dot), r'{q}', 'rad/s', 'pitch_rate',
-                               velocity=self.velocity)
+        return self.derivative_column(2, r'{q}', 'rad/s', 'pitch_rate')
 
     @Attribute
     def theta_f_derivatives(self):
         """ Computes the change in angular velocity caused by a change in fuselage pitch, by computing the response
-        to a range of inputs and then fitting a linear regression.
+        to a perturbation with the selected :attr:`linearization` strategy.
 
         :return: Tuple containing the entries for the last column of the A-matrix
         :rtype: tuple
         """
-        u_dot = []
-        w_dot = []
-        q_dot = []
-        theta_f_dot = []
-        delta_theta = np.linspace(radians(-2.5), radians(2.5), 20)
-        for i in delta_theta:
-            case = StabilityDerivatives(u=self.u, w=self.w, q=self.q, theta_f=self.theta_f + i,
-                                        collective_pitch=self.collective_pitch,
-                                        longitudinal_cyclic=self.longitudinal_cyclic)
-            u_dot.append(case.u_dot)
-            w_dot.append(case.w_dot)
-            q_dot.append(case.q_dot)
-            theta_f_dot.append(case.theta_f_dot)
-
-        return self.linearizer(delta_theta, (u_dot, w_dot, q_dot, theta_f_dot), r'{\theta_f}', 'rad', 'fuselage_pitch',
-                               velocity=self.velocity)
+        return self.derivative_column(3, r'{\theta_f}', 'rad', 'fuselage_pitch')
 
     @Attribute
     def collective_derivatives(self):
         """ Computes the change in acceleration caused by a collective pitch input, by computing the response to a range
-        of inputs and then fitting a linear regression.
+        of inputs with the selected :attr:`linearization` strategy.
 
         :return: Tuple containing the entries for the first column of the B-matrix
         :rtype: tuple
         """
-        u_dot = []
-        w_dot = []
-        q_dot = []
-        theta_f_dot = []
-        delta_col = np.linspace(radians(-10), radians(10), 20)
-        for i in delta_col:
-            case = StabilityDerivatives(u=self.u, w=self.w, q=self.q, theta_f=self.theta_f,
-                                        collective_pitch=self.collective_pitch + i,
-                                        longitudinal_cyclic=self.longitudinal_cyclic)
-            u_dot.append(case.u_dot)
-            w_dot.append(case.w_dot)
-            q_dot.append(case.q_dot)
-            theta_f_dot.append(case.theta_f_dot)
-
-        return self.linearizer(delta_col, (u_dot, w_dot, q_dot, theta_f_dot),  r'{\theta_{0}}', 'rad', 'collective',
-                               velocity=self.velocity)
+        return self.derivative_column(4, r'{\theta_{0}}', 'rad', 'collective')
 
     @Attribute
     def cyclic_derivatives(self):
         """ Computes the change in acceleration caused by a longitudinal cyclic input, by computing the response to a
-        range of inputs and then fitting a linear regression.
+        range of inputs with the selected :attr:`linearization` strategy.
 
         :return: Tuple containing the entries for the second column of the B-matrix
         :rtype: tuple
         """
-        u_dot = []
-        w_dot = []
-        q_dot = []
-        theta_f_dot = []
-        delta_cyc = np.linspace(radians(-10), radians(10), 20)
-        for i in delta_cyc:
-            case = StabilityDerivatives(u=self.u, w=self.w, q=self.q, theta_f=self.theta_f,
-                                        collective_pitch=self.collective_pitch,
-                                        longitudinal_cyclic=self.longitudinal_cyclic + i)
-            u_dot.append(case.u_dot)
-            w_dot.append(case.w_dot)
-            q_dot.append(case.q_dot)
-            theta_f_dot.append(case.theta_f_dot)
-
-        return self.linearizer(delta_cyc, (u_dot, w_dot, q_dot, theta_f_dot), r'{\theta_{ls}}', 'rad', 'cyclic',
-                               velocity=self.velocity)
+        return self.derivative_column(5, r'{\theta_{ls}}', 'rad', 'cyclic')
 
     @staticmethod
     def linearizer(input_list, responses, label, unit, filename, velocity):
@@ -545,37 +567,25 @@ class StabilityDerivatives(Constants):
         plt.show()
         fig.savefig(fname=os.path.join(working_dir, 'Figures', '%s.pdf' % fig.get_label()), format='pdf')
 
-    def plot_response(self):
-        """ A plot of the non-linear system response to a step-input """
+    def plot_response(self, schedule=None):
+        """ A plot of the non-linear system response to a control input
+
+        :param schedule: Control inputs w.r.t. the initial control deflection, defaults to a 1 [deg] longitudinal cyclic
+                         pulse between 0.5 and 1.0 [s]
+        :type schedule: ControlSchedule
+        """
 
         time = np.linspace(0, 40, 1000)
-        delta_t = time[1] - time[0]
-        cyclic_input = [self.longitudinal_cyclic]
-        u = [self.u]
-        w = [self.w]
-        q = [self.q]
-        theta_f = [self.theta_f]
-        current_case = self
+        if schedule is None:
+            schedule = ControlSchedule(cyclic=InputSignal.pulse(radians(1.0), 0.5, 0.5))
+        controls = schedule.with_offset(self.collective_pitch, self.longitudinal_cyclic)
 
         # Forward Euler Integration
         pbar = ProgressBar('Performing Forward Euler Integration')
-        for i in range(1, len(time)):
-            u = u + [current_case.u + current_case.u_dot * delta_t]
-            w = w + [current_case.w + current_case.w_dot * delta_t]
-            q = q + [current_case.q + current_case.q_dot * delta_t]
-            theta_f = theta_f + [current_case.theta_f + current_case.theta_f_dot * delta_t]
-
-            # Control Inputs based on Initial Conditions
-            if 0.5 < time[i] < 1.0:
-                cyclic_input = cyclic_input + [self.longitudinal_cyclic + radians(1.0)]
-            else:
-                cyclic_input = cyclic_input + [self.longitudinal_cyclic]
-
-            current_case = StabilityDerivatives(u=u[i], w=w[i], q=q[i], theta_f=theta_f[i],
-                                                longitudinal_cyclic=cyclic_input[i],
-                                                collective_pitch=self.collective_pitch)
-
-            pbar.update_loop(i, len(time)-1)
+        response = NonlinearSimulation((self.u, self.w, self.q, self.theta_f), controls, time, method='euler').result
+        cyclic_input, u, w, q, theta_f = (response.longitudinal_cyclic, response.u, response.w, response.q,
+                                          response.theta_f)
+        pbar.update(100)
 
         # Plotting Response
         plt.style.use('ggplot')
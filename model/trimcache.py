@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" This file contains the class definition of the persistent cache used to store the trim conditions of the CH53
+Helicopter such that every trim point only has to be solved once """
+
+__author__ = ["San Kilkis"]
+
+import __root__
+from globs import get_parameters, working_dir
+from trim import Trim
+from collections import OrderedDict
+from contextlib import contextmanager
+import threading
+import struct
+import os
+assert __root__  # Necessary to circumvent PEP-8 Syntax violation on the __root__ import statement
+
+try:
+    import fcntl  # POSIX file locking
+except ImportError:  # Windows does not provide fcntl, thus the C runtime locking is used instead
+    fcntl = None
+    import msvcrt
+
+
+@contextmanager
+def file_lock(handle, exclusive=False):
+    """ Locks an open file for the duration of the context such that multiple processes can share the file
+
+    :param handle: Open file object
+    :type handle: file
+
+    :param exclusive: Acquires an exclusive (write) lock instead of a shared (read) lock, note that Windows only
+                      supports exclusive locks
+    :type exclusive: bool
+    """
+    if fcntl is not None:
+        fcntl.flock(handle, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield handle
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+    else:
+        position = handle.tell()
+        handle.seek(0)
+        msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+        handle.seek(position)
+        try:
+            yield handle
+        finally:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class TrimCache(object):
+    """ Content-addressed cache of trim solutions. Entries are keyed by the exact flight velocity and stored in a
+    binary file named after the :attr:`AircraftParameters.fingerprint`, such that results computed with a different
+    configuration are never mixed. Recently used entries are kept in an in-memory Least Recently Used (LRU) store,
+    while the file is shared between processes by means of file locking. Besides the LRU store, only the offset of
+    every record within the file is held in memory, such that an evicted entry is read back w/o parsing the file.
+
+    :param directory: Directory in which the binary store is written, if unspecified `cache` in the working directory
+    :type directory: str
+
+    :param max_size: Maximum number of entries held in memory
+    :type max_size: int
+
+    :param fingerprint: Hash of the aircraft constants, if unspecified the current process-wide fingerprint is used
+    :type fingerprint: str
+    """
+
+    record = struct.Struct('<4d')  # Velocity, Inflow Ratio, Collective Pitch, Longitudinal Cyclic
+
+    def __init__(self, directory=None, max_size=1024, fingerprint=None):
+        self.directory = directory if directory is not None else os.path.join(working_dir, 'cache')
+        self.max_size = max_size
+        self.fingerprint = fingerprint if fingerprint is not None else get_parameters().fingerprint
+        self.memory = OrderedDict()
+        self.index = {}  # Offset of the record of every velocity within the binary store in bytes
+        self.disk_size = 0  # Number of bytes of the binary store that have been indexed
+        self.lock = threading.Lock()
+
+    @property
+    def filename(self):
+        """ Location of the binary store belonging to the current :attr:`fingerprint` """
+        return os.path.join(self.directory, 'trim_%s.bin' % self.fingerprint)
+
+    def __len__(self):
+        return len(self.index)
+
+    def remember(self, key, solution):
+        """ Inserts an entry into the in-memory store, evicting the least recently used entry if it is full """
+        self.memory.pop(key, None)
+        self.memory[key] = solution
+        while len(self.memory) > self.max_size:
+            self.memory.popitem(last=False)
+
+    def read_disk(self):
+        """ Indexes all records that were appended to the binary store since it was last read """
+        if not os.path.exists(self.filename) or os.path.getsize(self.filename) == self.disk_size:
+            return
+        with open(self.filename, 'rb') as handle:
+            with file_lock(handle):
+                handle.seek(self.disk_size)
+                data = handle.read()
+        size = self.record.size
+        for offset in range(0, len(data) - size + 1, size):  # A partially written record at the end is skipped
+            self.index.setdefault(self.record.unpack_from(data, offset)[0], self.disk_size + offset)
+        self.disk_size += len(data) - len(data) % size
+
+    def read_record(self, offset):
+        """ Reads the solution of the single record starting at `offset` from the binary store
+
+        :rtype: tuple
+        """
+        with open(self.filename, 'rb') as handle:
+            with file_lock(handle):
+                handle.seek(offset)
+                return self.record.unpack(handle.read(self.record.size))[1:]
+
+    def write_disk(self, key, solution):
+        """ Appends a single record to the binary store while holding an exclusive lock
+
+        :return: Offset of the record within the binary store in bytes
+        :rtype: int
+        """
+        if not os.path.isdir(self.directory):
+            try:
+                os.makedirs(self.directory)
+            except OSError:  # Directory created by another process in the mean time
+                pass
+        with open(self.filename, 'ab') as handle:
+            with file_lock(handle, exclusive=True):
+                handle.seek(0, os.SEEK_END)
+                offset = handle.tell()
+                handle.write(self.record.pack(key, *solution))
+                handle.flush()
+        if offset == self.disk_size:  # Nothing was appended by other processes, thus the store remains fully indexed
+            self.disk_size += self.record.size
+        return offset
+
+    def lookup(self, velocity):
+        """ Retrieves a cached solution without solving
+
+        :param velocity: Forward Flight Velocity in SI meter per second [m/s]
+        :type velocity: float
+
+        :return: Inflow Ratio, Collective Pitch and Longitudinal Cyclic in SI radian [rad] or None if not cached
+        :rtype: tuple
+        """
+        key = float(velocity)
+        with self.lock:
+            solution = self.memory.get(key)
+            if solution is None:
+                if key not in self.index:
+                    self.read_disk()
+                if key in self.index:
+                    solution = self.read_record(self.index[key])
+            if solution is not None:
+                self.remember(key, solution)
+        return solution
+
+    def store(self, velocity, solution):
+        """ Adds a solution to both the in-memory and the binary store
+
+        :param velocity: Forward Flight Velocity in SI meter per second [m/s]
+        :type velocity: float
+
+        :param solution: Inflow Ratio, Collective Pitch and Longitudinal Cyclic in SI radian [rad]
+        :type solution: tuple
+        """
+        key = float(velocity)
+        solution = tuple(float(value) for value in solution)
+        with self.lock:
+            self.remember(key, solution)
+            if key not in self.index:
+                self.index[key] = self.write_disk(key, solution)
+
+    def get(self, velocity):
+        """ Returns the trim case at `velocity`, which is only solved if the velocity is not cached yet. Cached cases
+        have their solution assigned directly and use it as :attr:`Trim.initial_guess`, thus the solver diagnostics of
+        a cached case are obtained w/o additional iterations if requested.
+
+        :param velocity: Forward Flight Velocity in SI meter per second [m/s]
+        :type velocity: float
+
+        :rtype: Trim
+        """
+        solution = self.lookup(velocity)
+        if solution is None:
+            case = Trim(velocity)
+            if case.converged:  # Failed solutions are not persisted
+                self.store(velocity, (case.inflow_ratio_glau,) + tuple(case.numerical_solution))
+            return case
+
+        case = Trim(velocity, initial_guess=solution)
+        case.inflow_ratio_glau = solution[0]
+        case.numerical_solution = solution[1], solution[2]
+        return case
+
+    def clear(self):
+        """ Empties the in-memory store and removes the binary store of the current :attr:`fingerprint` """
+        with self.lock:
+            self.memory.clear()
+            self.index.clear()
+            self.disk_size = 0
+            if os.path.exists(self.filename):
+                os.remove(self.filename)
+
+
+_trim_cache = None
+_trim_cache_lock = threading.Lock()
+
+
+def get_trim_cache():
+    """ Returns the process-wide :class:`TrimCache` belonging to the current aircraft parameters, a new cache is
+    created upon the first call or whenever the parameters have been invalidated and changed
+
+    :rtype: TrimCache
+    """
+    global _trim_cache
+    fingerprint = get_parameters().fingerprint
+    with _trim_cache_lock:
+        if _trim_cache is None or _trim_cache.fingerprint != fingerprint:
+            _trim_cache = TrimCache(fingerprint=fingerprint)
+    return _trim_cache
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" This file contains the class definition of a precomputed map of the trim condition of the CH53 Helicopter which
+serves interpolated trim values at arbitrary airspeeds without calling the nonlinear solvers """
+
+__author__ = ["San Kilkis"]
+
+import __root__
+from globs import Constants, Attribute, Variable
+from trim import Trim, BatchTrim
+from scipy.interpolate import CubicSpline
+from collections import namedtuple
+import numpy as np
+assert __root__  # Necessary to circumvent PEP-8 Syntax violation on the __root__ import statement
+
+TrimPoint = namedtuple('TrimPoint', ['collective_pitch', 'longitudinal_cyclic', 'fuselage_tilt'])
+
+
+class TrimMap(Constants):
+    """ Interpolates the trim condition of the CH-53 from a table of exact solutions. The table is computed once from
+    the :attr:`BatchTrim.numerical_solution` over :attr:`Trim.velocity_range` (1000 points between hover and 10 m/s
+    above cruise), after which every quantity is represented by a not-a-knot cubic spline. Lookups therefore only cost
+    a polynomial evaluation and are valid for scalar and array queries alike, including the first and second
+    derivative w.r.t. velocity.
+
+    The interpolation error is measured upon construction by comparing the splines with the exact solution in the
+    middle of every table interval, where the error of a cubic spline is largest. For the default table the maximum
+    absolute error is below 1e-9 rad in all quantities, see :attr:`max_error`. Queries outside of the table are not
+    extrapolated but computed with the exact (batched) solver instead.
+
+    :param velocities: Ordered table velocities in SI meter per second [m/s], defaults to :attr:`Trim.velocity_range`
+    :type velocities: numpy.ndarray
+
+    :param step: Velocity step of the central differences used for derivatives outside of the table in SI meter per
+                 second [m/s]
+    :type step: float
+    """
+
+    velocities = Variable('velocities', 'Ordered table velocities in SI meter per second [m/s]')
+
+    def __init__(self, velocities=None, step=1e-4):
+        self.velocities = np.asarray(velocities if velocities is not None else Trim().velocity_range, dtype=float)
+        self.step = step
+
+    @staticmethod
+    def exact_solution(velocities):
+        """ Solves the trim condition exactly for an array of velocities
+
+        :param velocities: Forward Flight Velocities in SI meter per second [m/s]
+        :type velocities: numpy.ndarray
+
+        :return: Collective Pitch, Longitudinal Cyclic and Fuselage Tilt in SI radian [rad]
+        :rtype: TrimPoint
+        """
+        batch = BatchTrim(velocities)
+        return TrimPoint(batch.collective_pitch, batch.longitudinal_cyclic, batch.fuselage_tilt)
+
+    @Attribute
+    def table(self):
+        """ Exact trim solution at all table :attr:`velocities`
+
+        :rtype: TrimPoint
+        """
+        return self.exact_solution(self.velocities)
+
+    @Attribute
+    def spline(self):
+        """ Single cubic spline through all quantities of :attr:`table`, such that a lookup evaluates one polynomial
+
+        :rtype: scipy.interpolate.CubicSpline
+        """
+        return CubicSpline(self.velocities, np.column_stack(self.table), axis=0)
+
+    @Attribute
+    def max_error(self):
+        """ Maximum absolute interpolation error of every quantity, evaluated at the midpoints of the table intervals
+
+        :return: Maximum error of Collective Pitch, Longitudinal Cyclic and Fuselage Tilt in SI radian [rad]
+        :rtype: TrimPoint
+        """
+        midpoints = 0.5 * (self.velocities[1:] + self.velocities[:-1])
+        error = np.abs(self.spline(midpoints) - np.column_stack(self.exact_solution(midpoints)))
+        return TrimPoint(*[float(value) for value in np.max(error, axis=0)])
+
+    @property
+    def bounds(self):
+        """ Lowest and highest velocity of the table in SI meter per second [m/s]
+
+        :rtype: tuple
+        """
+        return self.velocities[0], self.velocities[-1]
+
+    def __call__(self, velocity, derivative=0):
+        """ Retrieves the trim condition, or its derivative w.r.t. velocity, at the provided :parameter:`velocity`
+
+        :param velocity: Forward Flight Velocity in SI meter per second [m/s], scalar or array
+        :type velocity: float or numpy.ndarray
+
+        :param derivative: Order of the derivative w.r.t. velocity (0, 1 or 2)
+        :type derivative: int
+
+        :return: Collective Pitch, Longitudinal Cyclic and Fuselage Tilt in SI radian [rad] (per [m/s]**derivative),
+                 w/ the same shape as :parameter:`velocity`
+        :rtype: TrimPoint
+        """
+        if derivative not in (0, 1, 2):
+            raise ValueError('Only the 0th, 1st and 2nd derivative are available, %s was requested' % derivative)
+
+        velocity = np.asarray(velocity, dtype=float)
+        values = self.spline(velocity, derivative)
+
+        lower, upper = self.bounds
+        outside = (velocity < lower) | (velocity > upper)
+        if outside.any():
+            values[outside] = np.column_stack(self.exact_derivative(np.atleast_1d(velocity[outside]), derivative))
+
+        if velocity.ndim == 0:
+            return TrimPoint(*values.tolist())
+        return TrimPoint(*np.rollaxis(values, -1))
+
+    def exact_derivative(self, velocities, derivative=0):
+        """ Exact trim condition or its derivative obtained with central differences of the exact solution
+
+        :param velocities: Forward Flight Velocities in SI meter per second [m/s]
+        :type velocities: numpy.ndarray
+
+        :param derivative: Order of the derivative w.r.t. velocity (0, 1 or 2)
+        :type derivative: int
+
+        :rtype: TrimPoint
+        """
+        if derivative == 0:
+            return self.exact_solution(velocities)
+
+        h = self.step
+        forward, center, backward = [self.exact_solution(velocities + offset) for offset in (h, 0., -h)]
+        if derivative == 1:
+            return TrimPoint(*[(f - b) / (2 * h) for f, b in zip(forward, backward)])
+        return TrimPoint(*[(f - 2 * c + b) / h ** 2 for f, c, b in zip(forward, center, backward)])
+
+    def collective_pitch(self, velocity, derivative=0):
+        """ Collective Pitch required for trim in SI radian [rad], see :meth:`__call__` """
+        return self(velocity, derivative).collective_pitch
+
+    def longitudinal_cyclic(self, velocity, derivative=0):
+        """ Longitudinal Cyclic required for trim in SI radian [rad], see :meth:`__call__` """
+        return self(velocity, derivative).longitudinal_cyclic
+
+    def fuselage_tilt(self, velocity, derivative=0):
+        """ Fuselage tilt angle (Negative = Nose Down) in SI radian [rad], see :meth:`__call__` """
+        return self(velocity, derivative).fuselage_tilt
+
+
+if __name__ == '__main__':
+    trim_map = TrimMap()
+    print trim_map.max_error
+    print trim_map(trim_map.cruise_velocity)